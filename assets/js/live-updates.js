@@ -0,0 +1,68 @@
+/*
+ * Live counters over Server-Sent Events (server side: main_app/live.py).
+ *
+ * <div data-live-url="/live/notifications/" data-live-event="notifications">
+ * opens an EventSource; every field of an event updates the elements marked
+ * data-live-count="<field>". When a counter goes up, or new notifications
+ * arrive, the [data-live-banner] element inside the container is shown so
+ * the user can reload the list - instead of reloading just in case.
+ */
+(function () {
+    "use strict";
+
+    function setCount(name, value) {
+        document.querySelectorAll('[data-live-count="' + name + '"]').forEach(function (el) {
+            el.textContent = value;
+            if (el.hasAttribute("data-live-hide-zero")) {
+                el.style.display = value ? "" : "none";
+            }
+        });
+    }
+
+    function showBanner(container, text) {
+        var banner = container.querySelector("[data-live-banner]");
+        if (!banner) {
+            return;
+        }
+        var label = banner.querySelector("[data-live-banner-text]");
+        if (label && text) {
+            label.textContent = text;
+        }
+        banner.style.display = "";
+    }
+
+    function bind(container) {
+        if (!window.EventSource) {
+            return;
+        }
+        var source = new EventSource(container.dataset.liveUrl);
+        var eventName = container.dataset.liveEvent || "message";
+        var previous = null;
+
+        source.addEventListener(eventName, function (message) {
+            var data = JSON.parse(message.data);
+            var increased = false;
+            Object.keys(data).forEach(function (name) {
+                if (name === "latest") {
+                    return;
+                }
+                setCount(name, data[name]);
+                if (previous && data[name] > previous[name]) {
+                    increased = true;
+                }
+            });
+            if (data.latest && data.latest.length) {
+                showBanner(container, data.latest.length === 1
+                    ? data.latest[0].title
+                    : data.latest.length + " new notifications");
+            } else if (increased) {
+                showBanner(container);
+            }
+            previous = data;
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("[data-live-url]").forEach(bind);
+    });
+})();
@@ -0,0 +1,182 @@
+/*
+ * Resumable chunked uploads for document forms (server side: main_app/resumable.py).
+ *
+ * <form data-resumable-url="/uploads/"> with <input type="file" data-resumable>:
+ * on submit every chosen file is sent in chunks first, then the form is
+ * submitted with <name>_upload=<session id> instead of the file. A dropped
+ * connection only costs the current chunk - retries (and a page reload with
+ * the same file picked again) continue from the last offset the server has.
+ */
+(function () {
+    "use strict";
+
+    var MAX_RETRIES = 8;
+
+    function csrfToken(form) {
+        var input = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        return input ? input.value : "";
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    function storageKey(input, file) {
+        return ["c4s-upload", input.name, file.name, file.size, file.lastModified].join(":");
+    }
+
+    async function checksum(blob) {
+        if (!window.crypto || !crypto.subtle) {
+            return null;  // plain http - checksums are optional
+        }
+        var digest = await crypto.subtle.digest("SHA-256", await blob.arrayBuffer());
+        var bytes = new Uint8Array(digest), binary = "";
+        for (var i = 0; i < bytes.length; i++) {
+            binary += String.fromCharCode(bytes[i]);
+        }
+        return "sha256 " + btoa(binary);
+    }
+
+    async function request(method, url, token, options) {
+        options = options || {};
+        var headers = Object.assign({"X-CSRFToken": token}, options.headers || {});
+        var response = await fetch(url, {method: method, headers: headers, body: options.body, credentials: "same-origin"});
+        var data = {};
+        try { data = await response.json(); } catch (e) { /* empty body */ }
+        return {status: response.status, data: data};
+    }
+
+    async function startSession(form, input, file, token) {
+        var key = storageKey(input, file);
+        var saved = localStorage.getItem(key);
+        if (saved) {
+            var existing = await request("GET", form.dataset.resumableUrl + saved + "/", token);
+            if (existing.status === 200) {
+                return existing.data;
+            }
+            localStorage.removeItem(key);
+        }
+        var body = new FormData();
+        body.append("field_name", input.name);
+        body.append("filename", file.name);
+        body.append("size", file.size);
+        var created = await request("POST", form.dataset.resumableUrl, token, {body: body});
+        if (created.status !== 201) {
+            throw new Error(created.data.error || "Upload could not be started.");
+        }
+        localStorage.setItem(key, created.data.id);
+        return created.data;
+    }
+
+    async function uploadFile(form, input, file, progress) {
+        var token = csrfToken(form);
+        var session = await startSession(form, input, file, token);
+        var url = form.dataset.resumableUrl + session.id + "/";
+        var offset = session.offset, failures = 0;
+
+        while (offset < file.size) {
+            var chunk = file.slice(offset, offset + session.chunk_size);
+            var headers = {"Upload-Offset": String(offset), "Content-Type": "application/offset+octet-stream"};
+            var sum = await checksum(chunk);
+            if (sum) {
+                headers["Upload-Checksum"] = sum;
+            }
+            var result;
+            try {
+                result = await request("PATCH", url, token, {headers: headers, body: chunk});
+            } catch (e) {
+                result = {status: 0, data: {}};  // network dropped
+            }
+
+            if (result.status === 200) {
+                offset = result.data.offset;
+                failures = 0;
+                progress(Math.round(100 * offset / file.size));
+            } else if (result.status === 0 || result.status === 409 || result.status === 460 || result.status >= 500) {
+                if (++failures > MAX_RETRIES) {
+                    throw new Error("Upload failed - please check your connection and try again.");
+                }
+                await sleep(Math.min(30000, 1000 * Math.pow(2, failures)));
+                var current = await request("GET", url, token).catch(function () { return null; });
+                if (current && current.status === 200) {
+                    offset = current.data.offset;
+                }
+            } else {
+                localStorage.removeItem(storageKey(input, file));
+                throw new Error(result.data.error || "Upload rejected.");
+            }
+        }
+        localStorage.removeItem(storageKey(input, file));
+        return session.id;
+    }
+
+    function progressLabel(input) {
+        var label = input.parentNode.querySelector(".resumable-progress");
+        if (!label) {
+            label = document.createElement("small");
+            label.className = "resumable-progress d-block text-primary";
+            input.parentNode.appendChild(label);
+        }
+        return label;
+    }
+
+    function bind(form) {
+        var submitting = false;
+        form.addEventListener("submit", async function (event) {
+            if (submitting) {
+                return;
+            }
+            var inputs = Array.prototype.filter.call(
+                form.querySelectorAll("input[type=file][data-resumable]"),
+                function (input) {
+                    return input.files.length && !form.querySelector('input[name="' + input.name + '_upload"]');
+                }
+            );
+            if (!inputs.length || !window.fetch || !window.Promise) {
+                return;  // normal multipart post
+            }
+            event.preventDefault();
+            var submitter = event.submitter;
+            if (submitter) {
+                submitter.disabled = true;
+            }
+
+            try {
+                for (var i = 0; i < inputs.length; i++) {
+                    var input = inputs[i], label = progressLabel(input);
+                    var uploadId = await uploadFile(form, input, input.files[0], function (percent) {
+                        label.textContent = "Uploading... " + percent + "%";
+                    });
+                    label.textContent = "Uploaded";
+                    var hidden = document.createElement("input");
+                    hidden.type = "hidden";
+                    hidden.name = input.name + "_upload";
+                    hidden.value = uploadId;
+                    form.appendChild(hidden);
+                    input.required = false;
+                    input.disabled = true;  // don't send the bytes a second time
+                }
+            } catch (e) {
+                alert(e.message);
+                if (submitter) {
+                    submitter.disabled = false;
+                }
+                return;
+            }
+
+            if (submitter && submitter.name) {
+                var button = document.createElement("input");
+                button.type = "hidden";
+                button.name = submitter.name;
+                button.value = submitter.value;
+                form.appendChild(button);
+            }
+            submitting = true;
+            form.submit();
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("form[data-resumable-url]").forEach(bind);
+    });
+})();
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'c4s.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Public JSON lookups (state dropdowns, typeahead) skip the middleware chain
+from main_app.lookups import LookupApplication  # noqa: E402 - needs django.setup()
+
+application = LookupApplication(django_application)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,13 +53,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main_app.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'main_app.routers.ReplicaMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main_app.sqlite.DatabaseLockedMiddleware',
 ]
 
 ROOT_URLCONF = 'c4s.urls'
@@ -89,9 +93,77 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Writers wait for the lock at BEGIN instead of failing halfway
+            # with "database is locked" (see main_app/sqlite.py)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# PostgreSQL - lets several app servers share one database:
+#   DB_ENGINE=postgresql DB_NAME=c4s DB_USER=c4s DB_PASSWORD=... DB_HOST=127.0.0.1 python manage.py migrate
+#   python manage.py copy_database db.sqlite3   # existing data, see main_app/management/commands
+# Needs psycopg (3). Either persistent connections (DB_CONN_MAX_AGE, checked
+# before reuse) or, with DB_POOL_MAX_SIZE set, Django's psycopg pool - the two
+# can't be combined.
+if os.environ.get('DB_ENGINE') == 'postgresql':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'c4s'),
+        'USER': os.environ.get('DB_USER', 'c4s'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': 10,
+        },
+    }
+    if int(os.environ.get('DB_POOL_MAX_SIZE', 0)):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE')),
+            'timeout': 10,
+        }
+
+# Read replica (main_app/routers.py) - reads of student GET requests go there.
+# A PostgreSQL streaming replica (DB_REPLICA_HOST) or, for trying it out
+# locally, a second SQLite file (DB_REPLICA_NAME, filled with copy_database).
+if os.environ.get('DB_REPLICA_HOST') or os.environ.get('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'HOST': os.environ.get('DB_REPLICA_HOST', DATABASES['default'].get('HOST', '')),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Telemetry (page views, search logs - main_app/analytics.py) in its own
+# database, so it never locks the main one: python manage.py migrate --database analytics
+DATABASES['analytics'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('ANALYTICS_DB_NAME', BASE_DIR / 'analytics.sqlite3'),
+    'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+}
+if DATABASES['analytics']['ENGINE'].endswith('postgresql'):
+    DATABASES['analytics']['NAME'] = os.environ.get('ANALYTICS_DB_NAME', 'c4s_analytics')
+PAGE_VIEW_RETENTION_DAYS = 30  # rolled-up page views are deleted after this (purge_page_views job)
+
+DATABASE_ROUTERS = ['main_app.routers.AnalyticsRouter', 'main_app.routers.ReplicaRouter']
+DB_REPLICA_PIN_SECONDS = 10  # after a POST the browser reads from the primary this long
+# Always read from the primary here (admin work, login, live counters, upload offsets)
+DB_PRIMARY_PATHS = (
+    '/admin/', '/admin-dashboard/', '/admin-login/', '/login/', '/register/', '/live/', '/uploads/',
+    # Admin payment review outside /admin-dashboard/
+    '/admin_counselling_india_payments/', '/approve_payment/', '/reject_payment/',
+    # Files checked against the (just written) document rows
+    '/files/',
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -161,6 +233,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main_app.context_processors.notifications',
             ],
         },
     },
@@ -192,12 +265,136 @@ CKEDITOR_UPLOAD_PATH = "uploads/"
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+# Local testing against an SMTP sink, e.g. `python -m aiosmtpd -n -l 127.0.0.1:1025`:
+# EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025 EMAIL_USE_TLS=0 python manage.py run_worker
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') == '1'
+EMAIL_TIMEOUT = 30
 EMAIL_HOST_USER = 'webeside.agency@gmail.com'  # Replace with your Gmail
 EMAIL_HOST_PASSWORD = 'zxki gfti crqy xwry'  # Replace with your App Password
 DEFAULT_FROM_EMAIL = 'CAREER4S <your-email@gmail.com>'
 
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
\ No newline at end of file
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Image derivatives (main_app/images.py) - resized WebP copies of card, icon,
+# featured and college images, built by a job ('media' queue) after upload.
+# Backfill existing uploads with: python manage.py build_image_derivatives
+IMAGE_DERIVATIVE_WIDTHS = {
+    'card_image': (96, 192, 400),
+    'icon_image': (64, 128),
+    'featured_image': (400, 800, 1200),
+    'college_image': (300, 600),
+}
+IMAGE_DERIVATIVE_FORMATS = ('webp',)  # add 'avif' if Pillow has AVIF support
+IMAGE_DERIVATIVE_WORKERS = 2  # process pool of the build_image_derivatives command
+
+# CKEditor uploads are resized to the content column, re-encoded and
+# deduplicated by hash (main_app/content_images.py). Existing page bodies:
+# python manage.py optimize_content_images
+CKEDITOR_IMAGE_BACKEND = 'main_app.content_images.OptimizingImageBackend'
+CONTENT_IMAGE_MAX_WIDTH = 1200
+
+# Media files are stored by content hash and reference counted
+# (main_app/storage.py). Unreferenced files: manage.py collect_media_garbage
+STORAGES = {
+    'default': {'BACKEND': 'main_app.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Student documents / management quota files are only downloadable through
+# /files/... (main_app/protected_files.py), never from the public MEDIA_URL.
+# 'nginx' -> X-Accel-Redirect, needs:
+#     location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+#     location ~ ^/media/(student_documents|management_quota)/ { return 404; }
+# 'apache' -> X-Sendfile (mod_xsendfile). Empty -> served by Django (os.sendfile under gunicorn)
+PROTECTED_MEDIA_SERVER = os.environ.get('PROTECTED_MEDIA_SERVER', '')
+PROTECTED_MEDIA_INTERNAL_URL = '/protected-media/'
+PROTECTED_MEDIA_PREFIXES = ('student_documents/', 'management_quota/')
+PROTECTED_MEDIA_URL_MAX_AGE = 300  # seconds a signed download URL stays valid
+
+# Student document uploads (main_app/uploads.py): type/size are checked while
+# the request body streams in; accepted files get a normalized (smaller) copy
+# built in the background. PDFs are only normalized when Ghostscript is installed.
+FILE_UPLOAD_HANDLERS = [
+    'main_app.uploads.DocumentUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+DOCUMENT_UPLOAD_FIELDS = ('document_file', 'tenth_marksheet', 'twelfth_marksheet', 'exam_scorecard')
+DOCUMENT_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+DOCUMENT_NORMALIZE_MAX_SIDE = 2000
+
+# Resumable chunked document uploads (main_app/resumable.py). Part files are
+# kept outside MEDIA_ROOT until the form using them is submitted.
+RESUMABLE_UPLOAD_ROOT = BASE_DIR / 'upload_sessions'
+RESUMABLE_UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes per PATCH request
+RESUMABLE_UPLOAD_EXPIRY_HOURS = 24
+
+# Background jobs (main_app/jobs.py, main_app/tasks.py) - run the worker next
+# to the web server: python manage.py run_worker
+JOBS_RUN_INLINE = False  # True: run jobs right after commit, no worker needed
+JOB_QUEUE_CONCURRENCY = {'maintenance': 1, 'email': 1, 'media': 2}  # max running jobs per queue, all workers together
+JOB_RETRY_BASE_DELAY = 30  # seconds, doubled on every retry
+JOB_TIMEOUT = 30 * 60  # 'running' longer than this = worker died, job is requeued
+JOB_SCHEDULE = {
+    'expire-upload-sessions': {'task': 'main_app.tasks.expire_upload_sessions', 'interval': 60 * 60},
+    'purge-finished-jobs': {'task': 'main_app.tasks.purge_finished_jobs', 'interval': 24 * 60 * 60},
+    # Same key queue_email() uses - picks up anything a finished run missed
+    'send-queued-emails': {'task': 'main_app.tasks.send_queued_emails', 'interval': 60},
+    'roll-up-page-views': {'task': 'main_app.tasks.roll_up_page_views', 'interval': 5 * 60},
+    'purge-page-views': {'task': 'main_app.tasks.purge_page_views', 'interval': 24 * 60 * 60},
+}
+
+# Outbound mail queue (main_app/mail.py) - sent by the worker over one reused
+# SMTP connection instead of inside the admin's request.
+EMAIL_RATE_LIMIT = 60  # messages per minute (Gmail throttles bursts)
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_CONNECTION_MAX_IDLE = 60  # seconds before the pooled connection is reopened
+EMAIL_CONNECTION_MAX_MESSAGES = 100  # reconnect after this many messages
+EMAIL_DRAIN_SECONDS = 10 * 60  # one worker run stops after this, the schedule continues
+
+# Management quota notifications (main_app/notifications.py) - events within
+# one window are delivered together, one digest per student and type.
+NOTIFICATION_DIGEST_WINDOW = 120  # seconds
+NOTIFICATION_DIGEST_MAX_ITEMS = 10  # messages listed in one digest
+
+# Live updates over Server-Sent Events (main_app/live.py) - serve with an ASGI
+# server (e.g. `uvicorn c4s.asgi:application`); under WSGI the streams fall
+# back to one snapshot per LIVE_UPDATES_POLL_INTERVAL.
+LIVE_UPDATES_POLL_INTERVAL = 15  # seconds between re-reads when nothing was published
+LIVE_UPDATES_MAX_SECONDS = 5 * 60  # the browser reconnects after this
+
+# Cached JSON lookups (main_app/lookups.py) - state dropdowns etc.
+LOOKUP_CACHE_SECONDS = 60 * 60
+
+# SQLite production profile (main_app/sqlite.py) - run on every new connection.
+# Benchmark: python manage.py benchmark_sqlite
+SQLITE_PRAGMAS = {
+    'busy_timeout': 20000,  # ms a writer waits for the lock
+    'cache_size': -64000,  # negative = KiB, i.e. 64 MB per connection
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# 'WAL' on the servers: readers don't wait for the writer, plus synchronous=NORMAL.
+# Persistent (stored in the database file, creates -wal/-shm files), so it is
+# opt-in - empty leaves the journal mode of the file as it is.
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', '')
+
+# "database is locked" handling (main_app/sqlite.py): retry_on_locked views run
+# again after a jittered backoff, serve_stale_on_locked views fall back to their
+# last good page, anything else gets a 503 with Retry-After.
+DB_LOCKED_RETRIES = 3
+DB_LOCKED_RETRY_DELAY = 0.1  # seconds, doubled per retry (random jitter up to that)
+DB_LOCKED_RETRY_AFTER = 5  # Retry-After seconds of the 503
+STALE_PAGE_SECONDS = 10 * 60  # how long a last good page is kept
+
+# Request profiling (main_app/profiling.py): a sample of the requests is kept
+# in memory (per process) with wall, SQL and template time per view.
+# Staff page: /admin-dashboard/profiling/
+PROFILING_ENABLED = True
+PROFILING_SAMPLE_RATE = 0.05  # fraction of requests recorded, 1.0 = all
+PROFILING_BUFFER_SIZE = 10_000  # samples kept - older ones drop out
+PROFILING_AGGREGATE_SECONDS = 30  # the summary is recomputed at most this often
+PROFILING_TOP_N = 25  # views listed on the page
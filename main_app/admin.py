@@ -9,7 +9,7 @@ from .models import (
     CollegeComparison, StateWiseCounsellingUpdate, SubCategory, ContentPage,
     AdmissionAbroadSubCategory, AdmissionAbroadPage, StudentCardPurchase,
     ManagementQuotaCollege, ManagementQuotaApplication, ManagementQuotaNotification,
-    ManagementQuotaSeatAllocation
+    ManagementQuotaSeatAllocation, MediaBlob, Job, JobResult, OutboundEmail, NotificationEvent, SearchLog
 )
 
 
@@ -330,18 +330,56 @@ class ManagementQuotaApplicationAdmin(admin.ModelAdmin):
     search_fields = ['student__name', 'college__college__name', 'course_name', 'full_name', 'email']
     list_editable = ['status']
     readonly_fields = ['applied_at', 'reviewed_at', 'updated_at']
+    actions = ['approve_applications', 'reject_applications', 'waitlist_applications']
     
     def get_average_marks(self, obj):
         return f"{obj.get_average_marks():.2f}%"
     get_average_marks.short_description = 'Avg Marks'
+    
+    def _review(self, request, queryset, status, title):
+        """Bulk status change - one UPDATE, one bulk insert of notification events, mail queued"""
+        from django.utils import timezone
+        from .mail import queue_email
+        from .notifications import notify_many
+        
+        applications = list(queryset.exclude(status=status).select_related('college__college'))
+        ManagementQuotaApplication.objects.filter(pk__in=[a.pk for a in applications]).update(
+            status=status, reviewed_by=request.user, reviewed_at=timezone.now(),
+        )
+        notify_many([
+            NotificationEvent(
+                student_id=application.student_id,
+                application=application,
+                notification_type=status,
+                title=title,
+                message=f'Your application for {application.college.college.name} status: {status}',
+            )
+            for application in applications
+        ])
+        for application in applications:
+            application.status = status
+            queue_email(application.email, f'{title} - {application.college.college.name}',
+                        'emails/application_status', {'application': application})
+        self.message_user(request, f"{len(applications)} application(s) marked {status}.")
+    
+    @admin.action(description="Approve selected applications")
+    def approve_applications(self, request, queryset):
+        self._review(request, queryset, 'approved', 'Application Approved')
+    
+    @admin.action(description="Reject selected applications")
+    def reject_applications(self, request, queryset):
+        self._review(request, queryset, 'rejected', 'Application Rejected')
+    
+    @admin.action(description="Add selected applications to waitlist")
+    def waitlist_applications(self, request, queryset):
+        self._review(request, queryset, 'waitlist', 'Added to Waitlist')
 
 
 @admin.register(ManagementQuotaNotification)
 class ManagementQuotaNotificationAdmin(admin.ModelAdmin):
-    list_display = ['student', 'notification_type', 'title', 'is_read', 'created_at']
-    list_filter = ['notification_type', 'is_read', 'created_at']
+    list_display = ['student', 'notification_type', 'title', 'created_at']
+    list_filter = ['notification_type', 'created_at']
     search_fields = ['student__name', 'title', 'message']
-    list_editable = ['is_read']
     readonly_fields = ['created_at']
 
 
@@ -351,4 +389,77 @@ class ManagementQuotaSeatAllocationAdmin(admin.ModelAdmin):
     list_filter = ['status', 'allotment_date', 'joining_date']
     search_fields = ['allocation_roll_number', 'seat_number', 'application__student__name']
     list_editable = ['status']
-    readonly_fields = ['created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+
+# ==================== MEDIA BLOBS ====================
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'ref_count', 'size', 'created_at']
+    search_fields = ['name', 'sha256']
+    readonly_fields = ['name', 'sha256', 'size', 'ref_count', 'created_at']
+
+
+# ==================== BACKGROUND JOBS ====================
+class JobResultInline(admin.TabularInline):
+    model = JobResult
+    extra = 0
+    can_delete = False
+    readonly_fields = ['attempt', 'succeeded', 'result', 'error', 'worker', 'started_at', 'finished_at']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['task', 'queue', 'status', 'attempts', 'max_attempts', 'run_at', 'updated_at']
+    list_filter = ['status', 'queue', 'task']
+    search_fields = ['task', 'unique_key', 'last_error']
+    readonly_fields = ['locked_by', 'locked_at', 'attempts', 'last_error', 'created_at', 'updated_at']
+    inlines = [JobResultInline]
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected jobs now")
+    def retry_jobs(self, request, queryset):
+        from django.contrib import messages
+        from django.db import IntegrityError, transaction
+        from django.utils import timezone
+        retried = skipped = 0
+        # One by one: a job whose unique_key already has a queued/running job stays as it is
+        for pk in queryset.exclude(status='running').order_by('pk').values_list('pk', flat=True):
+            try:
+                with transaction.atomic():
+                    retried += Job.objects.filter(pk=pk).exclude(status='running').update(
+                        status='queued', attempts=0, run_at=timezone.now())
+            except IntegrityError:
+                skipped += 1
+        self.message_user(request, f"{retried} job(s) queued again.")
+        if skipped:
+            self.message_user(request, f"{skipped} job(s) skipped: a job with the same key is already "
+                                       f"queued or running.", messages.WARNING)
+
+
+# ==================== OUTBOUND EMAIL ====================
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'template', 'status', 'attempts', 'send_after', 'sent_at']
+    list_filter = ['status', 'template']
+    search_fields = ['subject', 'to', 'last_error']
+    readonly_fields = ['attempts', 'last_error', 'created_at', 'updated_at', 'sent_at']
+    actions = ['resend_emails']
+
+    @admin.action(description="Send selected emails again")
+    def resend_emails(self, request, queryset):
+        from django.utils import timezone
+        from .mail import QUEUE_KEY
+        from .tasks import send_queued_emails
+        updated = queryset.exclude(status='sending').update(status='queued', attempts=0, send_after=timezone.now())
+        send_queued_emails.schedule(unique_key=QUEUE_KEY)
+        self.message_user(request, f"{updated} email(s) queued again.")
+
+
+# ==================== ANALYTICS (analytics database) ====================
+@admin.register(SearchLog)
+class SearchLogAdmin(admin.ModelAdmin):
+    list_display = ['query', 'source', 'results', 'user_id', 'created_at']
+    list_filter = ['source']
+    search_fields = ['query']
+    readonly_fields = ['source', 'query', 'results', 'user_id', 'created_at']
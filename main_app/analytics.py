@@ -0,0 +1,88 @@
+"""
+High-volume telemetry, written to the 'analytics' database (routers.py).
+
+A page view used to be an UPDATE of the page row in the main database - one
+write lock per view, competing with purchases and applications. Now it is an
+insert into the analytics database (its own SQLite file), and the
+roll_up_page_views job adds the counted views to ``views_count`` every
+PAGE_VIEW_ROLLUP_INTERVAL - one UPDATE per viewed page and run. Displayed
+view counts lag behind by at most that interval. Counted views are kept for
+per-page history and deleted by the daily purge_page_views job after
+PAGE_VIEW_RETENTION_DAYS.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, F, Max, Min
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_BATCH_SIZE = 10000
+
+
+def _user_id(request):
+    user = getattr(request, 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def record_page_view(request, page):
+    """Count a view of `page` (any model with views_count)"""
+    from .models import PageView
+
+    try:
+        PageView.objects.create(page_type=page._meta.label_lower, page_id=page.pk, user_id=_user_id(request))
+    except DatabaseError:
+        # Telemetry must never break the page
+        logger.exception("Could not record page view of %s #%s", page._meta.label_lower, page.pk)
+
+
+def record_search(request, source, query, results):
+    from .models import SearchLog
+
+    query = query.strip()[:200]
+    if not query:
+        return
+    try:
+        SearchLog.objects.create(source=source, query=query, results=results, user_id=_user_id(request))
+    except DatabaseError:
+        logger.exception("Could not record %s search", source)
+
+
+def roll_up_page_views():
+    """Add uncounted page views to views_count; returns the number of views counted"""
+    from .models import PageView
+
+    bounds = PageView.objects.filter(counted=False).aggregate(first=Min('id'), last=Max('id'))
+    if bounds['first'] is None:
+        return 0
+    total = 0
+    # In id ranges, so a big backlog doesn't become one huge query
+    for start in range(bounds['first'], bounds['last'] + 1, ROLLUP_BATCH_SIZE):
+        views = PageView.objects.filter(counted=False, id__gte=start,
+                                        id__lte=min(start + ROLLUP_BATCH_SIZE - 1, bounds['last']))
+        counts = list(views.values('page_type', 'page_id').annotate(n=Count('id')).order_by())
+        # Marked first: a crash in between loses a few views instead of counting them twice
+        views.update(counted=True)
+        for row in counts:
+            try:
+                model = apps.get_model(row['page_type'])
+            except LookupError:
+                continue
+            model._base_manager.filter(pk=row['page_id']).update(views_count=F('views_count') + row['n'])
+            total += row['n']
+    return total
+
+
+def purge_page_views():
+    """Delete counted page views older than PAGE_VIEW_RETENTION_DAYS; returns how many"""
+    from .models import PageView
+
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'PAGE_VIEW_RETENTION_DAYS', 30))
+    deleted, _ = PageView.objects.filter(counted=True, created_at__lt=cutoff).delete()
+    return deleted
@@ -4,3 +4,51 @@ from django.apps import AppConfig
 class MainAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main_app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save, pre_save
+        from .images import derivative_models, queue_changed_images
+        from .live import publish_admin_queues
+        from .lookups import invalidate_states, remember_state_country
+        from .profiling import install_sql_timer, install_template_timer
+        from .sqlite import configure_connection
+        from .storage import file_fields, release_deleted_files, release_replaced_files
+        from .uploads import normalized_fields, queue_document_normalization
+
+        # Resized image copies are built by a job after upload
+        for model, _fields in derivative_models():
+            post_save.connect(queue_changed_images, sender=model,
+                              dispatch_uid=f'image_derivatives_{model.__name__}')
+
+        # Content-addressed media: drop blob references on replace/delete
+        for model in self.get_models():
+            if file_fields(model):
+                pre_save.connect(release_replaced_files, sender=model,
+                                 dispatch_uid=f'media_release_replaced_{model.__name__}')
+                post_delete.connect(release_deleted_files, sender=model,
+                                    dispatch_uid=f'media_release_deleted_{model.__name__}')
+
+        # Student documents: normalized copies built after upload
+        for model in self.get_models():
+            if normalized_fields(model):
+                post_save.connect(queue_document_normalization, sender=model,
+                                  dispatch_uid=f'document_normalization_{model.__name__}')
+
+        # Live admin queue counters (SSE) - refreshed when pending items change
+        for model_name in ('StudentCardPurchase', 'StudentDocument', 'ManagementQuotaApplication'):
+            model = self.get_model(model_name)
+            post_save.connect(publish_admin_queues, sender=model, dispatch_uid=f'live_queues_save_{model_name}')
+            post_delete.connect(publish_admin_queues, sender=model, dispatch_uid=f'live_queues_delete_{model_name}')
+
+        # Cached state dropdowns (lookups.py)
+        pre_save.connect(remember_state_country, sender=self.get_model('State'), dispatch_uid='lookups_states_country')
+        post_save.connect(invalidate_states, sender=self.get_model('State'), dispatch_uid='lookups_states_save')
+        post_delete.connect(invalidate_states, sender=self.get_model('State'), dispatch_uid='lookups_states_delete')
+
+        # SQLite production profile: WAL, busy timeout etc. on every connection
+        connection_created.connect(configure_connection, dispatch_uid='sqlite_production_profile')
+
+        # Request profiling (profiling.py) - the timers only run for sampled requests
+        connection_created.connect(install_sql_timer, dispatch_uid='profiling_sql_timer')
+        install_template_timer()
@@ -0,0 +1,373 @@
+"""
+In-process HTTP benchmarking helpers (used by the benchmark_* commands).
+
+Requests go through the real Django handlers - WSGIHandler for the WSGI path,
+ASGIHandler for the ASGI path - with the project's middleware, URLconf and
+database, but without a network server in front:
+
+* WSGI: a thread pool of `concurrency` threads, like one gthread worker
+* ASGI: one event loop with `concurrency` requests in flight, like one
+  uvicorn worker - through c4s.asgi.application, as deployed
+
+With `seconds`, a run stops starting new requests after that long, so slow
+pages get fewer samples instead of taking minutes.
+
+PAGE_SCENARIOS (benchmark_pages) are the hot student and admin pages on a
+database filled by seed_perf.
+"""
+
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+
+def benchmark_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+    return 'localhost' if 'localhost' in hosts or not hosts else hosts[0]
+
+
+def session_cookie(user):
+    """Cookie header value for a logged-in session of `user`"""
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    return f'{settings.SESSION_COOKIE_NAME}={store.session_key}'
+
+
+# ==================== RESULTS ====================
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, statuses):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'errors': sum(1 for status in statuses if status >= 400),
+    }
+
+
+# ==================== WSGI ====================
+
+def wsgi_environ(url, cookie=None):
+    parts = urlsplit(url)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': benchmark_host(),
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': benchmark_host(),
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(b''),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if cookie:
+        environ['HTTP_COOKIE'] = cookie
+    return environ
+
+
+def run_wsgi(urls, requests, concurrency, cookie=None, seconds=None):
+    """Send `requests` GETs (cycling through `urls`) to the WSGI handler"""
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import close_old_connections
+
+    handler = WSGIHandler()
+    deadline = time.perf_counter() + seconds if seconds else None
+
+    def call(i):
+        if deadline and i >= concurrency and time.perf_counter() > deadline:
+            return None
+        status = []
+
+        def start_response(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(' ', 1)[0]))
+
+        started = time.perf_counter()
+        body = handler(wsgi_environ(urls[i % len(urls)], cookie), start_response)
+        for _chunk in body:
+            pass
+        if hasattr(body, 'close'):
+            body.close()
+        close_old_connections()
+        return time.perf_counter() - started, status[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = [result for result in pool.map(call, range(requests)) if result]
+    elapsed = time.perf_counter() - started
+    return summarize([r[0] for r in results], elapsed, [r[1] for r in results])
+
+
+# ==================== ASGI ====================
+
+def asgi_scope(url, cookie=None):
+    parts = urlsplit(url)
+    headers = [(b'host', benchmark_host().encode())]
+    if cookie:
+        headers.append((b'cookie', cookie.encode()))
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': parts.path, 'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(), 'root_path': '', 'headers': headers,
+        'client': ('127.0.0.1', 50000), 'server': (benchmark_host(), 80),
+    }
+
+
+async def asgi_request(application, scope):
+    status = []
+    done = asyncio.Event()
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await application(scope, receive, send)
+    return status[0] if status else 500
+
+
+def run_asgi(urls, requests, concurrency, cookie=None, seconds=None):
+    """Send `requests` GETs (cycling through `urls`) to the ASGI handler"""
+    from c4s.asgi import application
+
+    deadline = time.perf_counter() + seconds if seconds else None
+
+    async def main():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(i):
+            async with semaphore:
+                if deadline and i >= concurrency and time.perf_counter() > deadline:
+                    return None
+                started = time.perf_counter()
+                status = await asgi_request(application, asgi_scope(urls[i % len(urls)], cookie))
+                return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(i) for i in range(requests)))
+        return [result for result in results if result], time.perf_counter() - started
+
+    results, elapsed = asyncio.run(main())
+    return summarize([r[0] for r in results], elapsed, [r[1] for r in results])
+
+
+def count_queries(url, cookie=None):
+    """Queries (all databases) of one GET through the WSGI handler, run in this thread"""
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.db import connections
+
+    executed = []
+
+    def counter(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            # Connect first: connection_created appends the profiling timer to
+            # execute_wrappers, which would then be popped instead of counter
+            connection.ensure_connection()
+            stack.enter_context(connection.execute_wrapper(counter))
+        body = WSGIHandler()(wsgi_environ(url, cookie), lambda status, headers, exc_info=None: None)
+        for _chunk in body:
+            pass
+        body.close()
+    return len(executed)
+
+
+# ==================== PAGE SCENARIOS ====================
+
+# Hot student and admin pages: (URL name, persona). The nested subcategory is
+# the All India one - the distance / online / abroad subcategory URLs are
+# matched by their page_detail pattern first.
+PAGE_SCENARIOS = [
+    ('home', 'anonymous'),
+    ('card_detail_view', 'student'),
+    ('subcategory_detail_view', 'student'),
+    ('page_detail_view', 'student'),
+    ('admission_abroad_page_detail', 'student'),
+    ('student_comparisons_list', 'student'),
+    ('student_notifications', 'student'),
+    ('admin_management_quota_applications', 'admin'),
+    ('admin_documents_list', 'admin'),
+    ('admin_doubts_list', 'admin'),
+    ('admin_complaints_list', 'admin'),
+    ('admin_counselling_india_payments', 'admin'),
+]
+
+
+def page_scenarios(only=()):
+    """[(label, url, cookie)] of PAGE_SCENARIOS on a database filled by seed_perf"""
+    from django.urls import reverse
+
+    from . import urls
+    from .perf_data import load_dataset, route_kwargs
+
+    dataset = load_dataset()
+    patterns = {pattern.name: pattern for pattern in urls.urlpatterns}
+    cookies = {'anonymous': None, 'student': session_cookie(dataset.student_user),
+               'admin': session_cookie(dataset.admin)}
+    scenarios = []
+    for name, persona in PAGE_SCENARIOS:
+        label = f'{name}[{persona}]'
+        if only and name not in only and label not in only:
+            continue
+        url = reverse(f'main_app:{name}', kwargs=route_kwargs(patterns[name], dataset))
+        scenarios.append((label, url, cookies[persona]))
+    return scenarios
+
+
+def compare(baseline, results, tolerance):
+    """
+    Regressions of `results` against `baseline` ({scenario: {handler: summary}}):
+    more queries per request, or p95 / throughput worse by more than `tolerance`
+    """
+    regressions = []
+    for label, handlers in results.items():
+        for handler, current in handlers.items():
+            before = baseline.get(label, {}).get(handler)
+            if before is None:
+                continue
+            if current['queries'] > before['queries']:
+                regressions.append(f"{label} {handler}: {before['queries']} -> {current['queries']} queries")
+            if current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{label} {handler}: p95 {before['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+            if current['rps'] < before['rps'] / (1 + tolerance):
+                regressions.append(f"{label} {handler}: {before['rps']:.1f} -> {current['rps']:.1f} req/s")
+    return regressions
+
+
+# ==================== SQLITE CONCURRENCY ====================
+
+SQLITE_SETUP = """
+CREATE TABLE college (id INTEGER PRIMARY KEY, name TEXT, views INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE purchase (id INTEGER PRIMARY KEY, college_id INTEGER, amount INTEGER, created REAL);
+CREATE INDEX purchase_college ON purchase (college_id);
+"""
+
+
+def create_sqlite_fixture(path, rows=2000):
+    import sqlite3
+
+    with sqlite3.connect(path) as db:
+        db.executescript(SQLITE_SETUP)
+        db.executemany('INSERT INTO college (id, name) VALUES (?, ?)',
+                       [(i, f'College {i}') for i in range(1, rows + 1)])
+        db.executemany('INSERT INTO purchase (college_id, amount, created) VALUES (?, ?, ?)',
+                       [(i % rows + 1, 500, time.time()) for i in range(rows * 5)])
+    return rows
+
+
+def run_sqlite_mix(path, pragmas, transaction_mode, readers, writers, seconds, rows=2000):
+    """
+    `readers` threads run page-sized SELECTs (college + purchase count), while
+    `writers` threads do a view-counter style read-modify-write plus an
+    insert in one transaction, for `seconds`. Returns read and write results
+    and the number of "database is locked" failures.
+    """
+    import random
+    import sqlite3
+    import threading
+
+    from .sqlite import apply_pragmas
+
+    timeout = pragmas.get('busy_timeout', 5000) / 1000
+    stop = threading.Event()
+    results = {'read': [], 'write': []}
+    locked = []
+
+    def connect():
+        db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        apply_pragmas(db.cursor(), pragmas)
+        return db
+
+    def reader():
+        db = connect()
+        latencies = []
+        while not stop.is_set():
+            start = random.randint(1, rows - 20)
+            started = time.perf_counter()
+            try:
+                db.execute(
+                    'SELECT c.id, c.name, c.views, (SELECT COUNT(*) FROM purchase p WHERE p.college_id = c.id) '
+                    'FROM college c WHERE c.id BETWEEN ? AND ?', (start, start + 19)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                locked.append(1)
+                continue
+            latencies.append(time.perf_counter() - started)
+        db.close()
+        results['read'].append(latencies)
+
+    def writer():
+        db = connect()
+        latencies = []
+        while not stop.is_set():
+            college_id = random.randint(1, rows)
+            started = time.perf_counter()
+            try:
+                db.execute(f'BEGIN {transaction_mode}')
+                views = db.execute('SELECT views FROM college WHERE id = ?', (college_id,)).fetchone()[0]
+                db.execute('UPDATE college SET views = ? WHERE id = ?', (views + 1, college_id))
+                db.execute('INSERT INTO purchase (college_id, amount, created) VALUES (?, ?, ?)',
+                           (college_id, 500, time.time()))
+                db.execute('COMMIT')
+            except sqlite3.OperationalError:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                locked.append(1)
+                continue
+            latencies.append(time.perf_counter() - started)
+        db.close()
+        results['write'].append(latencies)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        kind: summarize([value for latencies in results[kind] for value in latencies], seconds, [])
+        for kind in ('read', 'write')
+    } | {'locked': len(locked)}
@@ -0,0 +1,188 @@
+"""
+Optimizer for images embedded in CKEditor page bodies.
+
+Admins paste full-size screenshots and phone photos into ContentPage.content
+and its siblings. Uploads through the CKEditor image dialog go through
+OptimizingImageBackend (CKEDITOR_IMAGE_BACKEND): the image is resized to the
+content column width, re-encoded (WebP, or JPEG/PNG when WebP isn't
+available) and stored under a name derived from the SHA-256 of the original
+bytes - pasting the same screenshot twice reuses the first file.
+
+Images already referenced by stored content are migrated with
+``python manage.py optimize_content_images``, which rewrites the <img> tags to
+the optimized files and adds width/height attributes.
+"""
+
+import hashlib
+import io
+import os
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from ckeditor_uploader.backends import PillowBackend
+from ckeditor_uploader.utils import get_thumb_filename
+
+from .content_render import media_path_for_url, rewrite_media_url
+
+
+CONTENT_IMAGE_DIR = 'optimized'
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_ATTR_RE = re.compile(r'''\ssrc\s*=\s*(["'])(.*?)\1''', re.IGNORECASE | re.DOTALL)
+
+
+def content_image_max_width():
+    return getattr(settings, 'CONTENT_IMAGE_MAX_WIDTH', 1200)
+
+
+def _encoding_for(image):
+    from PIL import features
+
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+    if features.check('webp'):
+        return 'WEBP', 'webp', {'quality': 82, 'method': 6}, has_alpha
+    if has_alpha:
+        return 'PNG', 'png', {'optimize': True}, has_alpha
+    return 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}, has_alpha
+
+
+# EXIF orientations that swap width and height (ImageOps.exif_transpose)
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def optimize_content_image(data):
+    """
+    Resize + re-encode raw image bytes for use inside page content.
+
+    Returns (name, optimized_bytes, (width, height)) with a storage name like
+    ``uploads/optimized/ab/ab12...-1200.webp``, or None if `data` isn't a
+    still image Pillow can read (animated GIFs, SVGs, PDFs are left alone).
+    optimized_bytes is None when that file already exists - the name only
+    needs the hash and the image header, so a repeat upload is never decoded.
+    """
+    from PIL import Image, ImageOps
+
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        image = Image.open(io.BytesIO(data))  # reads the header only
+        if getattr(image, 'is_animated', False):
+            return None
+        width, height = image.size
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+    except Exception:
+        return None
+
+    fmt, extension, options, has_alpha = _encoding_for(image)
+    max_width = content_image_max_width()
+    if width > max_width:
+        width, height = max_width, max(1, round(height * max_width / width))
+
+    name = (f'{settings.CKEDITOR_UPLOAD_PATH.rstrip("/")}/{CONTENT_IMAGE_DIR}/'
+            f'{digest[:2]}/{digest[:32]}-{width}.{extension}')
+    if default_storage.exists(name):
+        return name, None, (width, height)
+
+    try:
+        image = ImageOps.exif_transpose(image).convert('RGBA' if has_alpha else 'RGB')
+    except Exception:
+        return None
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return name, buffer.getvalue(), image.size
+
+
+def store_content_image(data):
+    """Optimize + save image bytes, reusing an existing identical upload"""
+    result = optimize_content_image(data)
+    if result is None:
+        return None
+    name, optimized, size = result
+    if optimized is not None:
+        name = default_storage.save(name, ContentFile(optimized))
+    return name, size
+
+
+class OptimizingImageBackend(PillowBackend):
+    """CKEDITOR_IMAGE_BACKEND that resizes, re-encodes and deduplicates uploads"""
+
+    def save_as(self, filepath):
+        # Hashed before anything is decoded: a repeat upload is just a lookup
+        self.file_object.seek(0)
+        stored = store_content_image(self.file_object.read())
+        self.file_object.seek(0)
+        if stored is None:
+            # Not a still image (PDF, animated GIF, ...) - keep CKEditor's default behaviour
+            return super().save_as(filepath)
+
+        saved_path, _size = stored
+        thumbnail = self._thumbnail_name(saved_path)
+        if not self.storage_engine.exists(thumbnail):
+            with self.storage_engine.open(saved_path) as fh:
+                self.create_thumbnail(fh, saved_path)
+        return saved_path
+
+    @staticmethod
+    def _thumbnail_name(path):
+        return get_thumb_filename(path)
+
+
+# ==================== REWRITING STORED CONTENT ====================
+
+def _set_attr(tag, name, value):
+    pattern = re.compile(rf'''\s{name}\s*=\s*(["']).*?\1|\s{name}\s*=\s*[^\s>]+''', re.IGNORECASE)
+    tag = pattern.sub('', tag)
+    end = '/>' if tag.endswith('/>') else '>'
+    return f'{tag[:-len(end)].rstrip()} {name}="{value}"{end}'
+
+
+def rewrite_content_images(html, optimized_cache=None):
+    """
+    Point <img> tags at optimized copies of local media images.
+
+    Returns (new_html, changed_count). `optimized_cache` maps original URL ->
+    (new_url, (w, h)) so a backfill run encodes each file only once.
+    """
+    if not html:
+        return html, 0
+    cache = optimized_cache if optimized_cache is not None else {}
+    optimized_prefix = f'{settings.MEDIA_URL}{settings.CKEDITOR_UPLOAD_PATH.rstrip("/")}/{CONTENT_IMAGE_DIR}/'
+    changed = 0
+
+    def replace(match):
+        nonlocal changed
+        tag = match.group(0)
+        src_match = SRC_ATTR_RE.search(tag)
+        if not src_match:
+            return tag
+
+        src = rewrite_media_url(src_match.group(2))
+        if src.startswith(optimized_prefix):
+            return tag
+
+        if src not in cache:
+            cache[src] = None
+            path = media_path_for_url(src)
+            if path is not None and os.path.isfile(path):
+                with open(path, 'rb') as fh:
+                    stored = store_content_image(fh.read())
+                if stored is not None:
+                    name, size = stored
+                    cache[src] = (default_storage.url(name), size)
+        if cache[src] is None:
+            return tag
+
+        new_url, (width, height) = cache[src]
+        tag = _set_attr(tag, 'src', new_url)
+        tag = _set_attr(tag, 'width', width)
+        tag = _set_attr(tag, 'height', height)
+        changed += 1
+        return tag
+
+    return IMG_TAG_RE.sub(replace, html), changed
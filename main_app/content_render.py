@@ -0,0 +1,342 @@
+"""
+Save-time rendering for CKEditor (RichTextUploadingField) content.
+
+Page bodies are sanitized, image tags are rewritten (site-relative media URLs,
+lazy loading, width/height) and a table of contents + plain-text excerpt are
+extracted once when the page is saved. Detail views then just emit the stored
+``rendered_content`` string instead of processing raw HTML per request.
+"""
+
+import html
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils.text import Truncator, slugify
+
+
+RenderedContent = namedtuple('RenderedContent', ['html', 'toc', 'excerpt'])
+
+# Fields written by apply_rendered_content() - saved together with `content`
+RENDERED_FIELDS = ('rendered_content', 'content_toc', 'content_excerpt')
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'cite', 'code', 'col',
+    'colgroup', 'dd', 'div', 'dl', 'dt', 'em', 'figcaption', 'figure', 'h1',
+    'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'iframe', 'img', 'li', 'ol', 'p',
+    'pre', 's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'table',
+    'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+
+VOID_TAGS = {'br', 'col', 'hr', 'img'}
+
+# Tags that don't break words in the plain-text excerpt
+INLINE_TAGS = {'a', 'abbr', 'b', 'cite', 'code', 'em', 'i', 's', 'small', 'span', 'strike', 'strong', 'sub', 'sup', 'u'}
+
+# Content of these tags is dropped completely (not just the tag itself)
+DROP_CONTENT_TAGS = {'script', 'style', 'noscript', 'template', 'object', 'embed', 'form'}
+
+GLOBAL_ATTRIBUTES = {'class', 'style', 'title', 'id', 'dir', 'lang'}
+
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'target', 'rel', 'name'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'iframe': {'src', 'width', 'height', 'frameborder', 'allowfullscreen', 'allow'},
+    'td': {'colspan', 'rowspan', 'align', 'valign'},
+    'th': {'colspan', 'rowspan', 'align', 'valign', 'scope'},
+    'table': {'border', 'cellpadding', 'cellspacing', 'align', 'summary'},
+    'col': {'span', 'width'},
+    'colgroup': {'span', 'width'},
+    'ol': {'start', 'type'},
+    'ul': {'type'},
+}
+
+ALLOWED_URL_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+
+# Embeds allowed inside page bodies (YouTube videos, Google maps)
+DEFAULT_IFRAME_HOSTS = (
+    'www.youtube.com', 'youtube.com', 'www.youtube-nocookie.com',
+    'player.vimeo.com', 'www.google.com', 'maps.google.com',
+)
+
+TOC_TAGS = {'h2', 'h3'}
+
+EXCERPT_LENGTH = 300
+
+UNSAFE_STYLE_RE = re.compile(r'expression\s*\(|javascript:|url\s*\(|behavior\s*:', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+DATA_IMAGE_RE = re.compile(r'data:image/(png|jpe?g|gif|webp);base64,', re.IGNORECASE)
+
+
+def _iframe_hosts():
+    return set(getattr(settings, 'CONTENT_IFRAME_HOSTS', DEFAULT_IFRAME_HOSTS))
+
+
+def _is_safe_url(url, tag=None):
+    url = url.strip()
+    if tag == 'img' and DATA_IMAGE_RE.match(url):
+        return True
+    scheme = urlsplit(url).scheme.lower()
+    return scheme in ALLOWED_URL_SCHEMES
+
+
+def rewrite_media_url(src):
+    """
+    Normalize image URLs pointing at our own media files.
+
+    CKEditor stores whatever URL the admin's browser saw, e.g.
+    ``https://c4s.webesidetechnology.com/media/uploads/x.png`` or
+    ``media/uploads/x.png``. Both become ``/media/uploads/x.png`` so pages
+    work on every host (staging, localhost) and hit the same cache entry.
+    """
+    src = src.strip()
+    parts = urlsplit(src)
+    media_url = settings.MEDIA_URL
+
+    if parts.netloc:
+        if parts.hostname not in settings.ALLOWED_HOSTS:
+            return src
+        src = parts.path + (f'?{parts.query}' if parts.query else '')
+    elif not src.startswith('/') and ('/' + src).startswith(media_url):
+        src = '/' + src
+    return src
+
+
+def media_path_for_url(src):
+    """Return the MEDIA_ROOT path for a site-relative media URL (or None)"""
+    media_url = settings.MEDIA_URL
+    path = urlsplit(src).path
+    if not path.startswith(media_url):
+        return None
+    relative = path[len(media_url):]
+    if not relative or '..' in relative.split('/'):
+        return None
+    return Path(settings.MEDIA_ROOT) / relative
+
+
+def image_dimensions(src):
+    """(width, height) of a local media image, or None if it can't be read"""
+    file_path = media_path_for_url(src)
+    if file_path is None:
+        return None
+    try:
+        from PIL import Image
+        with Image.open(file_path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+class _ContentRenderer(HTMLParser):
+    """Single-pass sanitizer + TOC/excerpt extractor for CKEditor HTML"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.open_tags = []
+        self.drop_tag = None    # tag whose content is currently being dropped
+        self.drop_depth = 0
+        self.text_parts = []
+        self.toc = []
+        self.heading = None     # (tag, index of start tag in self.out, attrs, [text])
+        self.used_ids = set()
+
+    # ---------- helpers ----------
+
+    def _clean_attrs(self, tag, attrs):
+        allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = {}
+        for name, value in attrs:
+            name = name.lower()
+            if name not in allowed or name.startswith('on'):
+                continue
+            value = value or ''
+            if name in ('href', 'src') and not _is_safe_url(value, tag):
+                continue
+            if name == 'style':
+                if UNSAFE_STYLE_RE.search(value):
+                    continue
+            cleaned[name] = value
+        return cleaned
+
+    def _format_tag(self, tag, attrs):
+        parts = [tag]
+        for name, value in attrs.items():
+            if value is None:
+                parts.append(name)
+            else:
+                parts.append(f'{name}="{html.escape(value, quote=True)}"')
+        return '<' + ' '.join(parts) + '>'
+
+    def _prepare_img(self, attrs):
+        src = attrs.get('src')
+        if not src:
+            return None
+        src = rewrite_media_url(src)
+        attrs['src'] = src
+        attrs.setdefault('alt', '')
+        attrs['loading'] = 'lazy'
+        attrs['decoding'] = 'async'
+        if not (attrs.get('width') and attrs.get('height')):
+            dimensions = image_dimensions(src)
+            if dimensions:
+                attrs['width'], attrs['height'] = (str(d) for d in dimensions)
+        return attrs
+
+    def _prepare_link(self, attrs):
+        if attrs.get('target') == '_blank':
+            attrs['rel'] = 'noopener noreferrer'
+        return attrs
+
+    def _prepare_iframe(self, attrs):
+        host = urlsplit(attrs.get('src', '')).hostname
+        if host not in _iframe_hosts():
+            return None
+        attrs['loading'] = 'lazy'
+        return attrs
+
+    def _unique_id(self, text, base=None):
+        base = base or slugify(text)[:80] or 'section'
+        anchor = base
+        n = 2
+        while anchor in self.used_ids:
+            anchor = f'{base}-{n}'
+            n += 1
+        self.used_ids.add(anchor)
+        return anchor
+
+    # ---------- HTMLParser hooks ----------
+
+    def _start_dropping(self, tag):
+        self.drop_tag = tag
+        self.drop_depth = 1
+
+    def handle_starttag(self, tag, attrs):
+        if self.drop_tag:
+            if tag == self.drop_tag:
+                self.drop_depth += 1
+            return
+        if tag in DROP_CONTENT_TAGS:
+            self._start_dropping(tag)
+            return
+        if tag not in ALLOWED_TAGS:
+            return
+
+        attrs = self._clean_attrs(tag, attrs)
+        if tag == 'img':
+            attrs = self._prepare_img(attrs)
+        elif tag == 'a':
+            attrs = self._prepare_link(attrs)
+        elif tag == 'iframe':
+            attrs = self._prepare_iframe(attrs)
+            if attrs is None:
+                self._start_dropping(tag)
+                return
+        if attrs is None:
+            return
+
+        if tag in TOC_TAGS and self.heading is None:
+            self.heading = (tag, len(self.out), attrs, [])
+
+        self.out.append(self._format_tag(tag, attrs))
+        if tag not in INLINE_TAGS:
+            self.text_parts.append(' ')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.drop_tag:
+            if tag == self.drop_tag:
+                self.drop_depth -= 1
+                if not self.drop_depth:
+                    self.drop_tag = None
+            return
+        if tag not in self.open_tags:
+            return
+        # Close any tags left open inside this one
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self._close_tag(current)
+            if current == tag:
+                break
+
+    def _close_tag(self, tag):
+        self.out.append(f'</{tag}>')
+        if tag not in INLINE_TAGS:
+            self.text_parts.append(' ')
+        if self.heading and self.heading[0] == tag:
+            self._finish_heading()
+
+    def _finish_heading(self):
+        tag, index, attrs, text_parts = self.heading
+        self.heading = None
+        text = WHITESPACE_RE.sub(' ', ''.join(text_parts)).strip()
+        if not text:
+            return
+        # Explicit ids from the editor are kept, but deduplicated like the generated ones
+        anchor = self._unique_id(text, base=attrs.get('id'))
+        attrs['id'] = anchor
+        self.out[index] = self._format_tag(tag, attrs)
+        self.toc.append({'level': int(tag[1]), 'id': anchor, 'title': text})
+
+    def handle_data(self, data):
+        if self.drop_tag:
+            return
+        self.out.append(html.escape(data, quote=False))
+        self.text_parts.append(data)
+        if self.heading:
+            self.heading[3].append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self._close_tag(self.open_tags.pop())
+
+
+def render_rich_content(raw_html):
+    """
+    Sanitize and pre-render CKEditor HTML.
+
+    Returns RenderedContent(html, toc, excerpt) where `toc` is a list of
+    {'level', 'id', 'title'} dicts for h2/h3 headings.
+    """
+    if not raw_html:
+        return RenderedContent('', [], '')
+
+    renderer = _ContentRenderer()
+    renderer.feed(raw_html)
+    renderer.close()
+
+    text = WHITESPACE_RE.sub(' ', ''.join(renderer.text_parts)).strip()
+    excerpt = Truncator(text).chars(EXCERPT_LENGTH)
+    return RenderedContent(''.join(renderer.out), renderer.toc, excerpt)
+
+
+def apply_rendered_content(instance, update_fields=None):
+    """
+    Fill instance.rendered_content / content_toc / content_excerpt from
+    instance.content. Called from model save().
+
+    Returns the update_fields to pass on to Model.save() - rendering is
+    skipped for partial saves that don't touch `content`
+    (e.g. increment_views()).
+    """
+    if update_fields is not None and 'content' not in update_fields:
+        return update_fields
+
+    rendered = render_rich_content(instance.content)
+    instance.rendered_content = rendered.html
+    instance.content_toc = rendered.toc
+    instance.content_excerpt = rendered.excerpt
+
+    if update_fields is not None:
+        update_fields = set(update_fields) | set(RENDERED_FIELDS)
+    return update_fields
@@ -0,0 +1,9 @@
+from .notifications import unread_count_for_user
+
+
+def notifications(request):
+    """`unread_notifications` for the header badge - only queried if a template uses it"""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications': lambda: unread_count_for_user(user.id)}
@@ -0,0 +1,125 @@
+"""
+Streaming ZIP bundles of student / application documents for admins.
+
+The archive is produced while it is being sent: zipfile writes into a small
+buffer that is flushed to the client after every chunk, entries use data
+descriptors (no seeking back to patch headers) and files are stored, not
+recompressed - PDFs and JPEGs don't shrink anyway. Memory use stays at one
+read chunk no matter how large the bundle is, nothing touches /tmp and the
+first bytes go out before the last file has even been opened. Normalized
+copies (uploads.py) are bundled where available.
+"""
+
+import os
+import zipfile
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+from django.utils.text import get_valid_filename
+
+from .models import ManagementQuotaApplication, StudentDocument, UserRegistration
+from .uploads import preferred_file
+
+
+CHUNK_SIZE = 64 * 1024
+
+APPLICATION_FILE_FIELDS = ('tenth_marksheet', 'twelfth_marksheet', 'exam_scorecard')
+
+
+class _ZipBuffer:
+    """Write-only, non-seekable sink for ZipFile; drained after each write"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of `entries`, an iterable of (archive_name, FieldFile).
+
+    Files missing on disk are skipped; duplicate archive names get a suffix.
+    """
+    buffer = _ZipBuffer()
+    used_names = set()
+
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, field_file in entries:
+            try:
+                path = field_file.path
+                stat = os.stat(path)
+            except (ValueError, OSError):
+                continue
+
+            base, ext = os.path.splitext(arcname)
+            n = 2
+            while arcname in used_names:
+                arcname = f'{base}-{n}{ext}'
+                n += 1
+            used_names.add(arcname)
+
+            info = zipfile.ZipInfo(arcname, date_time=datetime.fromtimestamp(stat.st_mtime).timetuple()[:6])
+            info.file_size = stat.st_size
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, 'rb') as src, archive.open(info, mode='w') as dest:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                    dest.write(chunk)
+                    yield buffer.drain()
+            # data descriptor written on close
+            yield buffer.drain()
+    # central directory
+    yield buffer.drain()
+
+
+def _arcname(folder, label, field_file):
+    ext = os.path.splitext(field_file.name)[1].lower()
+    name = get_valid_filename(f'{label}{ext}')
+    folder = '/'.join(get_valid_filename(part) for part in folder.split('/') if part)
+    return f'{folder}/{name}' if folder else name
+
+
+def student_document_entries(student):
+    """Uploaded documents + management quota files of one student (auth User)"""
+    for doc in StudentDocument.objects.filter(student=student).order_by('document_type'):
+        field_file = preferred_file(doc, 'document_file')
+        yield _arcname('', doc.get_document_type_display().rstrip(' *'), field_file), field_file
+
+    registration = UserRegistration.objects.filter(user=student).first()
+    if registration is not None:
+        applications = ManagementQuotaApplication.objects.filter(student=registration).select_related('college__college')
+        for application in applications:
+            yield from application_entries(application, folder=f'management_quota/{application.college.college.name}')
+
+
+def application_entries(application, folder=''):
+    for field_name in APPLICATION_FILE_FIELDS:
+        field_file = preferred_file(application, field_name)
+        if field_file:
+            yield _arcname(folder, field_name, field_file), field_file
+
+
+def college_application_entries(mq_college):
+    """Files of every application to a ManagementQuotaCollege, one folder per applicant"""
+    applications = mq_college.applications.order_by('id').iterator()
+    for application in applications:
+        yield from application_entries(application, folder=f'{application.id}-{application.full_name}')
+
+
+def zip_response(entries, filename):
+    response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{get_valid_filename(filename)}"'
+    response['Cache-Control'] = 'private, no-store'
+    # Don't let nginx buffer the whole archive before sending it on
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,278 @@
+"""
+Resized derivatives for card, icon, featured and college images.
+
+Uploaded originals (sometimes multi-MB PNGs shown as 64px icons) are turned
+into WebP (optionally AVIF, JPEG/PNG when WebP isn't available) copies at the
+widths configured per field in IMAGE_DERIVATIVE_WIDTHS. Derivatives are named
+by the SHA-256 of the source bytes, so re-uploads of the same file share them.
+
+Generation runs in a build_image_derivatives job (tasks.py, 'media' queue) -
+the upload request never waits for Pillow. The result is stored as a manifest in
+the model's ``<field>_variants`` JSON field, which get_image()/get_icon()/
+get_featured_image() and the ``*_srcset`` helpers read with no extra queries.
+
+The same job computes a tiny blurred LQIP (low quality image placeholder) as
+an inline data URI, and cards without any image get a locally generated SVG
+placeholder - card grids paint without a single external request.
+
+Manifest format::
+
+    {"source": "admission_abroad_sub/3211448.png", "hash": "9f2c...",
+     "width": 512, "height": 512, "lqip": "data:image/webp;base64,...",
+     "variants": {"webp": [[64, "derivatives/9f/9f2c...-64.webp"], ...]}}
+"""
+
+import base64
+import functools
+import hashlib
+import io
+import os
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+
+# Widths generated per image field (largest one is used as the default `src`)
+DEFAULT_DERIVATIVE_WIDTHS = {
+    'card_image': (96, 192, 400),
+    'icon_image': (64, 128),
+    'featured_image': (400, 800, 1200),
+    'college_image': (300, 600),
+}
+
+DERIVATIVE_DIR = 'derivatives'
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'avif': 'avif', 'jpeg': 'jpg', 'png': 'png'}
+
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 6},
+    'avif': {'quality': 60},
+    'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+}
+
+
+def derivative_widths(field_name):
+    widths = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', DEFAULT_DERIVATIVE_WIDTHS)
+    return tuple(widths.get(field_name, ()))
+
+
+def derivative_formats():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ('webp',)))
+
+
+def variants_field_name(field_name):
+    return f'{field_name}_variants'
+
+
+# ==================== PLACEHOLDERS ====================
+
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{w}" height="{h}" viewBox="0 0 {w} {h}">'
+    '<rect width="{w}" height="{h}" fill="{background}"/>'
+    '<g fill="{foreground}" transform="translate({x} {y}) scale({scale})">'
+    '<circle cx="7" cy="7" r="3"/><path d="M0 20 7 12l4 4 5-7 8 11z"/></g></svg>'
+)
+
+
+@functools.lru_cache(maxsize=32)
+def placeholder_image(width, height, background='#eef0f3', foreground='#c3c8d0'):
+    """
+    Inline SVG data URI shown when a card/page has no image.
+
+    Replaces the old via.placeholder.com URLs - no third-party request, works
+    in offline staging, and is a few hundred bytes inline.
+    """
+    scale = round(min(width, height) / 24 / 2.5, 3)
+    svg = PLACEHOLDER_SVG.format(
+        w=width, h=height, background=background, foreground=foreground,
+        x=round(width / 2 - 12 * scale, 1), y=round(height / 2 - 10 * scale, 1), scale=scale,
+    )
+    return 'data:image/svg+xml,' + quote(svg, safe='=:/(),.')
+
+
+# ==================== BUILDING ====================
+# Nothing below may touch Django settings or the database - arguments are
+# plain paths and tuples (the build_image_derivatives command runs it in a process pool).
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _supported_format(fmt, has_alpha):
+    from PIL import features
+
+    if fmt in ('webp', 'avif') and not features.check(fmt):
+        return 'png' if has_alpha else 'jpeg'
+    if fmt == 'jpeg' and has_alpha:
+        return 'png'
+    return fmt
+
+
+LQIP_WIDTH = 20
+
+
+def build_lqip(image, has_alpha):
+    """~20px wide, blurred copy of the image as a base64 data URI (a few hundred bytes)"""
+    from PIL import ImageFilter, features
+
+    height = max(1, round(image.height * LQIP_WIDTH / image.width))
+    tiny = image.resize((LQIP_WIDTH, height)).filter(ImageFilter.GaussianBlur(1))
+    if features.check('webp'):
+        fmt, mime, options = 'WEBP', 'image/webp', {'quality': 40}
+    elif has_alpha:
+        fmt, mime, options = 'PNG', 'image/png', {'optimize': True}
+    else:
+        fmt, mime, options = 'JPEG', 'image/jpeg', {'quality': 40}
+        tiny = tiny.convert('RGB')
+
+    buffer = io.BytesIO()
+    tiny.save(buffer, format=fmt, **options)
+    return f'data:{mime};base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def build_derivatives(media_root, source_name, widths, formats):
+    """
+    Create resized copies of MEDIA_ROOT/source_name and return the manifest.
+
+    Existing derivatives (same content hash + width) are reused, so running
+    this twice - or for two duplicate uploads - only encodes once.
+    """
+    from PIL import Image, ImageOps
+
+    source_path = os.path.join(media_root, source_name)
+    manifest = {'source': source_name, 'variants': {}}
+
+    try:
+        content_hash = file_content_hash(source_path)
+        with Image.open(source_path) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+            image = original.convert('RGBA' if has_alpha else 'RGB')
+    except Exception as exc:
+        # SVGs, corrupt uploads etc. - templates keep using the original file
+        manifest['error'] = str(exc)[:200]
+        return manifest
+
+    manifest.update({
+        'hash': content_hash,
+        'width': image.width,
+        'height': image.height,
+        'lqip': build_lqip(image, has_alpha),
+    })
+    target_widths = sorted({min(w, image.width) for w in widths})
+    out_dir = os.path.join(media_root, DERIVATIVE_DIR, content_hash[:2])
+    os.makedirs(out_dir, exist_ok=True)
+
+    for requested in formats:
+        fmt = _supported_format(requested, has_alpha)
+        entries = []
+        for width in target_widths:
+            name = f'{DERIVATIVE_DIR}/{content_hash[:2]}/{content_hash[:32]}-{width}.{FORMAT_EXTENSIONS[fmt]}'
+            path = os.path.join(media_root, name)
+            if not os.path.exists(path):
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                if fmt == 'jpeg':
+                    resized = resized.convert('RGB')
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                resized.save(tmp_path, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                os.replace(tmp_path, path)
+            entries.append([width, name])
+        manifest['variants'][fmt] = entries
+
+    return manifest
+
+
+# ==================== SCHEDULING ====================
+
+def store_derivatives(model_label, pk, field_name, source_name):
+    """Build the derivatives of one upload and save the manifest, unless the file was replaced meanwhile"""
+    current = apps.get_model(model_label).objects.filter(pk=pk, **{field_name: source_name})
+    if not current.exists():
+        return False
+    manifest = build_derivatives(str(settings.MEDIA_ROOT), source_name, derivative_widths(field_name),
+                                 derivative_formats())
+    current.update(**{variants_field_name(field_name): manifest})
+    return 'error' not in manifest
+
+
+def schedule_derivatives(instance, field_name):
+    """Queue derivative generation for instance.<field_name> - the job commits with the upload"""
+    from .tasks import build_image_derivatives
+
+    file = getattr(instance, field_name)
+    if file:
+        build_image_derivatives.delay(instance._meta.label, instance.pk, field_name, file.name)
+
+
+def derivative_fields(model):
+    """Image fields of `model` that have a `<field>_variants` manifest"""
+    field_names = {f.name for f in model._meta.get_fields()}
+    return [name for name in DEFAULT_DERIVATIVE_WIDTHS
+            if name in field_names and variants_field_name(name) in field_names]
+
+
+def derivative_models():
+    """(model, [image fields]) for every model with derivative manifests"""
+    result = []
+    for model in apps.get_app_config('main_app').get_models():
+        fields = derivative_fields(model)
+        if fields:
+            result.append((model, fields))
+    return result
+
+
+def queue_changed_images(sender, instance, raw=False, **kwargs):
+    """post_save handler: schedule derivatives for new or replaced uploads"""
+    if raw:
+        return
+    for field_name in derivative_fields(sender):
+        file = getattr(instance, field_name)
+        manifest = getattr(instance, variants_field_name(field_name)) or {}
+        if file and manifest.get('source') != file.name:
+            schedule_derivatives(instance, field_name)
+        elif not file and manifest:
+            sender.objects.filter(pk=instance.pk).update(**{variants_field_name(field_name): {}})
+
+
+# ==================== READ SIDE (used by model get_* methods) ====================
+
+def _current_variants(manifest, source_name):
+    """Variant list of the preferred format, only if it matches the current file"""
+    if not manifest or manifest.get('source') != source_name:
+        return []
+    variants = manifest.get('variants') or {}
+    for fmt in derivative_formats() + tuple(variants):
+        if variants.get(fmt):
+            return variants[fmt]
+    return []
+
+
+def variant_url(file, manifest):
+    """Largest derivative URL for an uploaded file, or the original URL"""
+    variants = _current_variants(manifest, file.name)
+    if variants:
+        return default_storage.url(variants[-1][1])
+    return file.url
+
+
+def variant_lqip(file, manifest):
+    """Blurred inline preview of the current upload ('' if not built yet)"""
+    if not file or not manifest or manifest.get('source') != file.name:
+        return ''
+    return manifest.get('lqip', '')
+
+
+def variant_srcset(file, manifest):
+    """`srcset` attribute value ("url 64w, url 128w") - empty if none built yet"""
+    if not file:
+        return ''
+    variants = _current_variants(manifest, file.name)
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in variants)
@@ -0,0 +1,263 @@
+"""
+Database-backed background jobs - no broker, just the Job table.
+
+Define a task with the decorator and queue it from a view::
+
+    @task(queue='default', max_attempts=3)
+    def recalculate_document_status(student_id):
+        ...
+
+    recalculate_document_status.delay(student.id)            # as soon as possible
+    recalculate_document_status.schedule(delay=600, args=[student.id])
+
+Jobs are inserted in the caller's transaction (a rolled back request queues
+nothing) and executed by ``python manage.py run_worker``:
+
+* claiming is a conditional UPDATE (status queued -> running), so several
+  worker processes never run the same job, on SQLite as well as PostgreSQL
+* failures are retried with exponential backoff until max_attempts
+* JOB_QUEUE_CONCURRENCY caps how many jobs of a queue run at once across
+  all workers (e.g. one SMTP connection at a time): the running count and
+  the claim happen in one transaction holding the queue's JobQueueLock row
+* JOB_SCHEDULE entries are periodic jobs; the unique_key constraint keeps a
+  single pending instance no matter how many workers are running
+* every attempt is recorded in JobResult (return value or traceback)
+* jobs stuck in 'running' longer than JOB_TIMEOUT (worker killed) are requeued
+
+With JOBS_RUN_INLINE = True jobs run right after commit in the calling
+process instead - handy for development without a worker.
+"""
+
+import json
+import logging
+import os
+import random
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+_registry = {}
+
+
+def registered_tasks():
+    return dict(_registry)
+
+
+def get_task(name):
+    if name not in _registry:
+        # Tasks register themselves on import of <app>.tasks
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
+    return _registry[name]
+
+
+class Task:
+    """A registered background function; call it directly to run it inline"""
+
+    def __init__(self, func, name, queue, max_attempts, priority):
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self.name, args=args, kwargs=kwargs)
+
+    def schedule(self, run_at=None, delay=None, args=(), kwargs=None, unique_key=None):
+        if run_at is None:
+            run_at = timezone.now() + timedelta(seconds=delay or 0)
+        return enqueue(self.name, args=args, kwargs=kwargs, run_at=run_at, unique_key=unique_key)
+
+
+def task(name=None, queue='default', max_attempts=3, priority=0):
+    """Register a function as a background task"""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registered = Task(func, task_name, queue, max_attempts, priority)
+        _registry[task_name] = registered
+        return registered
+    return decorator
+
+
+# ==================== QUEUEING ====================
+
+def enqueue(task_name, args=(), kwargs=None, run_at=None, unique_key=None):
+    """
+    Insert a Job row. Returns the Job, or None if `unique_key` already has
+    a pending job.
+    """
+    from .models import Job
+
+    registered = _registry.get(task_name)
+    job = Job(
+        task=task_name,
+        args=list(args),
+        kwargs=kwargs or {},
+        queue=registered.queue if registered else 'default',
+        priority=registered.priority if registered else 0,
+        max_attempts=registered.max_attempts if registered else 3,
+        run_at=run_at or timezone.now(),
+        unique_key=unique_key,
+    )
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        if unique_key:
+            return None
+        raise
+
+    if getattr(settings, 'JOBS_RUN_INLINE', False) and job.run_at <= timezone.now():
+        transaction.on_commit(lambda: run_job(job.pk, worker='inline'))
+    return job
+
+
+# ==================== WORKER SIDE ====================
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def queue_limits():
+    return getattr(settings, 'JOB_QUEUE_CONCURRENCY', {})
+
+
+def retry_delay(attempt):
+    """Exponential backoff with jitter: 30s, 1m, 2m, 4m ... capped at 1h"""
+    base = getattr(settings, 'JOB_RETRY_BASE_DELAY', 30)
+    delay = min(base * 2 ** (attempt - 1), 3600)
+    return delay + random.uniform(0, delay / 10)
+
+
+def _mark_running(job_id, worker, now):
+    from .models import Job
+
+    return Job.objects.filter(pk=job_id, status='queued').update(
+        status='running', locked_by=worker, locked_at=now,
+        attempts=F('attempts') + 1, updated_at=now,
+    )
+
+
+def _claim_capped(job_id, queue, limit, worker, now):
+    """Claim a job of a JOB_QUEUE_CONCURRENCY queue - count and claim under the queue's lock row"""
+    from .models import Job, JobQueueLock
+
+    JobQueueLock.objects.get_or_create(queue=queue)
+    with transaction.atomic():
+        # Blocks other workers claiming from this queue until we commit
+        JobQueueLock.objects.select_for_update().get(queue=queue)
+        if Job.objects.filter(status='running', queue=queue).count() >= limit:
+            return 0
+        return _mark_running(job_id, worker, now)
+
+
+def claim_job(worker, queues=None):
+    """Atomically take the next runnable job, or return None"""
+    from .models import Job
+
+    now = timezone.now()
+    candidates = Job.objects.filter(status='queued', run_at__lte=now)
+    if queues:
+        candidates = candidates.filter(queue__in=queues)
+
+    limits = queue_limits()
+    if limits:
+        # Cheap pre-filter; the cap itself is enforced in _claim_capped
+        running = dict(
+            Job.objects.filter(status='running', queue__in=list(limits)).order_by()
+            .values('queue').annotate(n=Count('id')).values_list('queue', 'n')
+        )
+        full = [queue for queue, limit in limits.items() if running.get(queue, 0) >= limit]
+        if full:
+            candidates = candidates.exclude(queue__in=full)
+
+    for job_id, queue in candidates.order_by('-priority', 'run_at', 'id').values_list('id', 'queue')[:10]:
+        if queue in limits:
+            claimed = _claim_capped(job_id, queue, limits[queue], worker, now)
+        else:
+            claimed = _mark_running(job_id, worker, now)
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _json_result(value):
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def run_job(job_id, worker=None):
+    """Execute a claimed (or, inline, a freshly queued) job and record the outcome"""
+    from .models import Job, JobResult
+
+    worker = worker or worker_name()
+    job = Job.objects.get(pk=job_id)
+    if job.status == 'queued':
+        # Inline mode - claim it the same way a worker would
+        if not Job.objects.filter(pk=job.pk, status='queued').update(
+            status='running', locked_by=worker, locked_at=timezone.now(), attempts=F('attempts') + 1
+        ):
+            return
+        job.refresh_from_db()
+
+    started_at = timezone.now()
+    try:
+        result = get_task(job.task).func(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s #%s failed (attempt %s/%s)", job.task, job.pk, job.attempts, job.max_attempts)
+        finished_at = timezone.now()
+        JobResult.objects.create(job=job, attempt=job.attempts, succeeded=False, error=error,
+                                 worker=worker, started_at=started_at, finished_at=finished_at)
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status='queued', last_error=error, locked_by='', locked_at=None,
+                run_at=finished_at + timedelta(seconds=retry_delay(job.attempts)),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(status='failed', last_error=error, locked_by='', locked_at=None)
+        return
+
+    JobResult.objects.create(job=job, attempt=job.attempts, succeeded=True, result=_json_result(result),
+                             worker=worker, started_at=started_at, finished_at=timezone.now())
+    Job.objects.filter(pk=job.pk).update(status='succeeded', last_error='', locked_by='', locked_at=None)
+
+
+def requeue_stale_jobs():
+    """Jobs left 'running' by a killed worker go back to the queue"""
+    from .models import Job
+
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_TIMEOUT', 1800))
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None, last_error='Worker stopped while running the job',
+    )
+
+
+def schedule_periodic_jobs():
+    """Queue the next run of every JOB_SCHEDULE entry that has no pending job"""
+    from .models import Job
+
+    now = timezone.now()
+    for key, entry in getattr(settings, 'JOB_SCHEDULE', {}).items():
+        if Job.objects.filter(unique_key=key, status__in=['queued', 'running']).exists():
+            continue
+        last = Job.objects.filter(unique_key=key).order_by('-run_at').values_list('run_at', flat=True).first()
+        run_at = max(now, last + timedelta(seconds=entry['interval'])) if last else now
+        enqueue(entry['task'], args=entry.get('args', ()), kwargs=entry.get('kwargs'),
+                run_at=run_at, unique_key=key)
@@ -0,0 +1,202 @@
+"""
+Live updates over Server-Sent Events (needs the ASGI server, c4s/asgi.py).
+
+Pages open an EventSource (assets/js/live-updates.js) instead of being
+reloaded to find out whether something changed:
+
+    /live/notifications/                 event "notifications": {"unread": 3, "latest": [...]}
+    /admin-dashboard/live/queues/        event "queues": {"pending_payments": 4, ...}
+
+Each stream waits on an in-process pub/sub channel. ``publish()`` may be
+called from any thread (sync views, signal handlers, jobs run inline): a
+student's stream re-reads its unread counter when ``student:<id>`` is
+published, admin streams re-read the queue depths on ``admin-queues``.
+Changes made in another process (e.g. digests delivered by run_worker) are
+picked up by a cheap re-read every LIVE_UPDATES_POLL_INTERVAL seconds; the
+admin queue depths are computed once per process and interval for all open
+streams. A stream ends after LIVE_UPDATES_MAX_SECONDS and the browser
+reconnects.
+
+Under WSGI (runserver) a long-lived response would hold a worker thread, so
+the views answer with one snapshot and a ``retry`` hint instead - EventSource
+then behaves like a slow poll.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+ADMIN_CHANNEL = 'admin-queues'
+
+# Let a burst of publishes (bulk approvals) settle into one update
+COALESCE_DELAY = 0.5
+
+
+def poll_interval():
+    return getattr(settings, 'LIVE_UPDATES_POLL_INTERVAL', 15)
+
+
+def student_channel(registration_id):
+    return f'student:{registration_id}'
+
+
+# ==================== IN-PROCESS PUB/SUB ====================
+
+class Broker:
+    """Channel -> subscribed asyncio queues; publish() is thread safe"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=1)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        return entry
+
+    def unsubscribe(self, channel, entry):
+        with self._lock:
+            self._subscribers[channel].discard(entry)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def publish(self, channel):
+        with self._lock:
+            entries = list(self._subscribers.get(channel, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(_notify, queue)
+            except RuntimeError:
+                pass  # loop already closed
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(entries) for entries in self._subscribers.values())
+
+
+def _notify(queue):
+    # One pending wake-up is enough - the stream re-reads the current state
+    if not queue.full():
+        queue.put_nowait(True)
+
+
+broker = Broker()
+
+
+def publish(channel):
+    broker.publish(channel)
+
+
+def publish_admin_queues(**kwargs):
+    """Signal handler: a payment / document / application was saved"""
+    _depth_cache['expires'] = 0
+    broker.publish(ADMIN_CHANNEL)
+
+
+# ==================== SNAPSHOTS ====================
+
+_depth_cache = {'expires': 0, 'value': None}
+
+
+async def queue_depths():
+    """Pending items of the admin queues, shared by all streams of this process"""
+    from .models import ManagementQuotaApplication, StudentCardPurchase, StudentDocument
+
+    now = time.monotonic()
+    if _depth_cache['value'] is None or now >= _depth_cache['expires']:
+        _depth_cache['value'] = {
+            'pending_payments': await StudentCardPurchase.objects.filter(payment_status='pending').acount(),
+            'pending_documents': await StudentDocument.objects.filter(status='pending').acount(),
+            'pending_applications': await ManagementQuotaApplication.objects.filter(status='pending').acount(),
+        }
+        _depth_cache['expires'] = now + poll_interval()
+    return _depth_cache['value']
+
+
+class StudentSnapshot:
+    """Unread counter (a primary key lookup) plus notifications newer than the last event"""
+
+    def __init__(self, registration_id):
+        self.registration_id = registration_id
+        self.last_id = None
+
+    async def __call__(self):
+        from .models import ManagementQuotaNotification, StudentNotificationState
+
+        unread = await StudentNotificationState.objects.filter(student_id=self.registration_id).values_list(
+            'unread_count', flat=True).afirst() or 0
+        notifications = ManagementQuotaNotification.objects.filter(student_id=self.registration_id)
+        if self.last_id is None:
+            # First event: only remember where we are
+            self.last_id = await notifications.order_by('-id').values_list('id', flat=True).afirst() or 0
+            return {'unread': unread, 'latest': []}
+        latest = [
+            item async for item in notifications.filter(id__gt=self.last_id).order_by('id')
+            .values('id', 'notification_type', 'title', 'message', 'created_at')[:10]
+        ]
+        if latest:
+            self.last_id = latest[-1]['id']
+        return {'unread': unread, 'latest': latest}
+
+
+# ==================== STREAM ====================
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def event_stream(channel, event, snapshot):
+    """Yield `event` whenever `snapshot()` changes; keep-alive comments in between"""
+    subscription = broker.subscribe(channel)
+    queue = subscription[1]
+    interval = poll_interval()
+    deadline = time.monotonic() + getattr(settings, 'LIVE_UPDATES_MAX_SECONDS', 300)
+    try:
+        last = await snapshot()
+        yield f'retry: {interval * 1000}\n' + format_event(event, last)
+        while time.monotonic() < deadline:
+            try:
+                await asyncio.wait_for(queue.get(), timeout=interval)
+                await asyncio.sleep(COALESCE_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            current = await snapshot()
+            if current.get('latest') or _changed(last, current):
+                yield format_event(event, current)
+                last = current
+            else:
+                yield ': keep-alive\n\n'
+    finally:
+        broker.unsubscribe(channel, subscription)
+
+
+def _changed(last, current):
+    """Counters differ (new notifications in 'latest' are always sent)"""
+    def counters(data):
+        return {key: value for key, value in data.items() if key != 'latest'}
+    return counters(last) != counters(current)
+
+
+async def sse_response(request, channel, event, snapshot):
+    if not isinstance(request, ASGIRequest):
+        # WSGI: one snapshot, the browser asks again after `retry`
+        body = f'retry: {poll_interval() * 1000}\n' + format_event(event, await snapshot())
+        response = HttpResponse(body, content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(event_stream(channel, event, snapshot), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx must pass events through as they are written
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,189 @@
+"""
+Data for the small JSON endpoints (state dropdowns, college typeahead,
+counters) - async, so the views run natively on the ASGI server.
+
+The dropdown forms call these on every country change and keystroke, so the
+results are cached: state lists for LOOKUP_CACHE_SECONDS (dropped when a
+State is saved or deleted), typeahead answers for a minute. A per-process
+copy is kept for LOCAL_CACHE_SECONDS in front of the shared cache - a hit
+costs no thread hop at all. Invalidation only reaches the local copy of the
+process that saved the State, so the other workers can serve the old list
+for those few seconds.
+
+Under ASGI, Django runs every (MiddlewareMixin) middleware of a request in
+the sync thread - two hops per middleware. LookupApplication (wrapped around
+the Django application in c4s/asgi.py) therefore answers the public lookup
+URLs itself - reading from the replica, if there is one (routers.py) - and
+hands every other request to Django unchanged.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import QueryDict
+from django.http.request import split_domain_port, validate_host
+from django.urls import reverse
+
+from .routers import replica_reads
+
+
+TYPEAHEAD_CACHE_SECONDS = 60
+TYPEAHEAD_LIMIT = 10
+
+LOCAL_CACHE_SECONDS = 5
+LOCAL_CACHE_MAX_ENTRIES = 1000
+
+_local_cache = {}
+
+
+def _local_get(key):
+    item = _local_cache.get(key)
+    if item is not None and item[0] > time.monotonic():
+        return item[1]
+    return None
+
+
+def _local_set(key, value, seconds):
+    if len(_local_cache) >= LOCAL_CACHE_MAX_ENTRIES:
+        _local_cache.clear()
+    _local_cache[key] = (time.monotonic() + min(seconds, LOCAL_CACHE_SECONDS), value)
+
+
+async def _cached(key, seconds, load):
+    """Local copy -> shared cache -> `load()`"""
+    value = _local_get(key)
+    if value is None:
+        value = await cache.aget(key)
+        if value is None:
+            value = await load()
+            await cache.aset(key, value, seconds)
+        _local_set(key, value, seconds)
+    return value
+
+
+def states_cache_key(country_id):
+    return f'lookups:states:{country_id}'
+
+
+def _cache_seconds():
+    return getattr(settings, 'LOOKUP_CACHE_SECONDS', 60 * 60)
+
+
+async def active_states(country_id):
+    """[{'id', 'name'}] of the country's active states, by name"""
+    from .models import State
+
+    try:
+        country_id = int(country_id)
+    except (TypeError, ValueError):
+        return []
+
+    async def load():
+        return [
+            state async for state in State.objects.filter(country_id=country_id, is_active=True)
+            .values('id', 'name').order_by('name')
+        ]
+    return await _cached(states_cache_key(country_id), _cache_seconds(), load)
+
+
+def remember_state_country(sender, instance, raw=False, **kwargs):
+    """pre_save handler for State: the country it is moved away from"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._previous_country_id = sender._default_manager.filter(pk=instance.pk).values_list(
+        'country_id', flat=True).first()
+
+
+def invalidate_states(sender, instance, **kwargs):
+    """post_save / post_delete handler for State - old and new country"""
+    country_ids = {instance.country_id, getattr(instance, '_previous_country_id', None)} - {None}
+    keys = [states_cache_key(country_id) for country_id in country_ids]
+    for key in keys:
+        _local_cache.pop(key, None)
+    cache.delete_many(keys)
+    instance._previous_country_id = None
+
+
+async def college_typeahead(query):
+    """Colleges whose name starts with `query` (falls back to contains)"""
+    from .models import College
+
+    query = ' '.join((query or '').split())[:50]
+    if len(query) < 2:
+        return []
+
+    async def load():
+        colleges = College.objects.filter(is_active=True).values('id', 'name', 'city', 'state__name')
+        results = [college async for college in colleges.filter(name__istartswith=query).order_by('name')[:TYPEAHEAD_LIMIT]]
+        if len(results) < TYPEAHEAD_LIMIT:
+            seen = {college['id'] for college in results}
+            more = colleges.filter(name__icontains=query).exclude(id__in=seen).order_by('name')
+            results += [college async for college in more[:TYPEAHEAD_LIMIT - len(results)]]
+        return results
+    return await _cached(f'lookups:colleges:{query.lower()}', TYPEAHEAD_CACHE_SECONDS, load)
+
+
+async def unread_count_for_user(user_id):
+    """Async twin of notifications.unread_count_for_user (badge endpoint)"""
+    from .models import StudentNotificationState
+
+    return await StudentNotificationState.objects.filter(student__user_id=user_id).values_list(
+        'unread_count', flat=True).afirst() or 0
+
+
+# ==================== ASGI FAST PATH ====================
+
+def _allowed_host(scope):
+    host = dict(scope.get('headers') or ()).get(b'host', b'').decode('latin1')
+    domain, _port = split_domain_port(host)
+    allowed_hosts = settings.ALLOWED_HOSTS
+    if settings.DEBUG and not allowed_hosts:
+        allowed_hosts = ['.localhost', '127.0.0.1', '[::1]']
+    return bool(domain) and validate_host(domain, allowed_hosts)
+
+
+class LookupApplication:
+    """ASGI app: public lookup URLs answered directly, everything else by Django"""
+
+    def __init__(self, application):
+        self.application = application
+        self._routes = None
+
+    def routes(self):
+        if self._routes is None:
+            self._routes = {
+                reverse('main_app:ajax_load_states'):
+                    lambda params: active_states(params.get('country_id')),
+                reverse('main_app:ajax_college_search'):
+                    lambda params: self._wrap('results', college_typeahead(params.get('q'))),
+            }
+        return self._routes
+
+    @staticmethod
+    async def _wrap(key, awaitable):
+        return {key: await awaitable}
+
+    async def __call__(self, scope, receive, send):
+        handler = None
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            handler = self.routes().get(scope['path'])
+        if handler is None or not _allowed_host(scope):
+            return await self.application(scope, receive, send)
+
+        params = QueryDict(scope.get('query_string', b'').decode('latin1'))
+        with replica_reads():
+            payload = await handler(params)
+        body = json.dumps(payload, cls=DjangoJSONEncoder).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'x-content-type-options', b'nosniff'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
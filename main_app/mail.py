@@ -0,0 +1,238 @@
+"""
+Outbound mail queue.
+
+Views never talk to the SMTP server. ``queue_email()`` renders the template
+into an OutboundEmail row (in the caller's transaction) and makes sure a
+``send_queued_emails`` job is pending; the worker then sends everything that
+is queued over one SMTP connection::
+
+    queue_email(application.email, 'Application Approved',
+                'emails/application_status', {'application': application})
+
+renders ``emails/application_status.txt`` (and ``.html`` if it exists).
+
+Sending side:
+
+* the connection is kept open between messages and between worker runs and
+  only reopened after EMAIL_CONNECTION_MAX_IDLE seconds or
+  EMAIL_CONNECTION_MAX_MESSAGES messages - no TLS handshake per mail
+* EMAIL_RATE_LIMIT messages per minute at most (the 'email' job queue runs
+  one job at a time, so this holds across workers)
+* a dropped connection is reopened and the message tried again right away;
+  other failures are retried with the job backoff until EMAIL_MAX_ATTEMPTS,
+  refused recipients fail at once
+"""
+
+import logging
+import smtplib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .jobs import retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+QUEUE_KEY = 'send-queued-emails'
+
+
+# ==================== QUEUEING ====================
+
+def render_email(template, context=None):
+    """(text, html) bodies for `template` (without extension); html may be ''"""
+    context = context or {}
+    text = render_to_string(f'{template}.txt', context)
+    try:
+        html = render_to_string(f'{template}.html', context)
+    except TemplateDoesNotExist:
+        html = ''
+    return text, html
+
+
+def queue_email(to, subject, template, context=None, from_email=None):
+    """
+    Render `template` and queue it for `to` (address or list). Returns the
+    OutboundEmail, or None when there is no recipient.
+    """
+    from .models import OutboundEmail
+    from .tasks import send_queued_emails
+
+    recipients = [to] if isinstance(to, str) else list(to)
+    recipients = [address for address in recipients if address]
+    if not recipients:
+        return None
+
+    body, html_body = render_email(template, context)
+    email = OutboundEmail.objects.create(
+        to=recipients,
+        from_email=from_email or '',
+        subject=' '.join(subject.split()),
+        body=body,
+        html_body=html_body,
+        template=template,
+    )
+    # None if a run is already pending - it will pick this one up too
+    send_queued_emails.schedule(unique_key=QUEUE_KEY)
+    return email
+
+
+# ==================== CONNECTION POOL (worker side) ====================
+
+class _PooledConnection:
+    """One SMTP connection per process, reused across messages and jobs"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connection = None
+        self.last_used = 0
+        self.sent = 0
+        self.last_send = 0
+
+    def get(self):
+        max_idle = getattr(settings, 'EMAIL_CONNECTION_MAX_IDLE', 60)
+        max_messages = getattr(settings, 'EMAIL_CONNECTION_MAX_MESSAGES', 100)
+        if self.connection is not None and (
+            time.monotonic() - self.last_used > max_idle or self.sent >= max_messages
+        ):
+            self.close()
+        if self.connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self.connection = connection
+            self.sent = 0
+        self.last_used = time.monotonic()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+
+    def throttle(self):
+        """Sleep so that sends stay under EMAIL_RATE_LIMIT per minute"""
+        rate = getattr(settings, 'EMAIL_RATE_LIMIT', 0)
+        if rate:
+            wait = self.last_send + 60.0 / rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.last_send = time.monotonic()
+
+    def send(self, message):
+        """Send one message; reconnects once if the server dropped us"""
+        for retry in (False, True):
+            connection = self.get()
+            message.connection = connection
+            self.throttle()
+            try:
+                message.send()
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as exc:
+                self.close()
+                if retry:
+                    raise
+                logger.info("SMTP connection lost (%s), reconnecting", exc)
+                continue
+            self.sent += 1
+            self.last_used = time.monotonic()
+            return
+
+
+pool = _PooledConnection()
+
+
+# ==================== SENDING ====================
+
+def build_message(email):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _claim(email_id):
+    from .models import OutboundEmail
+
+    return OutboundEmail.objects.filter(pk=email_id, status='queued').update(
+        status='sending', attempts=F('attempts') + 1, updated_at=timezone.now(),
+    )
+
+
+def _record_failure(email, error, permanent=False):
+    from .models import OutboundEmail
+
+    email.refresh_from_db(fields=['attempts'])
+    now = timezone.now()
+    if permanent or email.attempts >= getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5):
+        OutboundEmail.objects.filter(pk=email.pk).update(status='failed', last_error=error, updated_at=now)
+    else:
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status='queued', last_error=error, updated_at=now,
+            send_after=now + timedelta(seconds=retry_delay(email.attempts)),
+        )
+
+
+def requeue_stale_emails():
+    """Rows left 'sending' by a killed worker go back to the queue"""
+    from .models import OutboundEmail
+
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_TIMEOUT', 1800))
+    return OutboundEmail.objects.filter(status='sending', updated_at__lt=cutoff).update(status='queued')
+
+
+def send_pending(batch_size=50):
+    """
+    Send queued mail until none is due or EMAIL_DRAIN_SECONDS have passed.
+    Returns {'sent': n, 'failed': n}. An SMTP or connection error other than
+    a refused recipient stops the run: that message is requeued with backoff,
+    the rest stays queued and the error is raised.
+    """
+    from .models import OutboundEmail
+
+    requeue_stale_emails()
+    deadline = time.monotonic() + getattr(settings, 'EMAIL_DRAIN_SECONDS', 600)
+    counts = {'sent': 0, 'failed': 0}
+
+    with pool.lock:
+        while time.monotonic() < deadline:
+            batch = list(
+                OutboundEmail.objects.filter(status='queued', send_after__lte=timezone.now())
+                .order_by('send_after', 'id')[:batch_size]
+            )
+            if not batch:
+                break
+            for email in batch:
+                if not _claim(email.pk):
+                    continue
+                try:
+                    pool.send(build_message(email))
+                except smtplib.SMTPRecipientsRefused as exc:
+                    _record_failure(email, repr(exc), permanent=True)
+                    counts['failed'] += 1
+                except (smtplib.SMTPException, OSError) as exc:
+                    pool.close()
+                    _record_failure(email, repr(exc))
+                    # Server trouble: leave the rest queued and fail the job, which is retried
+                    raise
+                else:
+                    OutboundEmail.objects.filter(pk=email.pk).update(
+                        status='sent', sent_at=timezone.now(), last_error='', updated_at=timezone.now(),
+                    )
+                    counts['sent'] += 1
+                if time.monotonic() >= deadline:
+                    break
+    return counts
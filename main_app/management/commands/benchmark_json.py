@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from main_app.benchmark import run_asgi, run_wsgi, session_cookie
+from main_app.models import College, Country
+
+
+class Command(BaseCommand):
+    help = "Requests/sec of the JSON lookup endpoints through the WSGI and the ASGI handler"
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help="URLs to request (default: state dropdown and college typeahead)")
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help="WSGI threads / ASGI requests in flight (one worker either way)")
+        parser.add_argument('--user', help="Username to log in as (needed for badge/admin endpoints)")
+
+    def default_urls(self):
+        urls = []
+        country = Country.objects.order_by('id').first()
+        if country:
+            urls.append(f"{reverse('main_app:ajax_load_states')}?country_id={country.pk}")
+        college = College.objects.filter(is_active=True).order_by('id').first()
+        if college and len(college.name) >= 2:
+            urls.append(f"{reverse('main_app:ajax_college_search')}?q={college.name[:3]}")
+        if not urls:
+            raise CommandError("No countries or colleges in the database - pass URLs explicitly.")
+        return urls
+
+    def handle(self, *args, **options):
+        urls = options['urls'] or self.default_urls()
+        cookie = None
+        if options['user']:
+            cookie = session_cookie(get_user_model().objects.get(username=options['user']))
+
+        self.stdout.write(f"{options['requests']} requests, concurrency {options['concurrency']}")
+        for url in urls:
+            self.stdout.write(url)
+            for label, runner in (('WSGI', run_wsgi), ('ASGI', run_asgi)):
+                # one untimed pass warms caches and connections
+                runner([url], min(50, options['requests']), options['concurrency'], cookie)
+                result = runner([url], options['requests'], options['concurrency'], cookie)
+                self.stdout.write(
+                    f"  {label}: {result['rps']:8.1f} req/s   p50 {result['p50_ms']:6.2f} ms   "
+                    f"p95 {result['p95_ms']:6.2f} ms   p99 {result['p99_ms']:6.2f} ms   errors {result['errors']}"
+                )
@@ -0,0 +1,111 @@
+import json
+import platform
+from pathlib import Path
+
+import django
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from main_app.benchmark import PAGE_SCENARIOS, compare, count_queries, page_scenarios, run_asgi, run_wsgi
+from main_app.models import ManagementQuotaApplication, ManagementQuotaNotification, UserRegistration
+from main_app.perf_data import TREES
+
+
+BASELINE = Path(__file__).resolve().parents[2] / 'benchmark_baseline.json'
+RUNNERS = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+
+def dataset_rows():
+    """Size of the seeded dataset - runs are only comparable on the same one"""
+    return {
+        'students': UserRegistration.objects.count(),
+        'pages': sum(page_model.objects.count() for _card, _sub, page_model, _keep in TREES.values()),
+        'applications': ManagementQuotaApplication.objects.count(),
+        'notifications': ManagementQuotaNotification.objects.count(),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Latency (p50/p95/p99), throughput and queries per request of the hot student and admin pages, "
+            "through the WSGI and the ASGI handler, on a database filled by seed_perf. Compares against "
+            "the stored baseline; --save records a new one.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help=f"URL names to run (default: all of {', '.join(name for name, _ in PAGE_SCENARIOS)})")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per scenario and handler")
+        parser.add_argument('--seconds', type=float, default=10,
+                            help="Stop starting requests after this long (slow pages get fewer samples)")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="WSGI threads / ASGI requests in flight (one worker either way)")
+        parser.add_argument('--handlers', nargs='+', choices=sorted(RUNNERS), default=['wsgi', 'asgi'])
+        parser.add_argument('--baseline', default=str(BASELINE))
+        parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed p95 / throughput change before a run counts as a regression")
+
+    def handle(self, *args, **options):
+        try:
+            scenarios = page_scenarios(options['scenarios'])
+        except ObjectDoesNotExist:
+            raise CommandError("No perf-admin / student0 - run `manage.py seed_perf` on this database first.")
+
+        rows = dataset_rows()
+        self.stdout.write(
+            f"{', '.join(f'{count} {name}' for name, count in rows.items())} | {options['requests']} requests "
+            f"or {options['seconds']:g} s per scenario, concurrency {options['concurrency']}"
+        )
+        results = {}
+        for label, url, cookie in scenarios:
+            self.stdout.write(f"{label}  {url}")
+            # Also the untimed warm-up of caches and connections
+            queries = count_queries(url, cookie)
+            for handler in options['handlers']:
+                runner = RUNNERS[handler]
+                runner([url], options['concurrency'], options['concurrency'], cookie)
+                result = runner([url], options['requests'], options['concurrency'], cookie, options['seconds'])
+                result['queries'] = queries
+                results.setdefault(label, {})[handler] = result
+                self.stdout.write(
+                    f"  {handler.upper()}: {result['rps']:8.1f} req/s   p50 {result['p50_ms']:8.2f} ms   "
+                    f"p95 {result['p95_ms']:8.2f} ms   p99 {result['p99_ms']:8.2f} ms   "
+                    f"{queries:4d} queries   n={result['requests']}   errors {result['errors']}"
+                )
+
+        path = Path(options['baseline'])
+        if options['save']:
+            path.write_text(json.dumps({'meta': self.meta(rows, options), 'results': results}, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {path}"))
+            return
+        if not path.exists():
+            self.stdout.write(f"No baseline at {path} - run with --save to record one.")
+            return
+
+        baseline = json.loads(path.read_text())
+        if baseline['meta'].get('rows') != rows:
+            self.stdout.write(self.style.WARNING(
+                f"The baseline was recorded on a different dataset ({baseline['meta'].get('rows')}) - "
+                f"seed_perf with the same options for comparable numbers."
+            ))
+        regressions = compare(baseline['results'], results, options['tolerance'])
+        if regressions:
+            raise CommandError("Slower than the baseline:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            f"No regressions against {path} (recorded {baseline['meta'].get('recorded')})."
+        ))
+
+    def meta(self, rows, options):
+        return {
+            'recorded': timezone.now().isoformat(timespec='seconds'),
+            'rows': rows,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': f'{connection.vendor} {connection.Database.sqlite_version}'
+            if connection.vendor == 'sqlite' else connection.vendor,
+            'machine': platform.machine(),
+            'requests': options['requests'],
+            'seconds': options['seconds'],
+            'concurrency': options['concurrency'],
+        }
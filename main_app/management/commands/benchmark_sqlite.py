@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+from main_app.benchmark import create_sqlite_fixture, run_sqlite_mix
+from main_app.sqlite import sqlite_pragmas
+
+
+class Command(BaseCommand):
+    help = "Read/write concurrency of SQLite with its defaults and with the production profile (SQLITE_PRAGMAS in WAL mode)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--dir', help="Where to create the scratch databases (default: a temp dir; "
+                                          "use a directory on the production disk for realistic fsync costs)")
+
+    def handle(self, *args, **options):
+        profiles = (
+            # Django's defaults: rollback journal, DEFERRED transactions, 5 s timeout
+            ('default', {}, 'DEFERRED'),
+            ('production', sqlite_pragmas('WAL'), 'IMMEDIATE'),
+        )
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, {options['seconds']:g} s per profile"
+        )
+        with tempfile.TemporaryDirectory(dir=options['dir']) as directory:
+            for name, pragmas, transaction_mode in profiles:
+                path = os.path.join(directory, f'{name}.sqlite3')
+                rows = create_sqlite_fixture(path)
+                result = run_sqlite_mix(path, pragmas, transaction_mode, options['readers'],
+                                        options['writers'], options['seconds'], rows=rows)
+                self.stdout.write(name)
+                for kind in ('read', 'write'):
+                    row = result[kind]
+                    self.stdout.write(
+                        f"  {kind:5}: {row['rps']:8.1f} ops/s   p50 {row['p50_ms']:7.2f} ms   "
+                        f"p95 {row['p95_ms']:7.2f} ms   p99 {row['p99_ms']:7.2f} ms"
+                    )
+                self.stdout.write(f"  'database is locked' errors: {result['locked']}")
@@ -0,0 +1,62 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main_app.images import (
+    build_derivatives,
+    derivative_formats,
+    derivative_models,
+    derivative_widths,
+    variants_field_name,
+)
+
+
+class Command(BaseCommand):
+    help = "Build resized image derivatives (WebP etc.) for existing card, icon, featured and college images"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Rebuild even if the manifest already matches the current file")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Process pool size (default: IMAGE_DERIVATIVE_WORKERS)")
+
+    def handle(self, *args, **options):
+        media_root = str(settings.MEDIA_ROOT)
+        formats = derivative_formats()
+
+        jobs = []
+        for model, fields in derivative_models():
+            for field_name in fields:
+                variants_name = variants_field_name(field_name)
+                rows = (model.objects.exclude(**{field_name: ''})
+                        .exclude(**{f'{field_name}__isnull': True})
+                        .values_list('pk', field_name, variants_name))
+                for pk, name, manifest in rows:
+                    if not options['force'] and (manifest or {}).get('source') == name:
+                        continue
+                    jobs.append((model, pk, field_name, name))
+
+        if not jobs:
+            self.stdout.write("All image derivatives are up to date.")
+            return
+
+        workers = options['workers'] or getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2)
+        built = failed = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (job, pool.submit(build_derivatives, media_root, job[3], derivative_widths(job[2]), formats))
+                for job in jobs
+            ]
+            for (model, pk, field_name, name), future in futures:
+                manifest = future.result()
+                model.objects.filter(pk=pk, **{field_name: name}).update(
+                    **{variants_field_name(field_name): manifest}
+                )
+                if manifest.get('error'):
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"{model.__name__} #{pk} {name}: {manifest['error']}"))
+                else:
+                    built += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} image(s), {failed} skipped"))
@@ -0,0 +1,97 @@
+import os
+import re
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import FileField, JSONField, TextField
+
+from ckeditor_uploader.utils import get_thumb_filename
+
+from main_app.models import MediaBlob
+from main_app.resumable import expire_sessions
+
+
+class Command(BaseCommand):
+    help = ("Find media files that no FileField/ImageField, image derivative or normalized "
+            "document manifest or CKEditor body references, and optionally delete them")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete', action='store_true',
+                            help="Actually delete orphaned files (default is a dry run)")
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help="Ignore files modified more recently (uploads in flight)")
+
+    def referenced_names(self):
+        media_url = re.escape(settings.MEDIA_URL)
+        media_ref_re = re.compile(rf'''{media_url}([^"'\s)<>?#]+)''')
+        referenced = set()
+
+        for model in apps.get_models():
+            fields = model._meta.concrete_fields
+            file_fields = [f.attname for f in fields if isinstance(f, FileField)]
+            # CKEditor bodies (content + rendered_content) and derivative manifests
+            text_fields = [f.attname for f in fields
+                           if isinstance(f, TextField) and model._meta.app_label == 'main_app']
+            manifest_fields = [f.attname for f in fields
+                               if isinstance(f, JSONField) and f.name.endswith('_variants')]
+            normalized_fields = [f.attname for f in fields
+                                 if isinstance(f, JSONField) and f.name.endswith('_normalized')]
+
+            if file_fields:
+                for row in model._default_manager.values_list(*file_fields).iterator():
+                    referenced.update(name for name in row if name)
+
+            for field in text_fields:
+                rows = model._default_manager.filter(**{f'{field}__contains': settings.MEDIA_URL})
+                for text in rows.values_list(field, flat=True).iterator():
+                    referenced.update(media_ref_re.findall(text))
+
+            for field in manifest_fields:
+                for manifest in model._default_manager.values_list(field, flat=True).iterator():
+                    for variants in (manifest or {}).get('variants', {}).values():
+                        referenced.update(name for _width, name in variants)
+
+            # Normalized student document copies (uploads.py)
+            for field in normalized_fields:
+                for manifest in model._default_manager.values_list(field, flat=True).iterator():
+                    if manifest and manifest.get('name'):
+                        referenced.add(manifest['name'])
+
+        # CKEditor browse thumbnails live next to the image they belong to
+        referenced.update({get_thumb_filename(name) for name in referenced})
+        return referenced
+
+    def handle(self, *args, **options):
+        if options['delete']:
+            removed = expire_sessions()
+            self.stdout.write(f"Removed {removed} expired/finished resumable upload session(s)")
+
+        media_root = str(settings.MEDIA_ROOT)
+        cutoff = time.time() - options['min_age_hours'] * 3600
+        referenced = self.referenced_names()
+
+        orphans = []
+        for root, _dirs, files in os.walk(media_root):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, media_root).replace(os.sep, '/')
+                if name in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                orphans.append((name, path, os.path.getsize(path)))
+
+        total_size = sum(size for _name, _path, size in orphans)
+        for name, path, size in orphans:
+            self.stdout.write(f"{'deleting' if options['delete'] else 'orphan'}: {name} ({size} bytes)")
+            if options['delete']:
+                os.remove(path)
+
+        if options['delete']:
+            MediaBlob.objects.filter(name__in=[name for name, _path, _size in orphans]).delete()
+
+        verb = "Deleted" if options['delete'] else "Found"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(orphans)} unreferenced file(s), {total_size / 1024 / 1024:.1f} MB"
+            + ("" if options['delete'] else " - rerun with --delete to remove them")
+        ))
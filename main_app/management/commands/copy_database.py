@@ -0,0 +1,109 @@
+from itertools import islice
+from pathlib import Path
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+
+
+SOURCE_ALIAS = 'copy_source'
+
+# Filled by post_migrate on every database - replaced by the source rows
+GENERATED_TABLES = ('django_content_type', 'auth_permission')
+
+
+class Command(BaseCommand):
+    help = ("Copy every table of a SQLite database (e.g. db.sqlite3) into the configured database, "
+            "in batched inserts. Run `migrate` on the target first.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Path of the SQLite database to copy from")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Target database alias")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete the rows already in the target tables first")
+
+    def handle(self, *args, **options):
+        target = connections[options['database']]
+        source_path = Path(options['source']).resolve()
+        if not source_path.is_file():
+            raise CommandError(f"{options['source']} does not exist.")
+        # Read-only: the source is left exactly as it was (no WAL switch, no -wal file)
+        # configure_settings() fills in the defaults of a DATABASES entry
+        connections.settings[SOURCE_ALIAS] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {},
+            SOURCE_ALIAS: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': f'{source_path.as_uri()}?mode=ro',
+                'OPTIONS': {'uri': True},
+            },
+        })[SOURCE_ALIAS]
+        source = connections[SOURCE_ALIAS]
+        try:
+            source_tables = set(source.introspection.table_names())
+            if 'django_migrations' not in source_tables:
+                raise CommandError(f"{options['source']} is not a migrated Django database.")
+            models = self.copied_models(options['database'], source_tables, target)
+            self.check_target(target, models, options['replace'])
+
+            with transaction.atomic(using=target.alias), target.constraint_checks_disabled():
+                for model in reversed(models):
+                    with target.cursor() as cursor:
+                        cursor.execute(f'DELETE FROM {target.ops.quote_name(model._meta.db_table)}')
+                for model in models:
+                    copied = self.copy_model(model, target, options['batch_size'])
+                    self.stdout.write(f"{model._meta.db_table}: {copied} rows")
+                # FKs were not checked row by row - check them all once
+                target.check_constraints(table_names=[model._meta.db_table for model in models])
+                # Next ids continue after the copied ones (PostgreSQL sequences)
+                with target.cursor() as cursor:
+                    for sql in target.ops.sequence_reset_sql(no_style(), models):
+                        cursor.execute(sql)
+        finally:
+            source.close()
+            del connections[SOURCE_ALIAS]
+            connections.settings.pop(SOURCE_ALIAS, None)
+        self.stdout.write(self.style.SUCCESS(f"Copied {len(models)} tables."))
+
+    def copied_models(self, alias, source_tables, target):
+        target_tables = set(target.introspection.table_names())
+        models = []
+        for model in apps.get_models(include_auto_created=True):
+            meta = model._meta
+            if meta.proxy or not meta.managed or not router.allow_migrate_model(alias, model):
+                continue
+            if meta.db_table not in target_tables:
+                raise CommandError(f"Table {meta.db_table} is missing in the target - run migrate first.")
+            if meta.db_table in source_tables:
+                models.append(model)
+        return models
+
+    def check_target(self, target, models, replace):
+        if replace:
+            return
+        for model in models:
+            if model._meta.db_table not in GENERATED_TABLES and model._base_manager.using(target.alias).exists():
+                raise CommandError(f"{model._meta.db_table} already has rows in the target - use --replace.")
+
+    def copy_model(self, model, target, batch_size):
+        """Stream rows out of the source and insert them in batches (no save(), no signals)"""
+        fields = model._meta.local_concrete_fields
+        table = target.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(target.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+
+        rows = (
+            model._base_manager.using(SOURCE_ALIAS).order_by('pk')
+            .values_list(*(field.attname for field in fields)).iterator(chunk_size=batch_size)
+        )
+        copied = 0
+        with target.cursor() as cursor:
+            while batch := list(islice(rows, batch_size)):
+                cursor.executemany(sql, [
+                    [field.get_db_prep_save(value, connection=target) for field, value in zip(fields, row)]
+                    for row in batch
+                ])
+                copied += len(batch)
+        return copied
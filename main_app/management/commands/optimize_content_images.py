@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from main_app.content_images import rewrite_content_images
+from main_app.management.commands.render_content import PAGE_MODELS
+
+
+class Command(BaseCommand):
+    help = "Re-encode images embedded in CKEditor page content and rewrite <img> tags to the optimized files"
+
+    def handle(self, *args, **options):
+        # original URL -> optimized URL, shared across models (same screenshot on many pages)
+        cache = {}
+
+        for model in PAGE_MODELS:
+            pages_changed = images_changed = 0
+            for page in model.objects.only('id', 'content').iterator(chunk_size=200):
+                content, changed = rewrite_content_images(page.content, cache)
+                if not changed:
+                    continue
+                pages_changed += 1
+                images_changed += changed
+                page.content = content
+                # also refreshes rendered_content / TOC / excerpt
+                page.save(update_fields=['content'])
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: {images_changed} image(s) in {pages_changed} page(s)"
+            ))
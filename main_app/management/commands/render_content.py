@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from main_app.content_render import RENDERED_FIELDS, apply_rendered_content
+from main_app.models import (
+    AdmissionAbroadPage,
+    ContentPage,
+    DistanceEducationPage,
+    OnlineEducationPage,
+)
+
+
+PAGE_MODELS = [ContentPage, AdmissionAbroadPage, DistanceEducationPage, OnlineEducationPage]
+
+
+class Command(BaseCommand):
+    help = "Backfill pre-rendered CKEditor content (rendered_content, TOC, excerpt) for all page models"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--only-missing', action='store_true',
+                            help="Skip pages that already have rendered_content")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        for model in PAGE_MODELS:
+            queryset = model.objects.only('id', 'content', *RENDERED_FIELDS)
+            if options['only_missing']:
+                queryset = queryset.filter(rendered_content='')
+
+            batch = []
+            total = 0
+            for page in queryset.iterator(chunk_size=batch_size):
+                apply_rendered_content(page)
+                batch.append(page)
+                if len(batch) >= batch_size:
+                    # bulk_update skips save() - updated_at stays untouched
+                    model.objects.bulk_update(batch, RENDERED_FIELDS)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, RENDERED_FIELDS)
+                total += len(batch)
+
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: rendered {total} page(s)"))
@@ -0,0 +1,66 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.utils.module_loading import autodiscover_modules
+
+from main_app.jobs import claim_job, registered_tasks, requeue_stale_jobs, run_job, schedule_periodic_jobs, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (main_app/jobs.py) until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queues', nargs='*', help="Only take jobs from these queues (default: all)")
+        parser.add_argument('--concurrency', type=int, default=2, help="Jobs run in parallel by this worker")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true', help="Exit when no runnable job is left")
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        name = worker_name()
+        concurrency = max(1, options['concurrency'])
+        self.stdout.write(f"Worker {name}: {len(registered_tasks())} task(s), concurrency {concurrency}")
+
+        running = set()
+        last_housekeeping = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not self.stopping:
+                if time.monotonic() - last_housekeeping > 60:
+                    requeue_stale_jobs()
+                    schedule_periodic_jobs()
+                    last_housekeeping = time.monotonic()
+
+                job = claim_job(name, options['queues']) if len(running) < concurrency else None
+                if job is not None:
+                    self.stdout.write(f"Running {job.task} #{job.pk} (attempt {job.attempts})")
+                    running.add(pool.submit(self.run, job.pk, name))
+                    continue
+
+                if options['once'] and not running:
+                    break
+                if running:
+                    done, _pending = wait(running, timeout=options['sleep'], return_when=FIRST_COMPLETED)
+                    running -= done
+                else:
+                    close_old_connections()
+                    time.sleep(options['sleep'])
+
+            self.stdout.write("Stopping - waiting for running jobs to finish")
+        self.stdout.write(self.style.SUCCESS("Worker stopped"))
+
+    @staticmethod
+    def run(job_id, name):
+        try:
+            run_job(job_id, worker=name)
+        finally:
+            connections.close_all()
+
+    def stop(self, signum, frame):
+        self.stopping = True
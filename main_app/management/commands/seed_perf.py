@@ -0,0 +1,56 @@
+import math
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.perf_data import TREES, generate
+
+
+class Command(BaseCommand):
+    help = ("Fill the database with a large synthetic dataset for load and performance tests "
+            "(deterministic for a given --seed). Use a separate database: DB_NAME / a fresh SQLite file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100_000)
+        parser.add_argument('--per-student', type=int, default=2,
+                            help="Documents, choices, doubts, complaints and purchases per student")
+        parser.add_argument('--cards', type=int, default=5, help="Cards per card type / content tree")
+        parser.add_argument('--depth', type=int, default=6, help="Subcategory levels in every content tree")
+        parser.add_argument('--branching', type=int, default=3, help="Subcategories per card / parent")
+        parser.add_argument('--pages', type=int, default=1_000_000,
+                            help="Content pages in all four trees, spread over the leaf subcategories")
+        parser.add_argument('--states', type=int, default=36)
+        parser.add_argument('--colleges', type=int, default=2_000)
+        parser.add_argument('--comparisons', type=int, default=200)
+        parser.add_argument('--applications', type=int, default=500_000)
+        parser.add_argument('--notifications', type=int, default=500_000)
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiply the row counts (students, pages, colleges, comparisons, applications, "
+                                 "notifications), e.g. 0.01 for a quick run")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username='perf-admin').exists():
+            raise CommandError("This database is already seeded - run seed_perf on a fresh database.")
+
+        scale = options['scale']
+        # --scale changes the row counts, not the shape of the data
+        volumes = {name: options[name] for name in ('per_student', 'cards', 'depth', 'branching', 'states')}
+        volumes.update({
+            name: max(1, int(options[name] * scale))
+            for name in ('students', 'colleges', 'comparisons', 'applications', 'notifications')
+        })
+        leaves = len(TREES) * volumes['cards'] * volumes['branching'] ** volumes['depth']
+        volumes['pages'] = max(1, math.ceil(options['pages'] * scale / leaves))
+
+        self.stdout.write(", ".join(f"{name}={value}" for name, value in volumes.items())
+                          + f" ({leaves} leaf subcategories, seed {options['seed']})")
+        started = time.perf_counter()
+        dataset = generate(volumes, seed=options['seed'], stdout=self.stdout)
+        for model_name, count in dataset.counts.items():
+            self.stdout.write(f"  {model_name}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(dataset.counts.values())} rows in {time.perf_counter() - started:.0f}s. "
+            f"Log in as perf-admin / student0, password 'perf-password'."
+        ))
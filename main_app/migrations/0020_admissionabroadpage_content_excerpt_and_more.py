@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0019_contentpage_country_contentpage_course_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='admissionabroadpage',
+            name='content_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='admissionabroadpage',
+            name='content_toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='admissionabroadpage',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contentpage',
+            name='content_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contentpage',
+            name='content_toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contentpage',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='distanceeducationpage',
+            name='content_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='distanceeducationpage',
+            name='content_toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='distanceeducationpage',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='onlineeducationpage',
+            name='content_excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='onlineeducationpage',
+            name='content_toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='onlineeducationpage',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0022_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='managementquotaapplication',
+            name='exam_scorecard_normalized',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='managementquotaapplication',
+            name='tenth_marksheet_normalized',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='managementquotaapplication',
+            name='twelfth_marksheet_normalized',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='studentdocument',
+            name='document_file_normalized',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
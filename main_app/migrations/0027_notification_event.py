@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0026_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('submitted', 'Application Submitted'), ('approved', 'Application Approved'), ('rejected', 'Application Rejected'), ('waitlist', 'Added to Waitlist'), ('document_required', 'Additional Documents Required')], max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('batch', models.CharField(blank=True, max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('application', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='main_app.managementquotaapplication')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mq_notification_events', to='main_app.userregistration')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['batch', 'created_at'], name='notif_event_batch_idx')],
+            },
+        ),
+    ]
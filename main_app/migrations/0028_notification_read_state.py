@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_read_state(apps, schema_editor):
+    """Watermark = newest notification already flagged read; newer ones are unread"""
+    Notification = apps.get_model('main_app', 'ManagementQuotaNotification')
+    State = apps.get_model('main_app', 'StudentNotificationState')
+
+    read_until = dict(
+        Notification.objects.filter(is_read=True).order_by().values('student_id')
+        .annotate(last=Max('created_at')).values_list('student_id', 'last')
+    )
+    states = []
+    for student_id in Notification.objects.order_by().values_list('student_id', flat=True).distinct():
+        last = read_until.get(student_id)
+        unread = Notification.objects.filter(student_id=student_id)
+        if last is not None:
+            unread = unread.filter(created_at__gt=last)
+        states.append(State(student_id=student_id, last_read_at=last, unread_count=unread.count()))
+    State.objects.bulk_create(states, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0027_notification_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentNotificationState',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_state', serialize=False, to='main_app.userregistration')),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Student Notification State',
+                'verbose_name_plural': 'Student Notification States',
+            },
+        ),
+        migrations.RunPython(backfill_read_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0028_notification_read_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_type', models.CharField(max_length=100)),
+                ('page_id', models.PositiveBigIntegerField()),
+                ('user_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('counted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['counted', 'id'], name='pageview_counted_idx'), models.Index(fields=['page_type', 'page_id', 'created_at'], name='pageview_page_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('query', models.CharField(max_length=200)),
+                ('results', models.PositiveIntegerField(default=0)),
+                ('user_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'created_at'], name='searchlog_source_idx')],
+            },
+        ),
+    ]
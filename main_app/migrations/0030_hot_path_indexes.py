@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0029_analytics_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='admissionabroadpage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['sub_category', 'order'], name='abroad_page_sub_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='admissionabroadsubcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_card', 'parent_subcategory', 'order'], name='abroad_subcat_card_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='admissionabroadsubcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_subcategory', 'order'], name='abroad_subcat_parent_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contentpage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['sub_category', 'order'], name='content_page_sub_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='distanceeducationpage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['sub_category', 'order'], name='dist_page_sub_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='distanceeducationsubcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_card', 'parent_subcategory', 'order'], name='dist_subcat_card_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='distanceeducationsubcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_subcategory', 'order'], name='dist_subcat_parent_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='managementquotaapplication',
+            index=models.Index(fields=['status', 'applied_at'], name='mq_app_status_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='managementquotanotification',
+            index=models.Index(fields=['student', 'created_at'], name='mq_notif_student_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onlineeducationpage',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['sub_category', 'order'], name='online_page_sub_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onlineeducationsubcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_card', 'parent_subcategory', 'order'], name='online_subcat_card_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='onlineeducationsubcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_subcategory', 'order'], name='online_subcat_parent_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentcardpurchase',
+            index=models.Index(fields=['student', 'payment_status'], name='card_purchase_student_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_card', 'parent_subcategory', 'order'], name='subcat_card_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subcategory',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['parent_subcategory', 'order'], name='subcat_parent_order_idx'),
+        ),
+    ]
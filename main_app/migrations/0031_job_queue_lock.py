@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0030_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobQueueLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Job Queue Lock',
+                'verbose_name_plural': 'Job Queue Locks',
+            },
+        ),
+    ]
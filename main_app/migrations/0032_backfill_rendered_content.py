@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 21:40
+
+from django.db import migrations
+
+from main_app.content_render import render_rich_content
+
+
+PAGE_MODELS = ('ContentPage', 'AdmissionAbroadPage', 'DistanceEducationPage', 'OnlineEducationPage')
+
+
+def backfill_rendered_content(apps, schema_editor):
+    """Detail pages only emit rendered_content - render the rows saved before it existed"""
+    for model_name in PAGE_MODELS:
+        model = apps.get_model('main_app', model_name)
+        batch = []
+        for page in model.objects.filter(rendered_content='').exclude(content='').only('id', 'content').iterator():
+            rendered = render_rich_content(page.content)
+            page.rendered_content, page.content_toc, page.content_excerpt = rendered
+            batch.append(page)
+        model.objects.bulk_update(batch, ['rendered_content', 'content_toc', 'content_excerpt'], batch_size=200)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0031_job_queue_lock'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rendered_content, migrations.RunPython.noop),
+    ]
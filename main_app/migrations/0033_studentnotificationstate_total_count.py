@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 21:55
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_total_count(apps, schema_editor):
+    Notification = apps.get_model('main_app', 'ManagementQuotaNotification')
+    State = apps.get_model('main_app', 'StudentNotificationState')
+
+    totals = Notification.objects.order_by().values('student_id').annotate(n=Count('id')).values_list('student_id', 'n')
+    states = {state.pk: state for state in State.objects.all()}
+    for student_id, n in totals:
+        state = states.get(student_id) or State(student_id=student_id)
+        state.total_count = n
+        states[student_id] = state
+    State.objects.bulk_create([state for state in states.values() if state._state.adding], batch_size=500)
+    State.objects.bulk_update([state for state in states.values() if not state._state.adding], ['total_count'],
+                              batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0032_backfill_rendered_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentnotificationstate',
+            name='total_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_total_count, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .content_render import apply_rendered_content
+from .images import placeholder_image, variant_lqip, variant_srcset, variant_url
+from .protected_files import protected_file_url
+
 class HomeSectionCard(models.Model):
     """Model for managing home page service cards"""
     
@@ -10,6 +14,7 @@ class HomeSectionCard(models.Model):
     
     # Image - Admin can upload ya URL paste kar sakta hai
     card_image = models.ImageField(upload_to='home_cards/', blank=True, null=True, help_text="Upload image")
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True, help_text="OR paste image URL (Icons8, etc)")
     
     # Link/Redirect
@@ -41,8 +46,16 @@ class HomeSectionCard(models.Model):
     def get_image(self):
         """Returns image URL - uploaded ya external"""
         if self.card_image:
-            return self.card_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/100'
+            return variant_url(self.card_image, self.card_image_variants)
+        return self.image_url if self.image_url else placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
 
 
 class CollegeCounsellingCard(models.Model):
@@ -61,6 +74,7 @@ class CollegeCounsellingCard(models.Model):
     
     # Image
     card_image = models.ImageField(upload_to='counselling_cards/', blank=True, null=True, help_text="Upload image")
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True, help_text="OR paste image URL")
     
     # Link/Redirect
@@ -89,8 +103,16 @@ class CollegeCounsellingCard(models.Model):
     def get_image(self):
         """Returns image URL - uploaded ya external"""
         if self.card_image:
-            return self.card_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/100'
+            return variant_url(self.card_image, self.card_image_variants)
+        return self.image_url if self.image_url else placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
     
 
 # models.py mein YE MODEL ADD KARO (existing models ke NEECHE)
@@ -201,6 +223,7 @@ class AllIndiaServiceCard(models.Model):
     
     # Icon/Image
     card_image = models.ImageField(upload_to='all_india_services/', blank=True, null=True, help_text="Upload icon/image")
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True, help_text="OR paste image URL")
     
     # Link/Redirect
@@ -229,8 +252,16 @@ class AllIndiaServiceCard(models.Model):
     def get_image(self):
         """Returns image URL - uploaded ya external"""
         if self.card_image:
-            return self.card_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/100'
+            return variant_url(self.card_image, self.card_image_variants)
+        return self.image_url if self.image_url else placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
     
     def get_slug(self):
         """Extract slug from redirect_link"""
@@ -265,6 +296,7 @@ class ProfessionalCounsellingCard(models.Model):
     
     # Icon/Image
     card_image = models.ImageField(upload_to='counselling_cards/', blank=True, null=True)
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True)
     
     # Redirect (internal section)
@@ -291,8 +323,16 @@ class ProfessionalCounsellingCard(models.Model):
     
     def get_image(self):
         if self.card_image:
-            return self.card_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/100'
+            return variant_url(self.card_image, self.card_image_variants)
+        return self.image_url if self.image_url else placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
 
 
 # ==================== STUDENT DOCUMENT MODEL ====================
@@ -337,6 +377,7 @@ class StudentDocument(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=50, choices=DOCUMENT_TYPE_CHOICES)
     document_file = models.FileField(upload_to='student_documents/')
+    document_file_normalized = models.JSONField(default=dict, blank=True, editable=False)  # see uploads.py
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     admin_remarks = models.TextField(blank=True)
     
@@ -350,6 +391,10 @@ class StudentDocument(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.document_type}"
 
+    def get_download_url(self):
+        """Authenticated download URL (see protected_files.py)"""
+        return protected_file_url(self, 'document_file')
+
 
 # ==================== CHOICE FILLING MODEL ====================
 class ChoiceFilling(models.Model):
@@ -481,6 +526,7 @@ class AdmissionAbroadCard(models.Model):
     
     # Icon/Image
     card_image = models.ImageField(upload_to='admission_abroad/', blank=True, null=True)
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True)
     
     # Link/Redirect (keep for backward compatibility)
@@ -514,8 +560,16 @@ class AdmissionAbroadCard(models.Model):
     
     def get_image(self):
         if self.card_image:
-            return self.card_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/100'
+            return variant_url(self.card_image, self.card_image_variants)
+        return self.image_url if self.image_url else placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
 # models.py mein ye add karo
 
 
@@ -526,6 +580,7 @@ class DistanceEducationCard(models.Model):
     slug = models.SlugField(max_length=255, unique=True, blank=True)  # ✅ ADD THIS
     description = models.TextField(blank=True)
     card_image = models.ImageField(upload_to='distance_education/', blank=True, null=True)
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(blank=True, null=True)
     border_color = models.CharField(max_length=20, default='#3498db')
     redirect_link = models.CharField(max_length=500, blank=True)
@@ -554,10 +609,18 @@ class DistanceEducationCard(models.Model):
     def get_image(self):
         """Return image URL"""
         if self.card_image:
-            return self.card_image.url
+            return variant_url(self.card_image, self.card_image_variants)
         elif self.image_url:
             return self.image_url
-        return '/static/img/default-card.png'
+        return placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
 # ==================== DISTANCE EDUCATION NESTED STRUCTURE ====================
 
 class DistanceEducationSubCategory(models.Model):
@@ -592,6 +655,7 @@ class DistanceEducationSubCategory(models.Model):
     
     # Icon options
     icon_image = models.ImageField(upload_to='distance_education/icons/', blank=True, null=True)
+    icon_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     icon_url = models.URLField(blank=True, null=True)
     icon_color = models.CharField(max_length=20, default='#007bff')
     
@@ -606,6 +670,12 @@ class DistanceEducationSubCategory(models.Model):
         verbose_name = "Distance Education Sub-Category"
         verbose_name_plural = "Distance Education Sub-Categories"
         ordering = ['order', 'title']
+        indexes = [
+            models.Index(fields=['parent_card', 'parent_subcategory', 'order'], name='dist_subcat_card_order_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['parent_subcategory', 'order'], name='dist_subcat_parent_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return self.title
@@ -613,10 +683,18 @@ class DistanceEducationSubCategory(models.Model):
     def get_icon(self):
         """Return icon image or URL"""
         if self.icon_image:
-            return self.icon_image.url
+            return variant_url(self.icon_image, self.icon_image_variants)
         elif self.icon_url:
             return self.icon_url
-        return '/static/img/default-icon.png'
+        return placeholder_image(100, 100)
+    
+    def get_icon_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.icon_image, self.icon_image_variants)
+    
+    def get_icon_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.icon_image, self.icon_image_variants)
     
     def get_children(self):
         """Get all child subcategories"""
@@ -657,9 +735,14 @@ class DistanceEducationPage(models.Model):
     slug = models.SlugField(max_length=255, blank=True)
     summary = models.TextField(blank=True)
     content = RichTextUploadingField()  # Changed to RichTextUploadingField
+    # Pre-rendered on save (see content_render.py) - templates emit rendered_content
+    rendered_content = models.TextField(blank=True, editable=False)
+    content_toc = models.JSONField(default=list, blank=True, editable=False)
+    content_excerpt = models.TextField(blank=True, editable=False)
     
     # SEO & Images
     featured_image = models.ImageField(upload_to='distance_education/pages/', blank=True, null=True)
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     featured_image_url = models.URLField(blank=True, null=True)
     meta_description = models.CharField(max_length=160, blank=True)
     meta_keywords = models.CharField(max_length=255, blank=True)
@@ -679,6 +762,10 @@ class DistanceEducationPage(models.Model):
         verbose_name_plural = "Distance Education Pages"
         ordering = ['order', 'title']
         unique_together = ['sub_category', 'slug']
+        indexes = [
+            models.Index(fields=['sub_category', 'order'], name='dist_page_sub_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return f"{self.sub_category.title} - {self.title}"
@@ -687,15 +774,24 @@ class DistanceEducationPage(models.Model):
         if not self.slug:
             from django.utils.text import slugify
             self.slug = slugify(self.title)
+        kwargs['update_fields'] = apply_rendered_content(self, kwargs.get('update_fields'))
         super().save(*args, **kwargs)
     
     def get_featured_image(self):
         """Return featured image or URL"""
         if self.featured_image:
-            return self.featured_image.url
+            return variant_url(self.featured_image, self.featured_image_variants)
         elif self.featured_image_url:
             return self.featured_image_url
-        return 'https://via.placeholder.com/800x400'
+        return placeholder_image(800, 400)
+    
+    def get_featured_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.featured_image, self.featured_image_variants)
+    
+    def get_featured_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.featured_image, self.featured_image_variants)
     
     def increment_views(self):
         """Increment page views"""
@@ -720,6 +816,7 @@ class OnlineEducationCard(models.Model):
     description = models.TextField(max_length=300)
     
     card_image = models.ImageField(upload_to='online_education/', blank=True, null=True)
+    card_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True)
     
     redirect_link = models.CharField(max_length=500, blank=True)
@@ -750,8 +847,16 @@ class OnlineEducationCard(models.Model):
     
     def get_image(self):
         if self.card_image:
-            return self.card_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/100'
+            return variant_url(self.card_image, self.card_image_variants)
+        return self.image_url if self.image_url else placeholder_image(100, 100)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.card_image, self.card_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.card_image, self.card_image_variants)
 
 
 # ✅ ADD NEW MODELS
@@ -804,6 +909,7 @@ class OnlineEducationSubCategory(models.Model):
     
     # Icon options
     icon_image = models.ImageField(upload_to='online_education/icons/', blank=True, null=True)
+    icon_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     icon_url = models.URLField(blank=True, null=True)
     icon_color = models.CharField(max_length=20, default='#007bff')
     
@@ -818,16 +924,30 @@ class OnlineEducationSubCategory(models.Model):
         verbose_name = "Online Education Sub-Category"
         verbose_name_plural = "Online Education Sub-Categories"
         ordering = ['order', 'title']
+        indexes = [
+            models.Index(fields=['parent_card', 'parent_subcategory', 'order'], name='online_subcat_card_order_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['parent_subcategory', 'order'], name='online_subcat_parent_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return self.title
     
     def get_icon(self):
         if self.icon_image:
-            return self.icon_image.url
+            return variant_url(self.icon_image, self.icon_image_variants)
         elif self.icon_url:
             return self.icon_url
-        return '/static/img/default-icon.png'
+        return placeholder_image(100, 100)
+    
+    def get_icon_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.icon_image, self.icon_image_variants)
+    
+    def get_icon_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.icon_image, self.icon_image_variants)
     
     def get_children(self):
         """Get all active children"""
@@ -897,9 +1017,14 @@ class OnlineEducationPage(models.Model):
     slug = models.SlugField(max_length=255, blank=True)
     summary = models.TextField(blank=True)
     content = RichTextUploadingField()  # Changed to RichTextUploadingField
+    # Pre-rendered on save (see content_render.py) - templates emit rendered_content
+    rendered_content = models.TextField(blank=True, editable=False)
+    content_toc = models.JSONField(default=list, blank=True, editable=False)
+    content_excerpt = models.TextField(blank=True, editable=False)
     
     # SEO & Images
     featured_image = models.ImageField(upload_to='online_education/pages/', blank=True, null=True)
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     featured_image_url = models.URLField(blank=True, null=True)
     meta_description = models.CharField(max_length=160, blank=True)
     meta_keywords = models.CharField(max_length=255, blank=True)
@@ -919,6 +1044,10 @@ class OnlineEducationPage(models.Model):
         verbose_name_plural = "Online Education Pages"
         ordering = ['order', 'title']
         unique_together = ['sub_category', 'slug']
+        indexes = [
+            models.Index(fields=['sub_category', 'order'], name='online_page_sub_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return f"{self.sub_category.title} - {self.title}"
@@ -927,14 +1056,23 @@ class OnlineEducationPage(models.Model):
         if not self.slug:
             from django.utils.text import slugify
             self.slug = slugify(self.title)
+        kwargs['update_fields'] = apply_rendered_content(self, kwargs.get('update_fields'))
         super().save(*args, **kwargs)
     
     def get_featured_image(self):
         if self.featured_image:
-            return self.featured_image.url
+            return variant_url(self.featured_image, self.featured_image_variants)
         elif self.featured_image_url:
             return self.featured_image_url
-        return 'https://via.placeholder.com/800x400'
+        return placeholder_image(800, 400)
+    
+    def get_featured_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.featured_image, self.featured_image_variants)
+    
+    def get_featured_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.featured_image, self.featured_image_variants)
     
     def increment_views(self):
         self.views_count += 1
@@ -1067,6 +1205,7 @@ class College(models.Model):
     
     # Images
     college_image = models.ImageField(upload_to='colleges/', blank=True, null=True)
+    college_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     image_url = models.URLField(max_length=500, blank=True)
     
     website = models.URLField(max_length=500, blank=True)
@@ -1085,8 +1224,16 @@ class College(models.Model):
     
     def get_image(self):
         if self.college_image:
-            return self.college_image.url
-        return self.image_url if self.image_url else 'https://via.placeholder.com/300x200'
+            return variant_url(self.college_image, self.college_image_variants)
+        return self.image_url if self.image_url else placeholder_image(300, 200)
+    
+    def get_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.college_image, self.college_image_variants)
+    
+    def get_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.college_image, self.college_image_variants)
 
 
 # ==================== COLLEGE COMPARISON MODEL (UPDATED) ====================
@@ -1162,6 +1309,7 @@ class StateWiseCounsellingUpdate(models.Model):
     
     # Icon/Image
     icon_image = models.ImageField(upload_to='counselling_updates/', blank=True, null=True, help_text="Upload icon")
+    icon_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     icon_url = models.URLField(max_length=500, blank=True, help_text="OR paste icon URL")
     icon_color = models.CharField(max_length=7, default='#ED651C', choices=ICON_COLOR_CHOICES, help_text="Icon background color")
     
@@ -1189,8 +1337,16 @@ class StateWiseCounsellingUpdate(models.Model):
     def get_icon(self):
         """Returns icon URL - uploaded ya external"""
         if self.icon_image:
-            return self.icon_image.url
-        return self.icon_url if self.icon_url else 'https://via.placeholder.com/100'
+            return variant_url(self.icon_image, self.icon_image_variants)
+        return self.icon_url if self.icon_url else placeholder_image(100, 100)
+    
+    def get_icon_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.icon_image, self.icon_image_variants)
+    
+    def get_icon_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.icon_image, self.icon_image_variants)
     
 
 from django.db import models
@@ -1234,6 +1390,7 @@ class SubCategory(models.Model):
     
     # Icon/Image
     icon_image = models.ImageField(upload_to='sub_categories/', blank=True, null=True)
+    icon_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     icon_url = models.URLField(max_length=500, blank=True)
     icon_color = models.CharField(max_length=7, default='#f39c12', choices=ICON_COLOR_CHOICES)
     
@@ -1250,6 +1407,12 @@ class SubCategory(models.Model):
         ordering = ['order', 'id']
         verbose_name = "Sub Category"
         verbose_name_plural = "Sub Categories"
+        indexes = [
+            models.Index(fields=['parent_card', 'parent_subcategory', 'order'], name='subcat_card_order_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['parent_subcategory', 'order'], name='subcat_parent_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         if self.parent_subcategory:
@@ -1260,8 +1423,16 @@ class SubCategory(models.Model):
     
     def get_icon(self):
         if self.icon_image:
-            return self.icon_image.url
-        return self.icon_url if self.icon_url else 'https://via.placeholder.com/100'
+            return variant_url(self.icon_image, self.icon_image_variants)
+        return self.icon_url if self.icon_url else placeholder_image(100, 100)
+    
+    def get_icon_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.icon_image, self.icon_image_variants)
+    
+    def get_icon_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.icon_image, self.icon_image_variants)
     
     def has_children(self):
         """Check if has child subcategories"""
@@ -1327,9 +1498,14 @@ class ContentPage(models.Model):
     # Content
     summary = models.TextField(max_length=500, blank=True, help_text="Short summary (optional)")
     content = RichTextUploadingField()
+    # Pre-rendered on save (see content_render.py) - templates emit rendered_content
+    rendered_content = models.TextField(blank=True, editable=False)
+    content_toc = models.JSONField(default=list, blank=True, editable=False)
+    content_excerpt = models.TextField(blank=True, editable=False)
     
     # Featured Image
     featured_image = models.ImageField(upload_to='content_pages/', blank=True, null=True)
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     featured_image_url = models.URLField(max_length=500, blank=True)
     
     # SEO
@@ -1354,6 +1530,10 @@ class ContentPage(models.Model):
         verbose_name = "Content Page"
         verbose_name_plural = "Content Pages"
         unique_together = ['sub_category', 'slug']
+        indexes = [
+            models.Index(fields=['sub_category', 'order'], name='content_page_sub_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         return f"{self.sub_category.title} → {self.title}"
@@ -1361,12 +1541,21 @@ class ContentPage(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        kwargs['update_fields'] = apply_rendered_content(self, kwargs.get('update_fields'))
         super().save(*args, **kwargs)
     
     def get_featured_image(self):
         if self.featured_image:
-            return self.featured_image.url
-        return self.featured_image_url if self.featured_image_url else 'https://via.placeholder.com/800x400'
+            return variant_url(self.featured_image, self.featured_image_variants)
+        return self.featured_image_url if self.featured_image_url else placeholder_image(800, 400)
+    
+    def get_featured_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.featured_image, self.featured_image_variants)
+    
+    def get_featured_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.featured_image, self.featured_image_variants)
     
     def increment_views(self):
         """Increment view count"""
@@ -1421,6 +1610,7 @@ class AdmissionAbroadSubCategory(models.Model):
     
     # Icon/Image
     icon_image = models.ImageField(upload_to='admission_abroad_sub/', blank=True, null=True)
+    icon_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     icon_url = models.URLField(max_length=500, blank=True)
     icon_color = models.CharField(max_length=7, default='#f39c12', choices=ICON_COLOR_CHOICES)
     
@@ -1437,6 +1627,12 @@ class AdmissionAbroadSubCategory(models.Model):
         ordering = ['order', 'id']
         verbose_name = "Admission Abroad Sub Category"
         verbose_name_plural = "Admission Abroad Sub Categories"
+        indexes = [
+            models.Index(fields=['parent_card', 'parent_subcategory', 'order'], name='abroad_subcat_card_order_idx',
+                         condition=models.Q(is_active=True)),
+            models.Index(fields=['parent_subcategory', 'order'], name='abroad_subcat_parent_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
     
     def __str__(self):
         if self.parent_subcategory:
@@ -1451,8 +1647,16 @@ class AdmissionAbroadSubCategory(models.Model):
     
     def get_icon(self):
         if self.icon_image:
-            return self.icon_image.url
-        return self.icon_url if self.icon_url else 'https://via.placeholder.com/100'
+            return variant_url(self.icon_image, self.icon_image_variants)
+        return self.icon_url if self.icon_url else placeholder_image(100, 100)
+    
+    def get_icon_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.icon_image, self.icon_image_variants)
+    
+    def get_icon_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.icon_image, self.icon_image_variants)
     
     def has_children(self):
         return self.children.filter(is_active=True).exists()
@@ -1515,9 +1719,14 @@ class AdmissionAbroadPage(models.Model):
     # Content
     summary = models.TextField(max_length=500, blank=True)
     content = RichTextUploadingField()  # Changed to RichTextUploadingField for CKEditor
+    # Pre-rendered on save (see content_render.py) - templates emit rendered_content
+    rendered_content = models.TextField(blank=True, editable=False)
+    content_toc = models.JSONField(default=list, blank=True, editable=False)
+    content_excerpt = models.TextField(blank=True, editable=False)
     
     # Featured Image
     featured_image = models.ImageField(upload_to='admission_abroad_pages/', blank=True, null=True)
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)  # resized copies, see images.py
     featured_image_url = models.URLField(max_length=500, blank=True)
     
     # Display Settings
@@ -1535,6 +1744,10 @@ class AdmissionAbroadPage(models.Model):
     
     class Meta:
         ordering = ['sub_category', 'order', '-created_at']
+        indexes = [
+            models.Index(fields=['sub_category', 'order'], name='abroad_page_sub_order_idx',
+                         condition=models.Q(is_active=True)),
+        ]
         
     def __str__(self):
         return f"{self.sub_category.title} → {self.title}"
@@ -1543,13 +1756,22 @@ class AdmissionAbroadPage(models.Model):
         if not self.slug:
             from django.utils.text import slugify
             self.slug = slugify(self.title)
+        kwargs['update_fields'] = apply_rendered_content(self, kwargs.get('update_fields'))
         super().save(*args, **kwargs)
     
     def get_featured_image(self):
         """Return featured image URL"""
         if self.featured_image:
-            return self.featured_image.url
-        return self.featured_image_url if self.featured_image_url else 'https://via.placeholder.com/800x400'
+            return variant_url(self.featured_image, self.featured_image_variants)
+        return self.featured_image_url if self.featured_image_url else placeholder_image(800, 400)
+    
+    def get_featured_image_srcset(self):
+        """srcset for responsive <img> - empty until derivatives are built"""
+        return variant_srcset(self.featured_image, self.featured_image_variants)
+    
+    def get_featured_image_lqip(self):
+        """Blurred inline preview shown while the real image loads"""
+        return variant_lqip(self.featured_image, self.featured_image_variants)
     
     def increment_views(self):
         """Increment view count"""
@@ -1588,6 +1810,9 @@ class StudentCardPurchase(models.Model):
         verbose_name = "Student Card Purchase"
         verbose_name_plural = "Student Card Purchases"
         ordering = ['-purchased_at']
+        indexes = [
+            models.Index(fields=['student', 'payment_status'], name='card_purchase_student_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.card.title}"
@@ -1672,7 +1897,10 @@ class ManagementQuotaApplication(models.Model):
     # Documents
     tenth_marksheet = models.FileField(upload_to='management_quota/tenth/')
     twelfth_marksheet = models.FileField(upload_to='management_quota/twelfth/')
+    tenth_marksheet_normalized = models.JSONField(default=dict, blank=True, editable=False)  # see uploads.py
+    twelfth_marksheet_normalized = models.JSONField(default=dict, blank=True, editable=False)
     exam_scorecard = models.FileField(upload_to='management_quota/exam/', null=True, blank=True)
+    exam_scorecard_normalized = models.JSONField(default=dict, blank=True, editable=False)
     
     # Status & Admin Details
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -1689,10 +1917,22 @@ class ManagementQuotaApplication(models.Model):
         unique_together = ['student', 'college']  # One application per student per college
         verbose_name = "Management Quota Application"
         verbose_name_plural = "Management Quota Applications"
+        indexes = [
+            models.Index(fields=['status', 'applied_at'], name='mq_app_status_applied_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.college.college.name}"
     
+    def get_tenth_marksheet_url(self):
+        return protected_file_url(self, 'tenth_marksheet')
+
+    def get_twelfth_marksheet_url(self):
+        return protected_file_url(self, 'twelfth_marksheet')
+
+    def get_exam_scorecard_url(self):
+        return protected_file_url(self, 'exam_scorecard')
+
     def get_average_marks(self):
         """Calculate average of 10th and 12th marks"""
         return (float(self.tenth_marks) + float(self.twelfth_marks)) / 2
@@ -1725,11 +1965,15 @@ class ManagementQuotaNotification(models.Model):
     title = models.CharField(max_length=200)
     message = models.TextField()
     
+    # Legacy flag - read state is StudentNotificationState.last_read_at now
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['student', 'created_at'], name='mq_notif_student_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.title}"
@@ -1762,4 +2006,266 @@ class ManagementQuotaSeatAllocation(models.Model):
         verbose_name_plural = "Management Quota Seat Allocations"
     
     def __str__(self):
-        return f"Roll: {self.allocation_roll_number} - {self.application.student.name}"
\ No newline at end of file
+        return f"Roll: {self.allocation_roll_number} - {self.application.student.name}"
+
+# ==================== MEDIA BLOB MODEL ====================
+class MediaBlob(models.Model):
+    """Reference count for a content-addressed media file (see storage.py)"""
+    
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name of the file")
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+# ==================== RESUMABLE UPLOAD SESSION MODEL ====================
+import uuid
+
+
+class UploadSession(models.Model):
+    """Chunked upload in progress - bytes so far live in a .part file (see resumable.py)"""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    field_name = models.CharField(max_length=50)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField(help_text="Total size announced by the client")
+    offset = models.BigIntegerField(default=0, help_text="Bytes received so far")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Upload Session"
+        verbose_name_plural = "Upload Sessions"
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.filename} ({self.offset}/{self.size})"
+    
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+
+# ==================== BACKGROUND JOB MODELS ====================
+class Job(models.Model):
+    """Queued background task, run by `manage.py run_worker` (see jobs.py)"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    task = models.CharField(max_length=200, help_text="Registered task name, e.g. main_app.tasks.recalculate_document_status")
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    queue = models.CharField(max_length=50, default='default')
+    priority = models.IntegerField(default=0, help_text="Higher runs first")
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not started before this time")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    
+    # Periodic jobs: only one queued/running job per key
+    unique_key = models.CharField(max_length=100, null=True, blank=True)
+    
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'queue', 'run_at'], name='job_claim_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='job_unique_active_key',
+            ),
+        ]
+        verbose_name = "Background Job"
+        verbose_name_plural = "Background Jobs"
+    
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class JobQueueLock(models.Model):
+    """One row per capped queue (JOB_QUEUE_CONCURRENCY) - locked while a worker counts and claims"""
+    
+    queue = models.CharField(max_length=50, unique=True)
+    
+    class Meta:
+        verbose_name = "Job Queue Lock"
+        verbose_name_plural = "Job Queue Locks"
+    
+    def __str__(self):
+        return self.queue
+
+
+class JobResult(models.Model):
+    """Outcome of one attempt of a Job"""
+    
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='results')
+    attempt = models.PositiveIntegerField()
+    succeeded = models.BooleanField(default=False)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-finished_at']
+        verbose_name = "Job Result"
+        verbose_name_plural = "Job Results"
+    
+    def __str__(self):
+        return f"{self.job.task} #{self.job_id} attempt {self.attempt}: {'ok' if self.succeeded else 'error'}"
+    
+    @property
+    def duration(self):
+        return self.finished_at - self.started_at
+
+
+# ==================== OUTBOUND EMAIL MODEL ====================
+class OutboundEmail(models.Model):
+    """Rendered mail waiting for the worker (see mail.py)"""
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    to = models.JSONField(default=list, help_text="Recipient addresses")
+    from_email = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    template = models.CharField(max_length=100, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='outbound_email_queue_idx'),
+        ]
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+# ==================== NOTIFICATION EVENT MODEL ====================
+class NotificationEvent(models.Model):
+    """Not yet delivered notification; coalesced into digests by notifications.py"""
+    
+    student = models.ForeignKey(UserRegistration, on_delete=models.CASCADE, related_name='mq_notification_events')
+    application = models.ForeignKey(ManagementQuotaApplication, on_delete=models.CASCADE, null=True, blank=True)
+    
+    notification_type = models.CharField(max_length=20, choices=ManagementQuotaNotification.NOTIFICATION_TYPE_CHOICES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    
+    # Set when a digest run claims the event
+    batch = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['batch', 'created_at'], name='notif_event_batch_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.title}"
+
+
+# ==================== STUDENT NOTIFICATION STATE MODEL ====================
+class StudentNotificationState(models.Model):
+    """Per-student read watermark and unread counter for ManagementQuotaNotification"""
+    
+    student = models.OneToOneField(UserRegistration, on_delete=models.CASCADE, primary_key=True, related_name='notification_state')
+    # Notifications created after this are unread
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    # Maintained when notifications are delivered (notifications.py)
+    unread_count = models.PositiveIntegerField(default=0)
+    total_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Student Notification State"
+        verbose_name_plural = "Student Notification States"
+    
+    def __str__(self):
+        return f"{self.student_id}: {self.unread_count} unread"
+
+
+# ==================== ANALYTICS MODELS (own database, see routers.py) ====================
+# No foreign keys - the rows live in the 'analytics' database, apart from the
+# tables they refer to.
+
+class PageView(models.Model):
+    """One view of a content page; rolled up into the page's views_count by analytics.py"""
+    
+    page_type = models.CharField(max_length=100)  # model label, e.g. main_app.contentpage
+    page_id = models.PositiveBigIntegerField()
+    user_id = models.PositiveBigIntegerField(null=True, blank=True)
+    # Set when the view was added to views_count
+    counted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['counted', 'id'], name='pageview_counted_idx'),
+            models.Index(fields=['page_type', 'page_id', 'created_at'], name='pageview_page_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.page_type} #{self.page_id}"
+
+
+class SearchLog(models.Model):
+    """A student search and how many results it found"""
+    
+    source = models.CharField(max_length=50)  # which search box
+    query = models.CharField(max_length=200)
+    results = models.PositiveIntegerField(default=0)
+    user_id = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'created_at'], name='searchlog_source_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.source}: {self.query}"
@@ -0,0 +1,218 @@
+"""
+Management quota notifications, delivered as digests.
+
+Views record events instead of creating ManagementQuotaNotification rows::
+
+    notify_application(application, 'approved', 'Application Approved', message)
+
+An event is one small insert. Events are delivered by a background job that
+runs at the end of a NOTIFICATION_DIGEST_WINDOW (seconds) time bucket - one
+job per bucket, whatever the number of events. The job coalesces all pending
+events per student and notification type:
+
+* a single event becomes a normal notification
+* identical events (same application and message) count once
+* several events become one digest ("Application Approved (12)") listing at
+  most NOTIFICATION_DIGEST_MAX_ITEMS messages
+
+and inserts the notifications with bulk_create. Approving 300 applications in
+a row therefore costs 300 event inserts and a handful of notification rows
+instead of a burst of near-identical messages per student.
+
+Read state is a per-student watermark (StudentNotificationState): everything
+created after ``last_read_at`` is unread, and ``unread_count`` is bumped when
+notifications are delivered (``total_count`` too - the page header needs no
+COUNT either). Opening the notifications page moves the
+watermark to the newest delivered notification and zeroes the counter - one
+row update instead of flagging every notification - and the badge is a
+primary key lookup instead of a COUNT.
+"""
+
+import uuid
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+
+BULK_BATCH_SIZE = 500
+
+
+def digest_window():
+    return max(1, int(getattr(settings, 'NOTIFICATION_DIGEST_WINDOW', 120)))
+
+
+# ==================== RECORDING EVENTS ====================
+
+def schedule_digest(now=None):
+    """Make sure the digest job of the current time bucket is queued"""
+    from .tasks import deliver_notification_digests
+
+    window = digest_window()
+    bucket = int((now or timezone.now()).timestamp()) // window
+    run_at = datetime.fromtimestamp((bucket + 1) * window, tz=dt_timezone.utc)
+    # Events recorded while a bucket's job runs belong to the next bucket
+    deliver_notification_digests.schedule(run_at=run_at, unique_key=f'notification-digest:{bucket}')
+
+
+def notify(student_id, notification_type, title, message, application_id=None):
+    """Record one notification event for a student (UserRegistration id)"""
+    from .models import NotificationEvent
+
+    event = NotificationEvent.objects.create(
+        student_id=student_id,
+        application_id=application_id,
+        notification_type=notification_type,
+        title=title,
+        message=message,
+    )
+    schedule_digest()
+    return event
+
+
+def notify_application(application, notification_type, title, message):
+    return notify(application.student_id, notification_type, title, message, application_id=application.id)
+
+
+def notify_many(events):
+    """Record unsaved NotificationEvent instances with one bulk insert (bulk status changes)"""
+    from .models import NotificationEvent
+
+    events = NotificationEvent.objects.bulk_create(events, batch_size=BULK_BATCH_SIZE)
+    if events:
+        schedule_digest()
+    return events
+
+
+# ==================== DELIVERY (background job) ====================
+
+def build_notification(events):
+    """One ManagementQuotaNotification for events of one student and type"""
+    from .models import ManagementQuotaNotification
+
+    unique = []
+    seen = set()
+    for event in events:
+        key = (event.application_id, event.message)
+        if key not in seen:
+            seen.add(key)
+            unique.append(event)
+
+    first = unique[0]
+    applications = {event.application_id for event in unique}
+    notification = ManagementQuotaNotification(
+        student_id=first.student_id,
+        application_id=first.application_id if len(applications) == 1 else None,
+        notification_type=first.notification_type,
+        title=first.title,
+        message=first.message,
+    )
+    if len(unique) > 1:
+        max_items = getattr(settings, 'NOTIFICATION_DIGEST_MAX_ITEMS', 10)
+        lines = [f'- {event.message}' for event in unique[:max_items]]
+        if len(unique) > max_items:
+            lines.append(f'... and {len(unique) - max_items} more')
+        notification.title = f'{first.get_notification_type_display()} ({len(unique)})'
+        notification.message = '\n'.join(lines)
+    return notification
+
+
+def deliver_digests():
+    """Turn every pending event into notifications; returns the number created"""
+    from .models import ManagementQuotaNotification, NotificationEvent
+
+    batch = uuid.uuid4().hex
+    with transaction.atomic():
+        # One UPDATE claims the events - overlapping runs never deliver twice
+        NotificationEvent.objects.filter(batch='', created_at__lte=timezone.now()).update(batch=batch)
+        events = NotificationEvent.objects.filter(batch=batch).order_by('student_id', 'notification_type', 'created_at')
+
+        notifications = [
+            build_notification(list(group))
+            for _, group in groupby(events.iterator(), key=lambda e: (e.student_id, e.notification_type))
+        ]
+        counts = Counter(notification.student_id for notification in notifications)
+        # Counters first - their row lock orders this against mark_all_read()
+        add_unread(counts)
+        ManagementQuotaNotification.objects.bulk_create(notifications, batch_size=BULK_BATCH_SIZE)
+        NotificationEvent.objects.filter(batch=batch).delete()
+        transaction.on_commit(lambda: publish_students(counts))
+    return len(notifications)
+
+
+def publish_students(student_ids):
+    """Wake up the live notification streams (live.py) of these students"""
+    from .live import publish, student_channel
+
+    for student_id in student_ids:
+        publish(student_channel(student_id))
+
+
+# ==================== READ STATE ====================
+
+def add_unread(counts):
+    """Bump unread and total counters; `counts` maps student id -> new notifications"""
+    from .models import StudentNotificationState
+
+    if not counts:
+        return
+    # Missing rows first (a concurrent mark_all_read may create one too), then
+    # every counter is bumped by an UPDATE - which takes the row lock
+    StudentNotificationState.objects.bulk_create(
+        [StudentNotificationState(student_id=student_id) for student_id in counts],
+        batch_size=BULK_BATCH_SIZE, ignore_conflicts=True,
+    )
+    # One UPDATE per distinct increment, usually just one or two
+    by_increment = {}
+    for student_id, n in counts.items():
+        by_increment.setdefault(n, []).append(student_id)
+    for n, student_ids in by_increment.items():
+        StudentNotificationState.objects.filter(student_id__in=student_ids).update(
+            unread_count=F('unread_count') + n, total_count=F('total_count') + n)
+
+
+def unread_count(student_id):
+    from .models import StudentNotificationState
+
+    return StudentNotificationState.objects.filter(student_id=student_id).values_list(
+        'unread_count', flat=True).first() or 0
+
+
+def unread_count_for_user(user_id):
+    """Same, looked up by auth User id (one indexed join, no COUNT)"""
+    from .models import StudentNotificationState
+
+    return StudentNotificationState.objects.filter(student__user_id=user_id).values_list(
+        'unread_count', flat=True).first() or 0
+
+
+def mark_all_read(student_id):
+    """
+    Move the student's watermark to their newest delivered notification.
+    Returns the StudentNotificationState as it was before: last_read_at is
+    the previous watermark (None if the student never read anything). No
+    write when nothing is unread.
+    """
+    from .models import ManagementQuotaNotification, StudentNotificationState
+
+    newest = ManagementQuotaNotification.objects.filter(student_id=OuterRef('student_id')).order_by(
+        '-created_at').values('created_at')[:1]
+    states = StudentNotificationState.objects.select_for_update().annotate(newest=Subquery(newest))
+    with transaction.atomic():
+        # deliver_digests() bumps the counter under the same row lock before it
+        # inserts: a delivery either finished (read here) or waits (stays unread)
+        state, created = states.get_or_create(student_id=student_id)
+        if created:
+            state = states.get(pk=student_id)
+        previous = state.last_read_at
+        watermark = max(filter(None, (previous, state.newest)), default=None)
+        if watermark != previous or state.unread_count:
+            StudentNotificationState.objects.filter(pk=student_id).update(last_read_at=watermark, unread_count=0)
+            # Badge in the student's other tabs
+            transaction.on_commit(lambda: publish_students([student_id]))
+    return state
+
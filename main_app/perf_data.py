@@ -0,0 +1,509 @@
+"""
+Synthetic data for query budgets and performance runs.
+
+``generate(volumes, seed)`` fills the database with a deterministic dataset:
+students with documents, doubts, complaints, purchases and management quota
+applications / notifications, every card type, the four content trees
+(All India services, distance education, online education, admission
+abroad) `depth` levels deep with pages on the leaves, colleges and
+comparisons. Rows are inserted with bulk_create in chunks - no save(), no
+signals - so the same code seeds a test database in a second and a
+production-sized one in minutes.
+
+The returned Dataset keeps one representative object of every kind (the
+first one created, owned by the `student` persona) and ``route_kwargs()``
+resolves the URL arguments of any main_app route from it.
+"""
+
+import random
+import time
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, models, router, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .content_render import RENDERED_FIELDS, render_rich_content
+from .models import (
+    AdmissionAbroadCard, AdmissionAbroadPage, AdmissionAbroadSubCategory, AdmissionIndiaCard,
+    AllIndiaServiceCard, CareerCounsellingService, ChoiceFilling, College, CollegeComparison,
+    CollegeCounsellingCard, Complaint, ContentPage, CounsellingStatus, Country, DistanceEducationCard,
+    DistanceEducationPage, DistanceEducationSubCategory, DoubtSession, HomeSectionCard,
+    ManagementQuotaApplication, ManagementQuotaCollege, ManagementQuotaNotification,
+    ManagementQuotaSeatAllocation, MediaBlob, OnlineEducationCard, OnlineEducationPage, OnlineEducationSubCategory,
+    ProfessionalCounsellingCard, State, StateWiseCounsellingUpdate, StudentCardPurchase, StudentDocument,
+    SubCategory, UploadSession, UserRegistration,
+)
+from .protected_files import SIGNING_SALT
+
+
+BATCH_SIZE = 2000
+PASSWORD = 'perf-password'
+
+# Small enough for a test run; seed_perf passes production sized numbers
+DEFAULT_VOLUMES = {
+    'students': 20,
+    'per_student': 2,        # documents, choices, doubts, complaints, purchases per student
+    'states': 5,
+    'colleges': 10,
+    'comparisons': 4,
+    'cards': 3,              # per card type
+    'depth': 2,              # subcategory levels below each card
+    'branching': 2,          # subcategories per card / per parent subcategory
+    'pages': 3,              # pages per leaf subcategory
+    'applications': 20,
+    'notifications': 40,
+}
+
+
+def scaled_volumes(factor, volumes=None):
+    """Every volume times `factor` - except the tree depth"""
+    volumes = dict(volumes or DEFAULT_VOLUMES)
+    return {key: value if key == 'depth' else value * factor for key, value in volumes.items()}
+
+
+class Dataset:
+    """Personas and the first object of every kind (see route_kwargs)"""
+
+    def __init__(self):
+        self.admin = None
+        self.student_user = None
+        self.student = None
+        self.objects = {}
+        self.paths = {}      # tree -> (card_slug, subcategory_path, page_slug)
+        self.counts = {}
+
+    def first(self, model):
+        return self.objects[model]
+
+
+# (card model, subcategory model, page model, children keep parent_card)
+TREES = {
+    'all-india': (AllIndiaServiceCard, SubCategory, ContentPage, False),
+    'distance-education': (DistanceEducationCard, DistanceEducationSubCategory, DistanceEducationPage, False),
+    'online-education': (OnlineEducationCard, OnlineEducationSubCategory, OnlineEducationPage, False),
+    'admission-abroad': (AdmissionAbroadCard, AdmissionAbroadSubCategory, AdmissionAbroadPage, True),
+}
+
+
+def bulk_create(model, objects, dataset, keep=lambda obj: obj):
+    """
+    Insert `objects` (any iterable, consumed BATCH_SIZE at a time) and return
+    keep(obj) of every inserted row - objects have their pk by then (SQLite
+    3.35+ / PostgreSQL). keep=None keeps nothing.
+    """
+    kept = []
+    objects = iter(objects)
+    while batch := list(islice(objects, BATCH_SIZE)):
+        model.objects.bulk_create(batch)
+        dataset.objects.setdefault(model, batch[0])
+        dataset.counts[model.__name__] = dataset.counts.get(model.__name__, 0) + len(batch)
+        if keep is not None:
+            kept.extend(map(keep, batch))
+    return kept
+
+
+def pk(obj):
+    return obj.pk
+
+
+def insert_rows(model, columns, rows, dataset, constants=None):
+    """
+    Fast path for the tables with millions of rows, like copy_database: one
+    INSERT run with executemany, BATCH_SIZE rows at a time. `rows` yields
+    tuples for `columns` (attnames; ints and strings, passed as they are).
+    Every other column gets `constants` or its default, prepared for the
+    database once instead of per row - bulk_create spends most of its time
+    there. No pks come back.
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = {field.attname: field for field in model._meta.local_concrete_fields}
+    constants = constants or {}
+    now = timezone.now()
+    fixed = {}
+    for attname, field in fields.items():
+        if attname in columns or (field.primary_key and attname not in constants):
+            continue
+        if attname in constants:
+            value = constants[attname]
+        elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            value = now if isinstance(field, models.DateTimeField) else now.date()
+        else:
+            value = field.get_default()
+        fixed[attname] = field.get_db_prep_save(value, connection=connection)
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(fields[attname].column) for attname in [*columns, *fixed])
+    placeholders = ', '.join(['%s'] * (len(columns) + len(fixed)))
+    sql = f'INSERT INTO {table} ({names}) VALUES ({placeholders})'
+    fixed_values = tuple(fixed.values())
+
+    last_pk = model._base_manager.aggregate(last=Max('pk'))['last'] or 0
+    rows = iter(rows)
+    inserted = 0
+    with connection.cursor() as cursor:
+        while batch := list(islice(rows, BATCH_SIZE)):
+            cursor.executemany(sql, [row + fixed_values for row in batch])
+            inserted += len(batch)
+    if inserted and model not in dataset.objects:
+        dataset.objects[model] = model._base_manager.filter(pk__gt=last_pk).order_by('pk').first()
+    dataset.counts[model.__name__] = dataset.counts.get(model.__name__, 0) + inserted
+    return inserted
+
+
+def placeholder_file(name, content=b'%PDF-1.4\n% synthetic document\n'):
+    """
+    One stored file shared by every generated row that needs one - call
+    share_placeholder() with the number of rows that reference it
+    """
+    return default_storage.save(f'perf/{name}', ContentFile(content, name=name))
+
+
+def share_placeholder(name, references):
+    """
+    insert_rows() skips the content-addressed storage's reference counting:
+    count every row using the placeholder, so deleting one of them doesn't
+    delete the file of all the others. save() already counted one.
+    """
+    MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + references - 1)
+
+
+def generate(volumes=None, seed=0, stdout=None):
+    """
+    Seed the database; one transaction per step, so the SQLite WAL doesn't
+    grow to the size of the whole dataset. Writes the time of every step to
+    `stdout` if given.
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(seed)
+    dataset = Dataset()
+
+    for step in (_people, _cards, _trees, _colleges, _student_activity, _management_quota):
+        started = time.perf_counter()
+        with transaction.atomic():
+            step(dataset, volumes, rng)
+        if stdout:
+            stdout.write(f"{step.__name__.strip('_')}: {time.perf_counter() - started:.1f}s")
+    return dataset
+
+
+# ==================== PEOPLE ====================
+
+def _people(dataset, volumes, rng):
+    password = make_password(PASSWORD)
+    dataset.admin = User.objects.create(username='perf-admin', email='admin@perf.test', password=password,
+                                        is_staff=True, is_superuser=True)
+
+    india = bulk_create(Country, [Country(name='India', code='IN'), Country(name='Canada', code='CA')], dataset)[0]
+    states = bulk_create(State, [State(country=india, name=f'State {i}') for i in range(volumes['states'])], dataset)
+
+    user_ids = bulk_create(User, (
+        User(username=f'student{i}', email=f'student{i}@perf.test', password=password)
+        for i in range(volumes['students'])
+    ), dataset, keep=pk)
+    courses = [choice for choice, _label in UserRegistration.COURSE_CHOICES]
+    student_ids = bulk_create(UserRegistration, (
+        UserRegistration(
+            user_id=user_id, name=f'Student {i}', father_name=f'Father {i}',
+            mobile=f'9{i:09d}', whatsapp_mobile=f'9{i:09d}', email=f'student{i}@perf.test',
+            course=courses[0] if i == 0 else rng.choice(courses),
+            country=india, state=states[0] if i == 0 else rng.choice(states),
+            city='Jaipur', password=password,
+        )
+        for i, user_id in enumerate(user_ids)
+    ), dataset, keep=pk)
+    insert_rows(CounsellingStatus, ['student_id'], ((user_id,) for user_id in user_ids), dataset)
+
+    dataset.student_user = dataset.first(User)
+    dataset.student = dataset.first(UserRegistration)
+    dataset.states = states
+    dataset.user_ids = user_ids
+    dataset.student_ids = student_ids
+
+
+# ==================== CARDS ====================
+
+def _cards(dataset, volumes, rng):
+    admin = dataset.admin
+    count = volumes['cards']
+    bulk_create(HomeSectionCard, [
+        HomeSectionCard(title_line1=f'Home card {i}', order=i, created_by=admin) for i in range(count)
+    ], dataset)
+    bulk_create(CollegeCounsellingCard, [
+        CollegeCounsellingCard(title=f'Counselling card {i}', description='Synthetic card', order=i, created_by=admin)
+        for i in range(count)
+    ], dataset)
+    bulk_create(CareerCounsellingService, [
+        CareerCounsellingService(title=f'Career service {i}', description='Synthetic service', order=i,
+                                 created_by=admin)
+        for i in range(count)
+    ], dataset)
+    bulk_create(AdmissionIndiaCard, [
+        AdmissionIndiaCard(title=f'Admission card {i}', order=i, created_by=admin) for i in range(count)
+    ], dataset)
+    bulk_create(ProfessionalCounsellingCard, [
+        ProfessionalCounsellingCard(title=f'Expert card {i}', description='Synthetic card',
+                                    section_id=f'section-{i}', order=i, created_by=admin)
+        for i in range(count)
+    ], dataset)
+
+
+def _trees(dataset, volumes, rng):
+    for tree in TREES:
+        _tree(dataset, tree, volumes, rng)
+
+
+def _tree(dataset, tree, volumes, rng):
+    """Cards -> `depth` levels of `branching` subcategories -> `pages` pages per leaf"""
+    card_model, subcategory_model, page_model, children_keep_card = TREES[tree]
+    admin = dataset.admin
+    cards = []
+    for i in range(volumes['cards']):
+        slug = f'{tree}-{i}-card'
+        card = card_model(title=f'{tree} card {i}', order=i, created_by=admin)
+        if card_model is AllIndiaServiceCard:
+            card.redirect_link = f'/{slug}/'
+        else:
+            card.slug = slug
+            card.description = 'Synthetic card'
+        cards.append(card)
+    cards = bulk_create(card_model, cards, dataset)
+
+    # Level by level: (subcategory, root card)
+    parents = [(None, card) for card in cards]
+    for level in range(volumes['depth']):
+        children, roots = [], []
+        for parent, card in parents:
+            for i in range(volumes['branching']):
+                child = subcategory_model(
+                    parent_card=card if parent is None or children_keep_card else None,
+                    parent_subcategory=parent,
+                    title=f'{tree} level {level} #{len(children)}',
+                    slug=f'{tree}-{level}-{len(children)}',
+                    order=i,
+                    created_by=admin,
+                )
+                if subcategory_model is SubCategory and rng.random() < 0.25:
+                    child.state = rng.choice(dataset.states)
+                children.append(child)
+                roots.append(card)
+        parents = list(zip(bulk_create(subcategory_model, children, dataset), roots))
+
+    content = '<h2>Eligibility</h2><p>Synthetic page.</p><h2>Fees</h2><p>Details.</p>'
+    rendered = render_rich_content(content)
+    rendered_fields = dict(zip(RENDERED_FIELDS, (rendered.html, rendered.toc, rendered.excerpt)))
+    insert_rows(page_model, ['sub_category_id', 'title', 'slug', 'order'], (
+        (leaf.pk, f'{tree} page {leaf.pk}-{i}', f'{tree}-page-{leaf.pk}-{i}', i)
+        for leaf, _card in parents for i in range(volumes['pages'])
+    ), dataset, constants={'content': content, 'created_by_id': admin.pk, **rendered_fields})
+
+    # Deepest chain of the first card, for the detail URLs
+    slugs, node = [], parents[0][0]
+    while node is not None:
+        slugs.insert(0, node.slug)
+        node = node.parent_subcategory
+    page = dataset.objects.get(page_model)
+    dataset.paths[tree] = (card_slug(cards[0]), '/'.join(slugs), page.slug if page else '')
+
+
+def card_slug(card):
+    return card.get_slug() if isinstance(card, AllIndiaServiceCard) else card.slug
+
+
+# ==================== COLLEGES ====================
+
+def _colleges(dataset, volumes, rng):
+    india = dataset.first(Country)
+    colleges = bulk_create(College, (
+        College(name=f'College {i}', country=india, state=rng.choice(dataset.states), city='Jaipur',
+                tuition_fees=Decimal(rng.randrange(50000, 500000, 1000)), courses_offered='B.TECH, MBA')
+        for i in range(volumes['colleges'])
+    ), dataset)
+    comparisons = bulk_create(CollegeComparison, [
+        CollegeComparison(comparison_title=f'Comparison {i}', country=india, state=dataset.states[0],
+                          status='active', created_by=dataset.admin)
+        for i in range(volumes['comparisons'])
+    ], dataset)
+    through = CollegeComparison.colleges.through
+    bulk_create(through, (
+        through(collegecomparison=comparison, college=college)
+        for comparison in comparisons for college in rng.sample(colleges, min(3, len(colleges)))
+    ), dataset, keep=None)
+    bulk_create(StateWiseCounsellingUpdate, [
+        StateWiseCounsellingUpdate(state=state, title=f'{state.name} counselling', external_link='https://example.com/',
+                                   created_by=dataset.admin)
+        for state in dataset.states
+    ], dataset)
+    dataset.mq_college_ids = bulk_create(ManagementQuotaCollege, (
+        ManagementQuotaCollege(college=college, courses_offered='B.TECH, MBA') for college in colleges
+    ), dataset, keep=pk)
+
+
+# ==================== STUDENT ACTIVITY ====================
+
+def _student_activity(dataset, volumes, rng):
+    per_student = volumes['per_student']
+    user_ids = dataset.user_ids
+    document = placeholder_file('document.pdf')
+    document_types = [choice for choice, _label in StudentDocument._meta.get_field('document_type').choices]
+
+    documents = insert_rows(StudentDocument, ['student_id', 'document_type', 'status'], (
+        (user_id, document_types[i], rng.choice(['pending', 'approved', 'rejected']))
+        for user_id in user_ids for i in range(min(per_student, len(document_types)))
+    ), dataset, constants={'document_file': document})
+    share_placeholder(document, documents)
+    insert_rows(ChoiceFilling, ['student_id', 'preference_number', 'college_name'], (
+        (user_id, i + 1, f'College {i}') for user_id in user_ids for i in range(per_student)
+    ), dataset, constants={'course_name': 'B.TECH'})
+    insert_rows(DoubtSession, ['student_id', 'status'], (
+        (user_id, rng.choice(['pending', 'resolved'])) for user_id in user_ids for _i in range(per_student)
+    ), dataset, constants={'subject': 'Counselling', 'doubt_description': 'Synthetic doubt'})
+    insert_rows(Complaint, ['student_id', 'status'], (
+        (user_id, rng.choice(['pending', 'resolved'])) for user_id in user_ids for _i in range(per_student)
+    ), dataset, constants={'complaint_type': 'other', 'complaint_subject': 'Synthetic',
+                           'complaint_description': 'Synthetic complaint'})
+    card_ids = list(AdmissionIndiaCard.objects.order_by('pk').values_list('pk', flat=True))
+    insert_rows(StudentCardPurchase, ['student_id', 'card_id', 'transaction_id', 'payment_status'], (
+        (student_id, card_id, f'PERF-{student_id}-{card_id}', rng.choice(['pending', 'completed']))
+        for student_id in dataset.student_ids for card_id in rng.sample(card_ids, min(per_student, len(card_ids)))
+    ), dataset, constants={'amount': Decimal('999.00')})
+    bulk_create(UploadSession, [
+        UploadSession(user=dataset.student_user, field_name='document_file', filename='document.pdf', size=1024)
+    ], dataset)
+
+
+def _management_quota(dataset, volumes, rng):
+    student_ids, college_ids = dataset.student_ids, dataset.mq_college_ids
+    marksheet = placeholder_file('marksheet.pdf')
+    last_pk = ManagementQuotaApplication.objects.aggregate(last=Max('pk'))['last'] or 0
+    inserted = insert_rows(ManagementQuotaApplication, [
+        'student_id', 'college_id', 'full_name', 'email', 'phone', 'tenth_marks', 'twelfth_marks', 'status',
+    ], (
+        # Round robin: one application per (student, college), the first student is the persona
+        (student_ids[i % len(student_ids)], college_ids[i // len(student_ids) % len(college_ids)],
+         f'Applicant {i}', f'applicant{i}@perf.test', f'8{i:09d}', rng.randint(60, 99), rng.randint(60, 99),
+         rng.choice(['pending', 'approved', 'rejected', 'waitlist']))
+        for i in range(min(volumes['applications'], len(student_ids) * len(college_ids)))
+    ), dataset, constants={'course_name': 'B.TECH', 'tenth_marksheet': marksheet, 'twelfth_marksheet': marksheet})
+    share_placeholder(marksheet, 2 * inserted)
+    applications = list(
+        ManagementQuotaApplication.objects.filter(pk__gt=last_pk).order_by('pk')
+        .values_list('pk', 'student_id', 'status')
+    )
+
+    insert_rows(ManagementQuotaSeatAllocation, ['application_id', 'allocation_roll_number', 'seat_number'], (
+        (application_id, f'ROLL-{application_id}', f'S-{application_id}')
+        for application_id, _student_id, status in applications if status == 'approved'
+    ), dataset, constants={'allotment_date': date(2026, 7, 1), 'status': 'allotted'})
+    insert_rows(ManagementQuotaNotification, ['student_id', 'application_id', 'notification_type'], (
+        (student_id, application_id, status if status != 'pending' else 'submitted')
+        for application_id, student_id, status in (
+            applications[0] if i < volumes['per_student'] else rng.choice(applications)
+            for i in range(volumes['notifications'])
+        )
+    ), dataset, constants={'title': 'Application update', 'message': 'Synthetic notification'})
+
+
+# ==================== SEEDED DATABASE ====================
+
+def load_dataset():
+    """Dataset of a database filled by seed_perf: its personas and first rows"""
+    dataset = Dataset()
+    dataset.admin = User.objects.get(username='perf-admin')
+    dataset.student_user = User.objects.get(username='student0')
+    dataset.student = UserRegistration.objects.get(user=dataset.student_user)
+    for model in {model for _prefix, model in ROUTE_MODELS} | {UploadSession}:
+        first = model._base_manager.order_by('pk').first()
+        if first is not None:
+            dataset.objects[model] = first
+
+    for tree, (card_model, subcategory_model, page_model, _children_keep_card) in TREES.items():
+        card = card_model.objects.order_by('pk').first()
+        if card is None:
+            continue
+        # First child all the way down, as generate() builds them
+        slugs, leaf = [], None
+        node = subcategory_model.objects.filter(parent_card=card, parent_subcategory=None).order_by('pk').first()
+        while node is not None:
+            slugs.append(node.slug)
+            leaf = node
+            node = subcategory_model.objects.filter(parent_subcategory=node).order_by('pk').first()
+        page = page_model.objects.filter(sub_category=leaf).order_by('pk').first() if leaf else None
+        dataset.paths[tree] = (card_slug(card), '/'.join(slugs), page.slug if page else '')
+    return dataset
+
+
+# ==================== URL ARGUMENTS ====================
+
+# Route prefix -> model of its <int:...> argument (first match wins)
+ROUTE_MODELS = [
+    ('admin-dashboard/home-cards/', HomeSectionCard),
+    ('admin-dashboard/counselling-cards/', CollegeCounsellingCard),
+    ('admin-dashboard/career-services/', CareerCounsellingService),
+    ('admin-dashboard/admission-cards/', AdmissionIndiaCard),
+    ('purchase-card/', AdmissionIndiaCard),
+    ('admin-dashboard/all-india-cards/', AllIndiaServiceCard),
+    ('admin/all-india-cards/', AllIndiaServiceCard),
+    ('admin-dashboard/pro-counselling-cards/', ProfessionalCounsellingCard),
+    ('admin-dashboard/distance-education-cards/', DistanceEducationCard),
+    ('admin-dashboard/online-education-cards/', OnlineEducationCard),
+    ('admin-dashboard/admission-abroad-cards/', AdmissionAbroadCard),
+    ('admin-dashboard/countries/', Country),
+    ('admin-dashboard/states/', State),
+    ('admin-dashboard/documents/', StudentDocument),
+    ('admin-dashboard/doubts/', DoubtSession),
+    ('admin-dashboard/complaints/', Complaint),
+    ('admin/colleges/', College),
+    ('admin/comparisons/', CollegeComparison),
+    ('college-comparison/', CollegeComparison),
+    ('admin/state-counselling-updates/', StateWiseCounsellingUpdate),
+    ('admin/content-pages/', ContentPage),
+    ('admin/sub-categories/', SubCategory),
+    ('admin/subcategory/', SubCategory),
+    ('admin/admission-abroad/subcategory/', AdmissionAbroadSubCategory),
+    ('admin/admission-abroad/', AdmissionAbroadCard),
+    ('admin/distance-education/subcategory/', DistanceEducationSubCategory),
+    ('admin/distance-education/', DistanceEducationCard),
+    ('admin/online-education/subcategory/', OnlineEducationSubCategory),
+    ('admin/online-education/', OnlineEducationCard),
+    ('admin/management-quota/colleges/', ManagementQuotaCollege),
+    ('admin/management-quota/application/', ManagementQuotaApplication),
+    ('approve_payment/', StudentCardPurchase),
+    ('reject_payment/', StudentCardPurchase),
+    ('files/', StudentDocument),
+]
+
+def route_kwargs(pattern, dataset):
+    """URL kwargs of a main_app URLPattern, pointing at the dataset's first objects"""
+    route = str(pattern.pattern)
+    kwargs = {}
+    for name in pattern.pattern.converters:
+        if name == 'upload_id':
+            kwargs[name] = dataset.first(UploadSession).pk
+        elif name in ('kind', 'field'):
+            kwargs.update(kind='student-document', field='document_file')
+        elif name == 'token':
+            document = dataset.first(StudentDocument)
+            kwargs[name] = signing.dumps(['student-document', document.pk, 'document_file', dataset.student_user.pk],
+                                         salt=SIGNING_SALT, compress=True)
+        elif name == 'filename':
+            kwargs[name] = 'document.pdf'
+        elif name in ('card_slug', 'subcategory_path', 'page_slug'):
+            tree = route.split('/', 1)[0] if route.split('/', 1)[0] in TREES else 'all-india'
+            card_slug, path, page_slug = dataset.paths[tree]
+            kwargs.update(card_slug=card_slug, subcategory_path=path, page_slug=page_slug)
+        elif name == 'student_id':
+            kwargs[name] = dataset.student_user.pk
+        else:
+            model = next((model for prefix, model in ROUTE_MODELS if route.startswith(prefix)), None)
+            if model is None:
+                raise LookupError(f"No dataset object for <{name}> in {route!r} - add it to ROUTE_MODELS")
+            kwargs[name] = dataset.first(model).pk
+    return {name: value for name, value in kwargs.items() if name in pattern.pattern.converters}
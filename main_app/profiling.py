@@ -0,0 +1,275 @@
+"""
+Request profiling: which views are slow in production.
+
+ProfilingMiddleware records a sample of the requests (PROFILING_SAMPLE_RATE)
+into an in-memory ring buffer of the last PROFILING_BUFFER_SIZE samples:
+
+    view name (resolver_match.view_name), status, wall time, SQL queries and
+    SQL time (all databases), template render time, response size
+
+Unsampled requests cost one random() call. For sampled ones a context
+variable switches on the SQL timer (an execute wrapper installed on every
+connection, see connection_created in apps.py) and the template timer
+(around the Django backend's Template.render). Template time includes
+queries that run while rendering (lazy querysets), so SQL and template
+time can overlap.
+
+The per-view summary - p50/p95/p99 and averages over the buffered samples -
+is aggregated at most every PROFILING_AGGREGATE_SECONDS and shown to staff
+at /admin-dashboard/profiling/ (?format=json for scripts). The buffer is
+per process: with several workers each one shows its own requests.
+"""
+
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .benchmark import percentile
+
+
+Sample = namedtuple('Sample', 'view status wall_ms sql_count sql_ms template_ms bytes at')
+
+SORT_KEYS = {
+    'p95': 'p95_ms',
+    'p50': 'p50_ms',
+    'max': 'max_ms',
+    'total': 'total_ms',
+    'requests': 'requests',
+    'sql': 'sql_ms',
+    'queries': 'queries',
+    'template': 'template_ms',
+}
+
+_current = ContextVar('request_profile', default=None)
+
+
+def profiling_enabled():
+    return getattr(settings, 'PROFILING_ENABLED', False)
+
+
+def sample_rate():
+    return getattr(settings, 'PROFILING_SAMPLE_RATE', 0.05)
+
+
+class RequestProfile:
+    """Counters of the request being profiled"""
+
+    __slots__ = ('sql_count', 'sql_time', 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+
+# ==================== TIMERS ====================
+
+def sql_timer(execute, sql, params, many, context):
+    """Execute wrapper, installed on every connection; only times profiled requests"""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_count += 1
+        profile.sql_time += time.perf_counter() - started
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    """connection_created handler"""
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+def timed_render(render):
+    @wraps(render)
+    def wrapper(self, context=None, request=None):
+        profile = _current.get()
+        # render_to_string() inside a template is part of the outer render
+        if profile is None or profile.template_depth:
+            return render(self, context, request)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            profile.template_depth -= 1
+            profile.template_time += time.perf_counter() - started
+    wrapper.profiled = True
+    return wrapper
+
+
+def install_template_timer():
+    from django.template.backends.django import Template
+
+    if not getattr(Template.render, 'profiled', False):
+        Template.render = timed_render(Template.render)
+
+
+# ==================== RING BUFFER ====================
+
+class ProfileStore:
+    """Last `size` samples; summary() re-aggregates them at most every `max_age` seconds"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=size)
+        self._summary = None
+        self._summary_at = 0.0
+        self.recorded = 0
+
+    def add(self, sample):
+        with self._lock:
+            self._samples.append(sample)
+            self.recorded += 1
+
+    def summary(self, max_age=None):
+        if max_age is None:
+            max_age = getattr(settings, 'PROFILING_AGGREGATE_SECONDS', 30)
+        now = time.monotonic()
+        with self._lock:
+            if self._summary is not None and now - self._summary_at < max_age:
+                return self._summary
+            samples = list(self._samples)
+            recorded = self.recorded
+        summary = aggregate(samples)
+        summary.update(recorded=recorded, buffer_size=self._samples.maxlen)
+        with self._lock:
+            self._summary, self._summary_at = summary, now
+        return summary
+
+
+def aggregate(samples):
+    """Per-view latency percentiles and averages of `samples`"""
+    by_view = defaultdict(list)
+    for sample in samples:
+        by_view[sample.view].append(sample)
+
+    views = [dict(view=view, **stats(view_samples)) for view, view_samples in by_view.items()]
+    return {
+        'aggregated_at': time.time(),
+        'since': min((sample.at for sample in samples), default=None),
+        'samples': len(samples),
+        'overall': stats(samples),
+        'views': views,
+    }
+
+
+def stats(samples):
+    if not samples:
+        return {'requests': 0}
+    wall = sorted(sample.wall_ms for sample in samples)
+    sizes = [sample.bytes for sample in samples if sample.bytes is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status >= 500),
+        'p50_ms': percentile(wall, 0.50),
+        'p95_ms': percentile(wall, 0.95),
+        'p99_ms': percentile(wall, 0.99),
+        'max_ms': wall[-1],
+        'total_ms': sum(wall),
+        'queries': statistics.fmean(sample.sql_count for sample in samples),
+        'sql_ms': statistics.fmean(sample.sql_ms for sample in samples),
+        'template_ms': statistics.fmean(sample.template_ms for sample in samples),
+        'bytes': statistics.fmean(sizes) if sizes else None,
+    }
+
+
+def top_views(summary, sort='p95', limit=None):
+    """The `limit` slowest views of a summary by SORT_KEYS[sort]"""
+    if limit is None:
+        limit = getattr(settings, 'PROFILING_TOP_N', 25)
+    key = SORT_KEYS.get(sort, SORT_KEYS['p95'])
+    return sorted(summary['views'], key=lambda view: view[key], reverse=True)[:limit]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProfileStore(getattr(settings, 'PROFILING_BUFFER_SIZE', 10_000))
+    return _store
+
+
+def reset_store():
+    """Drop all samples (and pick up a changed PROFILING_BUFFER_SIZE)"""
+    global _store
+    with _store_lock:
+        _store = None
+
+
+# ==================== MIDDLEWARE ====================
+
+class ProfilingMiddleware:
+    """Samples requests into the ring buffer - keep it first in MIDDLEWARE"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not profiling_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, profile, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= sample_rate():
+            return await self.get_response(request)
+
+        # Sync views run in a copy of this context - same RequestProfile object
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, profile, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, profile, wall):
+        match = getattr(request, 'resolver_match', None)
+        get_store().add(Sample(
+            view=match.view_name if match else '<unresolved>',
+            status=response.status_code,
+            wall_ms=wall * 1000,
+            sql_count=profile.sql_count,
+            sql_ms=profile.sql_time * 1000,
+            template_ms=profile.template_time * 1000,
+            # Streams (files, SSE) have no size up front
+            bytes=None if response.streaming else len(response.content),
+            at=time.time(),
+        ))
@@ -0,0 +1,203 @@
+"""
+Authenticated downloads for sensitive uploads.
+
+Student documents and management quota marksheets/scorecards are not served
+from the public /media/ URL. Templates link to a stable
+``/files/<kind>/<pk>/<field>/`` URL; that view checks the visitor owns the
+row (or is staff) and redirects to a short-lived signed URL. The signed URL
+hands the bytes to the front web server:
+
+* ``PROTECTED_MEDIA_SERVER = 'nginx'``  -> ``X-Accel-Redirect`` to an
+  ``internal`` location aliased to MEDIA_ROOT (PROTECTED_MEDIA_INTERNAL_URL)
+* ``PROTECTED_MEDIA_SERVER = 'apache'`` -> ``X-Sendfile`` (mod_xsendfile)
+* otherwise Django streams the open file itself; under gunicorn this goes
+  through ``wsgi.file_wrapper`` which uses ``os.sendfile`` (zero-copy),
+  including for ``Range`` requests.
+
+Range requests (PDF viewers, resumed downloads) are answered with 206.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+from django.utils.http import content_disposition_header, http_date
+from django.views.static import serve
+
+
+# kind (used in URLs) -> (model, file fields, lookup of the owning auth user)
+PROTECTED_FILES = {
+    'student-document': ('main_app.StudentDocument', ('document_file',), 'student_id'),
+    'mq-application': (
+        'main_app.ManagementQuotaApplication',
+        ('tenth_marksheet', 'twelfth_marksheet', 'exam_scorecard'),
+        'student__user_id',
+    ),
+}
+
+SIGNING_SALT = 'main_app.protected_files'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def protected_prefixes():
+    return tuple(getattr(settings, 'PROTECTED_MEDIA_PREFIXES', ('student_documents/', 'management_quota/')))
+
+
+def url_max_age():
+    return getattr(settings, 'PROTECTED_MEDIA_URL_MAX_AGE', 300)
+
+
+# ==================== ACCESS ====================
+
+def kind_for(instance):
+    label = instance._meta.label
+    for kind, (model_label, _fields, _owner) in PROTECTED_FILES.items():
+        if model_label == label:
+            return kind
+    raise ValueError(f"{label} has no protected files")
+
+
+def protected_file_url(instance, field_name):
+    """Stable (session checked) download URL for instance.<field_name>"""
+    if not getattr(instance, field_name):
+        return ''
+    return reverse('main_app:protected_file', args=[kind_for(instance), instance.pk, field_name])
+
+
+def get_protected_instance(kind, pk, field_name, user):
+    """Row whose file `user` may download, or raise Http404"""
+    try:
+        model_label, fields, owner_lookup = PROTECTED_FILES[kind]
+    except KeyError:
+        raise Http404
+    if field_name not in fields or not user.is_active:
+        raise Http404
+
+    queryset = apps.get_model(model_label)._default_manager.filter(pk=pk)
+    if not (user.is_staff or user.is_superuser):
+        queryset = queryset.filter(**{owner_lookup: user.pk})
+    instance = queryset.first()
+    if instance is None or not getattr(instance, field_name):
+        raise Http404
+    return instance
+
+
+def signed_file_url(instance, field_name, user):
+    """Short-lived URL that serves the file without a session lookup"""
+    token = signing.dumps([kind_for(instance), instance.pk, field_name, user.pk], salt=SIGNING_SALT, compress=True)
+    filename = os.path.basename(getattr(instance, field_name).name)
+    return reverse('main_app:signed_file', args=[token, filename])
+
+
+def load_signed_token(token):
+    """(kind, pk, field, user) from a signed token; Http404 if invalid or expired"""
+    try:
+        kind, pk, field_name, user_id = signing.loads(token, salt=SIGNING_SALT, max_age=url_max_age())
+    except (signing.BadSignature, ValueError):
+        raise Http404
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        raise Http404
+    return kind, pk, field_name, user
+
+
+# ==================== SERVING ====================
+
+class _FileRange:
+    """Read-limited view on an open file; keeps fileno() so sendfile still works"""
+
+    def __init__(self, fh, start, length):
+        fh.seek(start)
+        self.fh = fh
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def parse_range(header, size):
+    """(start, end) for a single-range `Range` header, None to send everything, False if unsatisfiable"""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None  # absent, malformed or multi-range - a full 200 is allowed
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve_protected_file(request, field_file, download=False):
+    """Response for a FileField value: offloaded to the web server or streamed with Range support"""
+    path = field_file.path
+    if not os.path.isfile(path):
+        raise Http404
+
+    filename = os.path.basename(field_file.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    server = getattr(settings, 'PROTECTED_MEDIA_SERVER', '')
+
+    if server == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        internal_url = getattr(settings, 'PROTECTED_MEDIA_INTERNAL_URL', '/protected-media/')
+        response['X-Accel-Redirect'] = internal_url + quote(field_file.name)
+    elif server == 'apache':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        stat = os.stat(path)
+        byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        fh = open(path, 'rb')
+        if byte_range is None:
+            response = FileResponse(fh, content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = FileResponse(_FileRange(fh, start, length), status=206, content_type=content_type)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+    response['Content-Disposition'] = content_disposition_header(download, filename)
+    response['Cache-Control'] = 'private, max-age=0'
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def serve_public_media(request, path, document_root=None, show_indexes=False):
+    """Replacement for django.views.static.serve that refuses protected uploads"""
+    if path.lstrip('/').startswith(protected_prefixes()):
+        raise Http404
+    return serve(request, path, document_root=document_root, show_indexes=show_indexes)
@@ -0,0 +1,245 @@
+"""
+Resumable, chunked uploads for student documents (tus-like).
+
+A dropped mobile connection used to mean re-sending a whole marksheet photo.
+The document forms now upload files in small chunks before submitting
+(assets/js/resumable-upload.js):
+
+    POST   /uploads/                 field_name, filename, size -> {"id", "offset", "chunk_size"}
+    HEAD   /uploads/<id>/            Upload-Offset / Upload-Length headers
+    PATCH  /uploads/<id>/            raw bytes, headers Upload-Offset and
+                                     (optional) Upload-Checksum: sha256 <base64>
+    DELETE /uploads/<id>/            cancel
+
+Each PATCH is a short request (at most RESUMABLE_UPLOAD_CHUNK_SIZE bytes), so
+slow connections never hold a worker for minutes. A chunk is accepted only at
+the current offset (409 otherwise) and only if its checksum matches (460);
+the client asks for the offset again and continues from there. A PATCH holds
+an exclusive lock on the part file from the offset check to the offset
+UPDATE, so a stale PATCH can't write (or truncate) under a retried one - the
+second one gets 409 while the first is still running. Chunks are
+written straight into ``RESUMABLE_UPLOAD_ROOT/<id>.part`` - the finished part
+file *is* the assembled upload and is moved into storage when the form is
+submitted with ``<field>_upload=<id>`` instead of the file.
+
+Sessions not finished within RESUMABLE_UPLOAD_EXPIRY_HOURS are removed by
+``manage.py collect_media_garbage``.
+"""
+
+import base64
+import fcntl
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.utils import timezone
+
+from .uploads import ALLOWED_DOCUMENT_TYPES, document_max_size, document_upload_fields
+
+
+READ_SIZE = 64 * 1024
+
+# tus "Checksum Mismatch" status
+CHECKSUM_MISMATCH = 460
+
+
+class UploadError(Exception):
+    """Rejected upload request; `status` is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def upload_root():
+    return str(getattr(settings, 'RESUMABLE_UPLOAD_ROOT', os.path.join(settings.BASE_DIR, 'upload_sessions')))
+
+
+def chunk_size():
+    return getattr(settings, 'RESUMABLE_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def part_path(session):
+    return os.path.join(upload_root(), f'{session.pk}.part')
+
+
+# ==================== SESSIONS ====================
+
+def create_session(user, field_name, filename, size):
+    from .models import UploadSession
+
+    if field_name not in document_upload_fields():
+        raise UploadError('Unknown upload field.')
+    filename = os.path.basename(filename or '')
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_DOCUMENT_TYPES:
+        raise UploadError('Only PDF, JPG or PNG files are allowed.')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('Missing file size.')
+    if size <= 0:
+        raise UploadError('The file is empty.')
+    if size > document_max_size():
+        raise UploadError('File is too large.', status=413)
+
+    session = UploadSession.objects.create(user=user, field_name=field_name, filename=filename, size=size)
+    os.makedirs(upload_root(), exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def _parse_checksum(header):
+    """Upload-Checksum: 'sha256 <base64 digest>' -> digest bytes (None if absent)"""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError('Only sha256 checksums are supported.')
+    try:
+        return base64.b64decode(value, validate=True)
+    except ValueError:
+        raise UploadError('Malformed Upload-Checksum header.')
+
+
+def append_chunk(session, request):
+    """Write the PATCH body at the session's offset; returns the new offset"""
+    from .models import UploadSession
+
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except (KeyError, ValueError):
+        raise UploadError('Upload-Offset and Content-Length are required.')
+    if length <= 0 or length > chunk_size():
+        raise UploadError(f'Chunks must be 1-{chunk_size()} bytes.', status=413)
+    if offset + length > session.size:
+        raise UploadError('Chunk goes past the announced file size.', status=413)
+    expected = _parse_checksum(request.headers.get('Upload-Checksum'))
+
+    path = part_path(session)
+    digest = hashlib.sha256()
+    written = 0
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        # One PATCH per session at a time: check, write and UPDATE under the lock
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk is being written - resume from the current offset.', status=409)
+        current = UploadSession.objects.filter(pk=session.pk).values_list('offset', flat=True).first()
+        if current != offset:
+            raise UploadError('Offset mismatch - resume from the current offset.', status=409)
+
+        try:
+            while written < length:
+                data = request.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                if offset == 0 and written == 0:
+                    signatures = ALLOWED_DOCUMENT_TYPES[os.path.splitext(session.filename)[1].lower()]
+                    if not data.startswith(signatures):
+                        raise UploadError('The file content does not match its type (PDF, JPG or PNG expected).')
+                os.pwrite(fd, data, offset + written)
+                digest.update(data)
+                written += len(data)
+
+            if written != length:
+                raise UploadError('Incomplete chunk.')
+            if expected is not None and digest.digest() != expected:
+                raise UploadError('Checksum mismatch.', status=CHECKSUM_MISMATCH)
+        except UploadError:
+            # Nothing past `offset` is committed - we hold the lock and checked it
+            os.ftruncate(fd, offset)
+            raise
+
+        if not UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+            offset=offset + written, updated_at=timezone.now()
+        ):
+            raise UploadError('Offset mismatch - resume from the current offset.', status=409)
+    finally:
+        # Also releases the lock
+        os.close(fd)
+
+    session.offset = offset + written
+    return session.offset
+
+
+def discard_session(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def expire_sessions():
+    """
+    Delete sessions older than RESUMABLE_UPLOAD_EXPIRY_HOURS, finished ones
+    whose part file was already moved into storage, and part files of claimed
+    sessions that were never saved (e.g. the form was refused)
+    """
+    from .models import UploadSession
+
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'RESUMABLE_UPLOAD_EXPIRY_HOURS', 24))
+    removed = 0
+    live_parts = set()
+    for session in UploadSession.objects.iterator():
+        if session.updated_at < cutoff or (session.is_complete and not os.path.exists(part_path(session))):
+            discard_session(session)
+            removed += 1
+        else:
+            live_parts.add(os.path.basename(part_path(session)))
+
+    if os.path.isdir(upload_root()):
+        for entry in os.scandir(upload_root()):
+            if (entry.name.endswith('.part') and entry.name not in live_parts
+                    and entry.stat().st_mtime < cutoff.timestamp()):
+                os.remove(entry.path)
+                removed += 1
+    return removed
+
+
+# ==================== USING A FINISHED UPLOAD ====================
+
+class AssembledUpload(File):
+    """Finished part file; storage moves it into place instead of copying"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def claim_upload(request, field_name):
+    """
+    The finished chunked upload posted as ``<field_name>_upload`` (or None).
+
+    Claiming deletes the session row, so an upload is used at most once. The
+    file joins request.FILES - Django closes it with the request's other
+    uploads - and storage moves the part file into place when the model is
+    saved. A part file that is never saved is removed by expire_sessions().
+    """
+    from .models import UploadSession
+
+    upload_id = request.POST.get(f'{field_name}_upload')
+    if not upload_id:
+        return None
+    try:
+        session = UploadSession.objects.get(pk=upload_id, user=request.user, field_name=field_name)
+    except (UploadSession.DoesNotExist, ValidationError):
+        return None
+    path = part_path(session)
+    if not session.is_complete or not os.path.exists(path):
+        return None
+    deleted, _ = UploadSession.objects.filter(pk=session.pk).delete()
+    if not deleted:
+        return None  # claimed by a concurrent submit
+    upload = AssembledUpload(open(path, 'rb'), name=session.filename)
+    request.FILES[field_name] = upload
+    return upload
+
+
+def uploaded_file(request, field_name):
+    """request.FILES[field_name], or the chunked upload that replaced it"""
+    return request.FILES.get(field_name) or claim_upload(request, field_name)
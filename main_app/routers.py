@@ -0,0 +1,154 @@
+"""
+Database routing: student GET requests read from a replica.
+
+With a 'replica' alias in DATABASES (DB_REPLICA_NAME / DB_REPLICA_HOST, see
+settings) ReplicaMiddleware lets the reads of GET/HEAD requests go to the
+replica. Everything else reads from 'default':
+
+* writes, reads inside a transaction and anything outside a request
+  (run_worker, management commands)
+* requests under DB_PRIMARY_PATHS (admin pages, login, live counters)
+* read-your-writes: a POST (or any unsafe method) sets a cookie that pins
+  the browser to the primary for DB_REPLICA_PIN_SECONDS, longer than the
+  replica lags behind
+* code wrapped in ``use_primary()``
+
+Without a replica alias the router always answers 'default'.
+
+AnalyticsRouter (listed first in DATABASE_ROUTERS) keeps the telemetry
+tables (ANALYTICS_MODELS, see analytics.py) in the 'analytics' database -
+their own SQLite file, so a burst of page views never locks the main one.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+REPLICA_ALIAS = 'replica'
+ANALYTICS_ALIAS = 'analytics'
+ANALYTICS_MODELS = {'main_app.pageview', 'main_app.searchlog'}
+PIN_COOKIE = 'db_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def use_primary(func=None):
+    """Context manager / decorator: read from the primary even in a GET request"""
+    if func is None:
+        return replica_reads(False)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with replica_reads(False):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class AnalyticsRouter:
+    def _route(self, model):
+        if model._meta.label_lower in ANALYTICS_MODELS and ANALYTICS_ALIAS in settings.DATABASES:
+            return ANALYTICS_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if ANALYTICS_ALIAS in (obj1._state.db, obj2._state.db):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if ANALYTICS_ALIAS not in settings.DATABASES:
+            return None
+        if model_name is None:
+            # RunPython / RunSQL: main database only
+            return db != ANALYTICS_ALIAS
+        is_analytics = f'{app_label}.{model_name}' in ANALYTICS_MODELS
+        return is_analytics == (db == ANALYTICS_ALIAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (_replica_reads.get() and replica_configured()
+                and not transaction.get_connection(DEFAULT_DB_ALIAS).in_atomic_block):
+            return REPLICA_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both - objects read from the replica are saved to default
+        databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """Enables replica reads for the request, sets the read-your-writes cookie"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+
+        with replica_reads(self.replica_allowed(request)):
+            response = self.get_response(request)
+        return self.pin_to_primary(request, response)
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+
+        # The context variable is copied into sync_to_async threads
+        with replica_reads(self.replica_allowed(request)):
+            response = await self.get_response(request)
+        return self.pin_to_primary(request, response)
+
+    def pin_to_primary(self, request, response):
+        if request.method not in SAFE_METHODS:
+            seconds = getattr(settings, 'DB_REPLICA_PIN_SECONDS', 10)
+            response.set_cookie(PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax',
+                                secure=request.is_secure())
+        return response
+
+    def replica_allowed(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and not request.path.startswith(tuple(getattr(settings, 'DB_PRIMARY_PATHS', ())))
+        )
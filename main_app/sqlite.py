@@ -0,0 +1,214 @@
+"""
+Production SQLite profile.
+
+With the default rollback journal a writer locks readers out, and a
+transaction that reads first and writes later (DEFERRED) fails with
+"database is locked" as soon as another connection writes - the busy timeout
+is not even used. So:
+
+* DATABASES OPTIONS 'transaction_mode': 'IMMEDIATE' - atomic() blocks take
+  the write lock at BEGIN, where SQLite waits for it (busy_timeout)
+* SQLITE_PRAGMAS, run on every new connection (connection_created): a
+  bigger page cache, mmap and busy_timeout
+* SQLITE_JOURNAL_MODE = 'WAL' on the servers: readers never wait for the
+  writer, and synchronous=NORMAL (no fsync per commit) is safe. journal_mode
+  is stored in the database file, so it is opt-in - a manage.py command run
+  against a checked-out db.sqlite3 leaves the file alone
+
+`python manage.py benchmark_sqlite` compares the default and this profile.
+
+Lock errors that still happen are handled per view (retry_on_locked,
+serve_stale_on_locked) and by DatabaseLockedMiddleware - see BUSY DATABASE.
+"""
+
+import hashlib
+import logging
+import random
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, transaction
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+
+# Used when SQLITE_PRAGMAS is not set
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 20000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Added with SQLITE_JOURNAL_MODE = 'WAL' - synchronous=NORMAL is only safe in WAL mode
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+
+def sqlite_pragmas(journal_mode=None):
+    """PRAGMAs for a new connection; journal_mode defaults to SQLITE_JOURNAL_MODE"""
+    pragmas = dict(getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS))
+    if journal_mode is None:
+        journal_mode = getattr(settings, 'SQLITE_JOURNAL_MODE', '')
+    if journal_mode.upper() == 'WAL':
+        pragmas = {**WAL_PRAGMAS, **pragmas}
+    elif journal_mode:
+        pragmas['journal_mode'] = journal_mode
+    return pragmas
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_read_only(connection):
+    """Opened with a 'file:...?mode=ro' URI (e.g. the copy_database source)"""
+    settings_dict = connection.settings_dict
+    return bool(settings_dict['OPTIONS'].get('uri')) and 'mode=ro' in str(settings_dict['NAME'])
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created handler"""
+    # journal_mode is stored in the database file - never switch one we only read
+    if connection.vendor != 'sqlite' or is_read_only(connection):
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, sqlite_pragmas())
+
+
+# ==================== BUSY DATABASE ====================
+#
+# busy_timeout makes a writer wait for the lock, but SQLite still raises
+# "database is locked" when a lock spike outlasts it, and right away in a few
+# cases it can't wait for. Write views retry as a whole, GET views fall back
+# to their last good rendering, and whatever is left becomes a 503 with
+# Retry-After (DatabaseLockedMiddleware) instead of a 500.
+
+def is_locked_error(exc):
+    # "database is locked", "database table is locked", ...
+    return isinstance(exc, OperationalError) and 'is locked' in str(exc)
+
+
+def locked_backoff(attempt):
+    """Seconds before retry `attempt` (0-based): full jitter, so retries don't collide again"""
+    base = getattr(settings, 'DB_LOCKED_RETRY_DELAY', 0.1)
+    return random.uniform(0, base * 2 ** attempt)
+
+
+def _queued_messages(request):
+    storage = getattr(request, '_messages', None)
+    return len(getattr(storage, '_queued_messages', ()))
+
+
+def _drop_messages(request, count):
+    # Messages added by a rolled back attempt would show up twice
+    storage = getattr(request, '_messages', None)
+    if hasattr(storage, '_queued_messages'):
+        del storage._queued_messages[count:]
+
+
+def retry_on_locked(view):
+    """
+    Run the view (POST etc. in one transaction); if the database is locked,
+    roll back and run it again (DB_LOCKED_RETRIES times, jittered backoff).
+    Only for views that are safe to repeat as a whole - the database is rolled
+    back between attempts, files already written to storage are not (see
+    collect_media_garbage). GET requests get no transaction: with IMMEDIATE
+    transactions it would take the write lock for a page view.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if transaction.get_connection().in_atomic_block:
+            # An outer transaction can't be retried from in here
+            return view(request, *args, **kwargs)
+        retries = getattr(settings, 'DB_LOCKED_RETRIES', 3)
+        for attempt in range(retries + 1):
+            queued = _queued_messages(request)
+            try:
+                if request.method in ('GET', 'HEAD'):
+                    return view(request, *args, **kwargs)
+                with transaction.atomic():
+                    return view(request, *args, **kwargs)
+            except OperationalError as exc:
+                if not is_locked_error(exc) or attempt == retries:
+                    raise
+                _drop_messages(request, queued)
+                logger.warning("Database locked in %s, retry %d/%d", request.path, attempt + 1, retries)
+                time.sleep(locked_backoff(attempt))
+    return wrapper
+
+
+def stale_cache_key(request):
+    """Per session - the page embeds the user's data and CSRF token; None without one"""
+    session_key = request.session.session_key if hasattr(request, 'session') else None
+    if not session_key:
+        return None
+    identity = f'{session_key}|{request.get_full_path()}'
+    return 'stale-page:' + hashlib.sha256(identity.encode()).hexdigest()
+
+
+def serve_stale_on_locked(view):
+    """
+    GET views: remember the last good rendering (STALE_PAGE_SECONDS) and serve
+    it, marked with an X-Stale header, while the database is locked.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = stale_cache_key(request) if request.method in ('GET', 'HEAD') else None
+        if key is None:
+            return view(request, *args, **kwargs)
+        try:
+            response = view(request, *args, **kwargs)
+        except OperationalError as exc:
+            stale = cache.get(key) if is_locked_error(exc) else None
+            if stale is None:
+                raise
+            logger.warning("Database locked, serving stale %s", request.path)
+            response = HttpResponse(stale['content'], content_type=stale['content_type'])
+            response['X-Stale'] = 'database-locked'
+            return response
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            cache.set(key, {'content': response.content, 'content_type': response['Content-Type']},
+                      getattr(settings, 'STALE_PAGE_SECONDS', 10 * 60))
+        return response
+    return wrapper
+
+
+class DatabaseLockedMiddleware:
+    """A lock error that got past the view becomes 503 + Retry-After"""
+
+    # Async too - one sync-only middleware turns the whole ASGI chain sync
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not is_locked_error(exception):
+            return None
+        logger.error("Database locked, %s %s answered with 503", request.method, request.path)
+        response = HttpResponse("The server is busy right now, please try again in a moment.",
+                                status=503, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(getattr(settings, 'DB_LOCKED_RETRY_AFTER', 5))
+        return response
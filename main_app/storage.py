@@ -0,0 +1,146 @@
+"""
+Content-addressed media storage.
+
+Uploads are stored as ``<upload_to>/<sha256[:2]>/<sha256[:32]>.<ext>`` instead
+of under the client's file name. Re-uploading the same file (Django used to
+create ``3211448.png``, ``3211448_M6KnfTf.png``, ``3211448_NGOj5pQ.png``...)
+now points at the one existing blob. Every stored reference bumps
+MediaBlob.ref_count; deleting or replacing a file on a model releases it and
+the blob is removed when nothing uses it anymore.
+
+Files written before this storage existed have no MediaBlob row - they are
+never deleted by reference counting, only by ``manage.py collect_media_garbage``.
+"""
+
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F, FileField
+
+
+# Names that are already content addressed (derivatives, optimized CKEditor
+# images) are stored as-is
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{32}[^/]*$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by their SHA-256 and shares duplicates"""
+
+    def _save(self, name, content):
+        if HASHED_NAME_RE.search(name):
+            return super()._save(name, content)
+
+        digest = content_hash(content)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        cas_name = '/'.join(filter(None, [directory, digest[:2], digest[:32] + extension]))
+
+        from .models import MediaBlob
+
+        # The (slow) write goes to a temporary name next to the blob, outside
+        # the transaction; the row lock is only held to publish it
+        temp_name = super()._save(f'{cas_name}.{uuid.uuid4().hex}.tmp', content)
+        try:
+            # Under the same row lock as release(): the file can't be deleted
+            # between the exists() check and the new reference
+            with transaction.atomic():
+                MediaBlob.objects.select_for_update().filter(name=cas_name).values_list('pk', flat=True).first()
+                if not self.exists(cas_name):
+                    os.replace(self.path(temp_name), self.path(cas_name))
+                self._add_reference(cas_name, digest, content.size)
+        finally:
+            # Same bytes already stored (or the claim failed)
+            if self.exists(temp_name):
+                self.delete(temp_name)
+        return cas_name
+
+    def get_available_name(self, name, max_length=None):
+        # Collisions are handled in _save(): same name == same content
+        if HASHED_NAME_RE.search(name):
+            return super().get_available_name(name, max_length)
+        return name
+
+    def _add_reference(self, name, digest, size):
+        from .models import MediaBlob
+
+        with transaction.atomic():
+            blob, created = MediaBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={'sha256': digest, 'size': size, 'ref_count': 1},
+            )
+            if not created:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+    def release(self, name):
+        """Drop one reference to `name`; delete the file when none are left"""
+        from .models import MediaBlob
+
+        if not name:
+            return
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return  # legacy file - left to collect_media_garbage
+            if blob.ref_count > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            deleted, _ = MediaBlob.objects.filter(pk=blob.pk).delete()
+            # Still under the lock - a concurrent _save() of the same bytes waits
+            # and then writes the file again
+            if deleted:
+                self.delete(name)
+
+
+# ==================== MODEL HOOKS ====================
+
+def file_fields(model):
+    return [f for f in model._meta.get_fields() if isinstance(f, FileField)]
+
+
+def _release_later(storage, names):
+    if not hasattr(storage, 'release'):
+        return
+    names = [n for n in names if n]
+    if names:
+        transaction.on_commit(lambda: [storage.release(n) for n in names])
+
+
+def release_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    """pre_save: release the previous file when a FileField gets a new upload"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    fields = [f for f in file_fields(sender)
+              if update_fields is None or f.name in update_fields]
+    if not fields:
+        return
+    previous = sender._default_manager.filter(pk=instance.pk).values(*[f.attname for f in fields]).first()
+    if not previous:
+        return
+    for field in fields:
+        old_name = previous[field.attname]
+        new_name = getattr(instance, field.attname).name if getattr(instance, field.attname) else ''
+        if old_name and old_name != new_name:
+            _release_later(field.storage, [old_name])
+
+
+def release_deleted_files(sender, instance, **kwargs):
+    """post_delete: release every file the deleted row referenced"""
+    for field in file_fields(sender):
+        file = getattr(instance, field.attname)
+        if file:
+            _release_later(field.storage, [file.name])
+
+
+def uses_content_addressed_storage():
+    return isinstance(default_storage, ContentAddressedStorage)
@@ -0,0 +1,86 @@
+"""
+Background tasks (run by `manage.py run_worker`, see jobs.py).
+
+Arguments must be JSON serializable - pass ids, not model instances.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .jobs import task
+
+
+@task()
+def recalculate_document_status(student_id):
+    """Mark the student's documents as verified once every document is approved"""
+    from .models import CounsellingStatus, StudentDocument
+
+    documents = StudentDocument.objects.filter(student_id=student_id)
+    if not documents.exists() or documents.exclude(status='approved').exists():
+        return False
+    status, created = CounsellingStatus.objects.get_or_create(student_id=student_id)
+    status.documents_verified = True
+    status.current_stage = 'documents_verification'
+    status.save()
+    return True
+
+
+@task()
+def deliver_notification_digests():
+    """Coalesce pending notification events into digests (notifications.py)"""
+    from .notifications import deliver_digests
+    return deliver_digests()
+
+
+@task(queue='media')
+def build_image_derivatives(model_label, pk, field_name, source_name):
+    """Resized copies and LQIP of a card/icon/featured/college image (images.py)"""
+    from .images import store_derivatives
+    return store_derivatives(model_label, pk, field_name, source_name)
+
+
+@task(queue='media')
+def normalize_document_upload(model_label, pk, field_name, source_name):
+    """Smaller copy of a student document upload (uploads.py)"""
+    from .uploads import store_normalized
+    return store_normalized(model_label, pk, field_name, source_name)
+
+
+@task(queue='email', max_attempts=5)
+def send_queued_emails():
+    """Send the OutboundEmail queue over the pooled SMTP connection (mail.py)"""
+    from .mail import send_pending
+    return send_pending()
+
+
+@task(queue='maintenance')
+def roll_up_page_views():
+    """Add recorded page views (analytics database) to the pages' views_count"""
+    from .analytics import roll_up_page_views
+    return roll_up_page_views()
+
+
+@task(queue='maintenance')
+def purge_page_views():
+    """Delete rolled-up page views past PAGE_VIEW_RETENTION_DAYS (analytics database)"""
+    from .analytics import purge_page_views
+    return purge_page_views()
+
+
+# ==================== HOUSEKEEPING (JOB_SCHEDULE) ====================
+
+@task(queue='maintenance')
+def expire_upload_sessions():
+    from .resumable import expire_sessions
+    return expire_sessions()
+
+
+@task(queue='maintenance')
+def purge_finished_jobs(days=7):
+    """Delete succeeded/failed jobs (and their results) older than `days`"""
+    from .models import Job
+
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Job.objects.filter(status__in=['succeeded', 'failed'], updated_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,240 @@
+"""
+Upload pipeline for student documents.
+
+DocumentUploadHandler (first entry of FILE_UPLOAD_HANDLERS) watches the
+document fields (DOCUMENT_UPLOAD_FIELDS) while the multipart body is being
+parsed: a wrong extension or file signature is refused on the first chunk and
+an upload over DOCUMENT_UPLOAD_MAX_SIZE as soon as the limit is crossed - the
+rest of that file is skipped instead of being buffered to a temp file. The
+reason is kept on ``request.upload_errors`` for the view to show.
+
+Accepted originals are stored unchanged. A normalize_document_upload job
+(tasks.py, 'media' queue) builds a normalized copy: photos are rotated,
+scaled to DOCUMENT_NORMALIZE_MAX_SIDE and re-encoded as JPEG, PDFs are
+rewritten with Ghostscript (when installed). The copy is only kept when it is
+clearly smaller and is recorded in the ``<field>_normalized`` manifest::
+
+    {"source": "student_documents/ab/ab12....jpg", "original_size": 9431102,
+     "name": "student_documents/normalized/ab/ab12...-2000.jpg", "size": 412877}
+
+Admin review links and ZIP bundles use the normalized copy when there is one.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.template.defaultfilters import filesizeformat
+
+
+ALLOWED_DOCUMENT_TYPES = {
+    '.pdf': (b'%PDF-',),
+    '.jpg': (b'\xff\xd8\xff',),
+    '.jpeg': (b'\xff\xd8\xff',),
+    '.png': (b'\x89PNG\r\n\x1a\n',),
+}
+
+NORMALIZED_DIR = 'normalized'
+
+
+def document_upload_fields():
+    return set(getattr(settings, 'DOCUMENT_UPLOAD_FIELDS', ()))
+
+
+def document_max_size():
+    return getattr(settings, 'DOCUMENT_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+
+
+def normalized_field_name(field_name):
+    return f'{field_name}_normalized'
+
+
+# ==================== STREAMING VALIDATION ====================
+
+class DocumentUploadHandler(FileUploadHandler):
+    """Rejects oversized / wrong-type document uploads while they stream in"""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.upload_errors = {}
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.active = field_name in document_upload_fields()
+        if not self.active:
+            return
+        self.received = 0
+        self.extension = os.path.splitext(file_name or '')[1].lower()
+        if self.extension not in ALLOWED_DOCUMENT_TYPES:
+            self._reject('Only PDF, JPG or PNG files are allowed.')
+        if content_length and content_length > document_max_size():
+            self._reject(self._size_message())
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if start == 0 and not raw_data.startswith(ALLOWED_DOCUMENT_TYPES[self.extension]):
+            self._reject('The file content does not match its type (PDF, JPG or PNG expected).')
+        self.received += len(raw_data)
+        if self.received > document_max_size():
+            self._reject(self._size_message())
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None  # the regular handlers store the file
+
+    def _size_message(self):
+        return f'File is too large (maximum {filesizeformat(document_max_size())}).'
+
+    def _reject(self, message):
+        if not hasattr(self.request, 'upload_errors'):
+            self.request.upload_errors = {}
+        self.request.upload_errors[self.field_name] = message
+        raise SkipFile(message)
+
+
+def rejected_upload(request, field_name):
+    """Why an upload in `field_name` was refused by DocumentUploadHandler ('' if it wasn't)"""
+    return getattr(request, 'upload_errors', {}).get(field_name, '')
+
+
+# ==================== NORMALIZATION (normalize_document_upload job) ====================
+# Like images.build_derivatives: no settings or database access below.
+
+def _file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _normalize_image(source_path, target_path, max_side):
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image.convert('RGBA'), mask=image.convert('RGBA').split()[-1])
+            image = background
+        image = image.convert('RGB')
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        image.save(target_path, format='JPEG', quality=85, optimize=True, progressive=True)
+
+
+def _normalize_pdf(source_path, target_path, ghostscript):
+    subprocess.run(
+        [ghostscript, '-sDEVICE=pdfwrite', '-dCompatibilityLevel=1.5', '-dPDFSETTINGS=/ebook',
+         '-dNOPAUSE', '-dQUIET', '-dBATCH', f'-sOutputFile={target_path}', source_path],
+        check=True, timeout=300, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def normalize_document(media_root, source_name, max_side, ghostscript=None):
+    """
+    Build a normalized copy of MEDIA_ROOT/source_name and return the manifest.
+
+    The copy lives under the same top-level directory as the original (so it
+    stays behind the protected download view) and is dropped again if it
+    isn't at least 10% smaller.
+    """
+    source_path = os.path.join(media_root, source_name)
+    manifest = {'source': source_name, 'name': None}
+    try:
+        original_size = os.path.getsize(source_path)
+        content_hash = _file_hash(source_path)
+    except OSError as exc:
+        manifest['error'] = str(exc)[:200]
+        return manifest
+    manifest['original_size'] = original_size
+
+    is_pdf = source_name.lower().endswith('.pdf')
+    if is_pdf and not ghostscript:
+        manifest['skipped'] = 'ghostscript not installed'
+        return manifest
+
+    top_dir = source_name.split('/', 1)[0]
+    extension = 'pdf' if is_pdf else 'jpg'
+    name = f'{top_dir}/{NORMALIZED_DIR}/{content_hash[:2]}/{content_hash[:32]}-{max_side}.{extension}'
+    path = os.path.join(media_root, name)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            if is_pdf:
+                _normalize_pdf(source_path, tmp_path, ghostscript)
+            else:
+                _normalize_image(source_path, tmp_path, max_side)
+        except Exception as exc:
+            # Corrupt/encrypted file etc. - keep serving the original
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            manifest['error'] = str(exc)[:200]
+            return manifest
+        os.replace(tmp_path, path)
+
+    size = os.path.getsize(path)
+    if size > original_size * 0.9:
+        os.remove(path)
+        return manifest
+
+    manifest.update({'name': name, 'size': size})
+    return manifest
+
+
+# ==================== SCHEDULING ====================
+
+def store_normalized(model_label, pk, field_name, source_name):
+    """Normalize one upload and save its manifest, unless the file was replaced meanwhile"""
+    current = apps.get_model(model_label).objects.filter(pk=pk, **{field_name: source_name})
+    if not current.exists():
+        return False
+    manifest = normalize_document(
+        str(settings.MEDIA_ROOT), source_name,
+        getattr(settings, 'DOCUMENT_NORMALIZE_MAX_SIDE', 2000),
+        getattr(settings, 'DOCUMENT_GHOSTSCRIPT', None) or shutil.which('gs'),
+    )
+    current.update(**{normalized_field_name(field_name): manifest})
+    return manifest['name'] is not None
+
+
+def schedule_normalization(instance, field_name):
+    """Queue normalization of instance.<field_name> - the job commits with the upload"""
+    from .tasks import normalize_document_upload
+
+    file = getattr(instance, field_name)
+    if file:
+        normalize_document_upload.delay(instance._meta.label, instance.pk, field_name, file.name)
+
+
+def normalized_fields(model):
+    """File fields of `model` that have a `<field>_normalized` manifest"""
+    field_names = {f.name for f in model._meta.get_fields()}
+    return [name for name in sorted(document_upload_fields())
+            if name in field_names and normalized_field_name(name) in field_names]
+
+
+def queue_document_normalization(sender, instance, raw=False, **kwargs):
+    """post_save handler: normalize new or replaced document uploads"""
+    if raw:
+        return
+    for field_name in normalized_fields(sender):
+        file = getattr(instance, field_name)
+        manifest = getattr(instance, normalized_field_name(field_name)) or {}
+        if file and manifest.get('source') != file.name:
+            schedule_normalization(instance, field_name)
+
+
+def preferred_file(instance, field_name):
+    """The normalized copy of instance.<field_name> if one is ready, else the original"""
+    original = getattr(instance, field_name)
+    manifest = getattr(instance, normalized_field_name(field_name), None) or {}
+    if not original or manifest.get('source') != original.name or not manifest.get('name'):
+        return original
+    field = instance._meta.get_field(field_name)
+    return field.attr_class(instance, field, manifest['name'])
@@ -239,6 +239,11 @@ urlpatterns = [
         views.admin_student_detail,
         name="admin_student_detail",
     ),
+    path(
+        "admin-dashboard/students/<int:student_id>/documents.zip",
+        views.admin_student_documents_zip,
+        name="admin_student_documents_zip",
+    ),
     path(
         "admin-dashboard/students/<int:student_id>/update-status/",
         views.admin_update_status,
@@ -636,6 +641,16 @@ path('ajax/get-states/', views.get_states_by_country, name='get_states_by_countr
         views.admin_view_application_detail,
         name="admin_view_application_detail",
     ),
+    path(
+        "admin/management-quota/application/<int:app_id>/documents.zip",
+        views.admin_application_documents_zip,
+        name="admin_application_documents_zip",
+    ),
+    path(
+        "admin/management-quota/colleges/<int:college_id>/documents.zip",
+        views.admin_college_documents_zip,
+        name="admin_college_documents_zip",
+    ),
     # Notifications & Seat Allocation (Combined in one view)
     path(
         "admin/management-quota/manage/",
@@ -658,6 +673,33 @@ path('ajax/get-states/', views.get_states_by_country, name='get_states_by_countr
 path("admin_counselling_india_payments/", views.admin_counselling_india_payments, name="admin_counselling_india_payments"),
 path("approve_payment/<int:payment_id>/", views.approve_payment, name="approve_payment"),
 path("reject_payment/<int:payment_id>/", views.reject_payment, name="reject_payment"),
+    # ==================== RESUMABLE UPLOADS ====================
+    path("uploads/", views.upload_session_create, name="upload_session_create"),
+    path(
+        "uploads/<uuid:upload_id>/",
+        views.upload_session_detail,
+        name="upload_session_detail",
+    ),
+    # ==================== PROTECTED FILES ====================
+    path(
+        "files/<str:kind>/<int:pk>/<str:field>/",
+        views.protected_file_view,
+        name="protected_file",
+    ),
+    path(
+        "files/s/<str:token>/<str:filename>",
+        views.signed_file_view,
+        name="signed_file",
+    ),
+    # ==================== ASYNC JSON LOOKUPS ====================
+    path("ajax/colleges/search/", views.ajax_college_search, name="ajax_college_search"),
+    path("ajax/notifications/unread/", views.ajax_notification_badge, name="ajax_notification_badge"),
+    path("admin-dashboard/ajax/queue-counts/", views.ajax_admin_queue_counts, name="ajax_admin_queue_counts"),
+    # ==================== LIVE UPDATES (SSE) ====================
+    path("live/notifications/", views.live_notifications, name="live_notifications"),
+    path("admin-dashboard/live/queues/", views.live_admin_queues, name="live_admin_queues"),
+    # ==================== REQUEST PROFILING ====================
+    path("admin-dashboard/profiling/", views.admin_request_profiling, name="admin_request_profiling"),
     # ⚠️ ==================== CATCH-ALL PATTERNS (LAST MEIN) ====================
     path(
         "<str:card_slug>/<path:subcategory_path>/<str:page_slug>/",
@@ -16,6 +16,16 @@ from .forms import (
     AdmissionIndiaCardForm
 )
 from django.views.decorators.cache import never_cache
+from django.http import JsonResponse
+from asgiref.sync import iscoroutinefunction
+from functools import wraps
+from .resumable import uploaded_file
+from .uploads import rejected_upload
+from .tasks import recalculate_document_status
+from .notifications import mark_all_read, notify_application
+from .mail import queue_email
+from .sqlite import retry_on_locked, serve_stale_on_locked
+from .analytics import record_page_view, record_search
 
 
 # ==================== HELPER FUNCTION ====================
@@ -26,6 +36,29 @@ def is_admin_or_staff(user):
     return user.is_staff or user.is_superuser
 
 
+def login_required_json(view):
+    """
+    login_required for fetch / EventSource endpoints: 401 JSON instead of a
+    redirect to the login page (sync and async views)
+    """
+    def unauthorized():
+        return JsonResponse({'error': 'Login required.'}, status=401)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not (await request.auser()).is_authenticated:
+                return unauthorized()
+            return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return unauthorized()
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
 # ==================== PUBLIC VIEWS ====================
 
 
@@ -192,6 +225,7 @@ def admission_india_services_view(request):
 
 @never_cache
 @login_required(login_url='main_app:user_login')
+@retry_on_locked
 def purchase_card_view(request, card_id):
     """Payment page for card purchase"""
     
@@ -643,6 +677,8 @@ from .forms import (
 # ==================== STUDENT DASHBOARD VIEW ====================
 @never_cache
 @login_required(login_url='main_app:user_login')
+@serve_stale_on_locked
+@retry_on_locked
 def student_dashboard_view(request):
     """Student Dashboard - Professional Counselling by Experts"""
     
@@ -671,10 +707,14 @@ def student_dashboard_view(request):
         # ===== DOCUMENT UPLOAD =====
         if 'upload_document' in request.POST:
             document_type = request.POST.get('document_type')
-            document_file = request.FILES.get('document_file')
+            document_file = uploaded_file(request, 'document_file')
             
+            # Rejected while streaming (type/size) - see uploads.py
+            upload_error = rejected_upload(request, 'document_file')
+            if upload_error or not document_file:
+                messages.error(request, upload_error or 'Please choose a file to upload.')
             # Check if document already exists
-            if StudentDocument.objects.filter(student=request.user, document_type=document_type).exists():
+            elif StudentDocument.objects.filter(student=request.user, document_type=document_type).exists():
                 messages.error(request, f'{document_type} already uploaded. Please delete the old one first.')
             else:
                 StudentDocument.objects.create(
@@ -899,14 +939,8 @@ def admin_document_review(request, doc_id):
         if form.is_valid():
             form.save()
             
-            # Update student status if all docs approved
-            student = document.student
-            all_docs = StudentDocument.objects.filter(student=student)
-            if all(doc.status == 'approved' for doc in all_docs):
-                status, created = CounsellingStatus.objects.get_or_create(student=student)
-                status.documents_verified = True
-                status.current_stage = 'documents_verification'
-                status.save()
+            # Update student status if all docs approved (background job)
+            recalculate_document_status.delay(document.student_id)
             
             messages.success(request, 'Document reviewed successfully!')
             return redirect('main_app:admin_documents_list')
@@ -947,6 +981,9 @@ def admin_doubt_respond(request, doubt_id):
             doubt_obj = form.save(commit=False)
             doubt_obj.responded_by = request.user
             doubt_obj.save()
+            if doubt_obj.response:
+                queue_email(doubt_obj.student.email, f'Your doubt has been answered: {doubt_obj.subject}',
+                            'emails/doubt_answered', {'doubt': doubt_obj})
             messages.success(request, 'Response submitted successfully!')
             return redirect('main_app:admin_doubts_list')
     else:
@@ -1297,13 +1334,12 @@ from django.http import JsonResponse
 from .models import Country, State, UserRegistration
 from .forms import CountryForm, StateForm, UserRegistrationForm
 from django.contrib.auth.hashers import make_password
+from .lookups import active_states
 
 # ==================== AJAX - LOAD STATES ====================
-def load_states(request):
-    """AJAX endpoint to load states based on country"""
-    country_id = request.GET.get('country_id')
-    states = State.objects.filter(country_id=country_id, is_active=True).values('id', 'name')
-    return JsonResponse(list(states), safe=False)
+async def load_states(request):
+    """AJAX endpoint to load states based on country (async, cached - see lookups.py)"""
+    return JsonResponse(await active_states(request.GET.get('country_id')), safe=False)
 
 
 from django.shortcuts import render, redirect
@@ -1858,6 +1894,10 @@ def student_comparisons_list(request):
             Q(comparison_summary__icontains=search_query) |
             Q(colleges__name__icontains=search_query)
         ).distinct()
+    # Evaluated once - the template shows the count and then lists the rows
+    comparisons = list(comparisons)
+    if search_query:
+        record_search(request, 'comparisons', search_query, len(comparisons))
     
     # Get all countries and states for filter dropdowns
     all_countries = Country.objects.filter(is_active=True).order_by('name')
@@ -2505,22 +2545,6 @@ from django.http import JsonResponse
 from .models import SubCategory, State
 from .forms import ContentPageForm
 
-# ==================== AJAX: Get States by Country (Reuse same function) ====================
-@login_required(login_url='main_app:admin_login')
-@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
-def get_states_by_country(request):
-    """AJAX endpoint to get states based on selected country"""
-    country_id = request.GET.get('country_id')
-    
-    if country_id:
-        states = State.objects.filter(
-            country_id=country_id, 
-            is_active=True
-        ).values('id', 'name').order_by('name')
-        return JsonResponse({'states': list(states)})
-    
-    return JsonResponse({'states': []})
-
 
 # ==================== ADMIN: ADD CONTENT PAGE ====================
 @never_cache
@@ -2852,8 +2876,7 @@ def page_detail_view(request, card_slug, subcategory_path, page_slug):
         print(f"✅ Page found: {page.title}")
         
         # ✅ Page found - show it
-        page.views_count += 1
-        page.save(update_fields=['views_count'])
+        record_page_view(request, page)
         
         # Get related pages with same filtering
         related_query = Q(
@@ -3199,8 +3222,7 @@ def page_detail_view(request, card_slug, subcategory_path, page_slug):
         page = ContentPage.objects.get(page_query)
         
         # Page found - show it
-        page.views_count += 1
-        page.save(update_fields=['views_count'])
+        record_page_view(request, page)
         
         # Get related pages with same filtering
         related_query = Q(
@@ -3453,18 +3475,9 @@ from django.http import JsonResponse
 # ==================== AJAX: Get States by Country ====================
 @login_required(login_url='main_app:admin_login')
 @user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
-def get_states_by_country(request):
-    """AJAX endpoint to get states based on selected country"""
-    country_id = request.GET.get('country_id')
-    
-    if country_id:
-        states = State.objects.filter(
-            country_id=country_id, 
-            is_active=True
-        ).values('id', 'name').order_by('name')
-        return JsonResponse({'states': list(states)})
-    
-    return JsonResponse({'states': []})
+async def get_states_by_country(request):
+    """AJAX endpoint to get states based on selected country (async, cached)"""
+    return JsonResponse({'states': await active_states(request.GET.get('country_id'))})
 
 
 # ==================== ADMIN: ADD CONTENT PAGE FOR SUBCATEGORY ====================
@@ -3661,7 +3674,7 @@ def admission_abroad_page_detail(request, card_slug, subcategory_path, page_slug
         print(f"✅ PAGE FOUND: {page}")
         print(f"📄 Rendering template: student/admission_abroad_page_detail.html")
         
-        page.increment_views()
+        record_page_view(request, page)
         
         related_pages = subcategory.content_pages.filter(
             is_active=True
@@ -4332,7 +4345,7 @@ def distance_education_page_detail(request, card_slug, subcategory_path, page_sl
         is_active=True
     )
     
-    page.increment_views()
+    record_page_view(request, page)
     
     related_pages = subcategory.content_pages.filter(
         is_active=True
@@ -4767,7 +4780,7 @@ def online_education_page_detail(request, card_slug, subcategory_path, page_slug
         is_active=True
     )
     
-    page.increment_views()
+    record_page_view(request, page)
     
     related_pages = subcategory.content_pages.filter(
         is_active=True
@@ -4794,7 +4807,7 @@ def online_education_page_detail(request, card_slug, subcategory_path, page_slug
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, Q
 from django.utils import timezone
 from .models import (
     ManagementQuotaCollege, ManagementQuotaApplication,
@@ -4842,9 +4855,14 @@ def management_quota_admission(request):
         exam_score = request.POST.get('exam_score')
         
         # Validate files
-        tenth_file = request.FILES.get('tenth_marksheet')
-        twelfth_file = request.FILES.get('twelfth_marksheet')
-        exam_file = request.FILES.get('exam_scorecard')
+        tenth_file = uploaded_file(request, 'tenth_marksheet')
+        twelfth_file = uploaded_file(request, 'twelfth_marksheet')
+        exam_file = uploaded_file(request, 'exam_scorecard')
+        
+        upload_errors = [rejected_upload(request, name) for name in ('tenth_marksheet', 'twelfth_marksheet', 'exam_scorecard')]
+        if any(upload_errors):
+            messages.error(request, ' '.join(error for error in upload_errors if error))
+            return redirect('main_app:management_quota_admission')
         
         if not college_id or not tenth_file or not twelfth_file:
             messages.error(request, 'Please fill all required fields.')
@@ -4877,13 +4895,12 @@ def management_quota_admission(request):
                 exam_scorecard=exam_file if exam_file else None
             )
             
-            # Create notification
-            ManagementQuotaNotification.objects.create(
-                student=user_registration,
-                application=application,
-                notification_type='submitted',
-                title='Application Submitted',
-                message=f'Your application for {mq_college.college.name} has been submitted successfully.'
+            # Notification event (delivered as a digest)
+            notify_application(
+                application,
+                'submitted',
+                'Application Submitted',
+                f'Your application for {mq_college.college.name} has been submitted successfully.'
             )
             
             messages.success(request, 'Application submitted successfully!')
@@ -4932,32 +4949,25 @@ def student_notifications(request):
     elif filter_type == 'waitlist':
         notifications = notifications.filter(notification_type='waitlist')
     
-    # Mark as read when viewed
-    ManagementQuotaNotification.objects.filter(
-        student=user_registration,
-        is_read=False
-    ).update(is_read=True)
+    # Mark as read when viewed - moves the watermark, no per-row UPDATE
+    notification_state = mark_all_read(user_registration.id)
     
-    # Count statistics
-    all_notifs = ManagementQuotaNotification.objects.filter(
+    # Count applications by status (one query)
+    application_counts = ManagementQuotaApplication.objects.filter(
         student=user_registration
+    ).aggregate(
+        pending=Count('id', filter=Q(status='pending')),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
     )
     
-    # Count applications by status
-    applications = ManagementQuotaApplication.objects.filter(
-        student=user_registration
-    )
-    
-    pending_count = applications.filter(status='pending').count()
-    approved_count = applications.filter(status='approved').count()
-    rejected_count = applications.filter(status='rejected').count()
-    
     context = {
         'notifications': notifications,
-        'total_notifications': all_notifs.count(),
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'rejected_count': rejected_count,
+        'total_notifications': notification_state.total_count,
+        'read_until': notification_state.last_read_at,
+        'pending_count': application_counts['pending'],
+        'approved_count': application_counts['approved'],
+        'rejected_count': application_counts['rejected'],
         'current_filter': filter_type,
     }
     
@@ -5065,6 +5075,8 @@ def admin_management_quota_applications(request):
 
 
 @user_passes_test(is_admin)
+@serve_stale_on_locked
+@retry_on_locked
 def admin_view_application_detail(request, app_id):
     """Admin: View detailed application"""
     
@@ -5084,13 +5096,14 @@ def admin_view_application_detail(request, app_id):
             }
             
             notif_type, notif_title = notification_types[status]
-            ManagementQuotaNotification.objects.create(
-                student=application.student,
-                application=application,
-                notification_type=notif_type,
-                title=notif_title,
-                message=f'Your application for {application.college.college.name} status: {status}'
+            notify_application(
+                application,
+                notif_type,
+                notif_title,
+                f'Your application for {application.college.college.name} status: {status}'
             )
+            queue_email(application.email, f'{notif_title} - {application.college.college.name}',
+                        'emails/application_status', {'application': application})
             
             messages.success(request, f'Application {status}!')
             return redirect('main_app:admin_management_quota_applications')
@@ -5124,11 +5137,18 @@ def admin_management_quota_notifications(request):
     if notif_type:
         notifications = notifications.filter(notification_type=notif_type)
     
+    # Unread = newer than the student's read watermark (StudentNotificationState)
+    notifications = notifications.annotate(is_unread=ExpressionWrapper(
+        Q(student__notification_state__last_read_at__isnull=True) |
+        Q(created_at__gt=F('student__notification_state__last_read_at')),
+        output_field=BooleanField(),
+    ))
+    
     if read_filter:
-        notifications = notifications.filter(is_read=(read_filter == 'read'))
+        notifications = notifications.filter(is_unread=(read_filter == 'unread'))
     
     total = notifications.count()
-    unread_count = notifications.filter(is_read=False).count()
+    unread_count = notifications.filter(is_unread=True).count()
     
     # Get approved applications for allocation form
     approved_apps = ManagementQuotaApplication.objects.filter(
@@ -5255,6 +5275,8 @@ def approve_payment(request, payment_id):
             payment.payment_status = 'completed'
             payment.payment_completed_at = timezone.now()
             payment.save()
+            queue_email(payment.student.email, 'Payment Received - CAREER4S',
+                        'emails/payment_approved', {'payment': payment})
             messages.success(request, f"Payment approved for {payment.student.name}")
         else:
             messages.warning(request, "Payment is not in pending status")
@@ -5274,4 +5296,204 @@ def reject_payment(request, payment_id):
         else:
             messages.warning(request, "Payment is not in pending status")
     
-    return redirect('main_app:admin_counselling_india_payments')
\ No newline at end of file
+    return redirect('main_app:admin_counselling_india_payments')
+
+# ==================== PROTECTED FILE DOWNLOADS ====================
+from urllib.parse import urlencode
+
+from .protected_files import get_protected_instance, load_signed_token, serve_protected_file, signed_file_url
+from .uploads import preferred_file
+
+
+@never_cache
+@login_required(login_url='main_app:user_login')
+def protected_file_view(request, kind, pk, field):
+    """Owner/staff check, then redirect to a short-lived signed download URL"""
+    instance = get_protected_instance(kind, pk, field, request.user)
+    url = signed_file_url(instance, field, request.user)
+    params = {key: '1' for key in ('download', 'original') if request.GET.get(key)}
+    if params:
+        url += '?' + urlencode(params)
+    return redirect(url)
+
+
+def signed_file_view(request, token, filename):
+    """Serve a protected file for a valid signed URL (no session needed)"""
+    kind, pk, field, user = load_signed_token(token)
+    instance = get_protected_instance(kind, pk, field, user)
+    # Normalized (lighter) copy unless the original upload is asked for
+    field_file = getattr(instance, field) if request.GET.get('original') else preferred_file(instance, field)
+    return serve_protected_file(request, field_file, download=bool(request.GET.get('download')))
+
+
+# ==================== DOCUMENT ZIP DOWNLOADS ====================
+from .document_zip import application_entries, college_application_entries, student_document_entries, zip_response
+
+
+@never_cache
+@login_required(login_url='main_app:admin_login')
+@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
+def admin_student_documents_zip(request, student_id):
+    """All documents of one student as a streaming ZIP"""
+    from django.contrib.auth.models import User
+    student = get_object_or_404(User, id=student_id, is_staff=False)
+    return zip_response(student_document_entries(student), f'{student.username}-documents.zip')
+
+
+@never_cache
+@login_required(login_url='main_app:admin_login')
+@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
+def admin_application_documents_zip(request, app_id):
+    """Marksheets/scorecard of one management quota application as a ZIP"""
+    application = get_object_or_404(ManagementQuotaApplication, id=app_id)
+    return zip_response(application_entries(application), f'application-{application.id}-{application.full_name}.zip')
+
+
+@never_cache
+@login_required(login_url='main_app:admin_login')
+@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
+def admin_college_documents_zip(request, college_id):
+    """Documents of every application to a management quota college as a ZIP"""
+    mq_college = get_object_or_404(ManagementQuotaCollege.objects.select_related('college'), id=college_id)
+    return zip_response(college_application_entries(mq_college), f'{mq_college.college.name}-applications.zip')
+
+
+# ==================== RESUMABLE UPLOADS ====================
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+from .models import UploadSession
+from .resumable import UploadError, append_chunk, chunk_size, create_session, discard_session
+
+
+def _upload_status(session, status=200):
+    response = JsonResponse({
+        'id': str(session.pk),
+        'offset': session.offset,
+        'size': session.size,
+        'chunk_size': chunk_size(),
+        'complete': session.is_complete,
+    }, status=status)
+    response['Upload-Offset'] = session.offset
+    response['Upload-Length'] = session.size
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required_json
+@require_http_methods(['POST'])
+def upload_session_create(request):
+    """Start a chunked upload (see resumable.py)"""
+    try:
+        session = create_session(request.user, request.POST.get('field_name'),
+                                 request.POST.get('filename'), request.POST.get('size'))
+    except UploadError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    response = _upload_status(session, status=201)
+    response['Location'] = reverse('main_app:upload_session_detail', args=[session.pk])
+    return response
+
+
+@login_required_json
+@require_http_methods(['GET', 'HEAD', 'PATCH', 'DELETE'])
+def upload_session_detail(request, upload_id):
+    """Current offset (GET/HEAD), append a chunk (PATCH) or cancel (DELETE)"""
+    session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+    if request.method == 'DELETE':
+        discard_session(session)
+        return HttpResponse(status=204)
+    if request.method == 'PATCH':
+        try:
+            append_chunk(session, request)
+        except UploadError as e:
+            session.refresh_from_db(fields=['offset'])
+            response = JsonResponse({'error': str(e), 'offset': session.offset}, status=e.status)
+            response['Upload-Offset'] = session.offset
+            return response
+    return _upload_status(session)
+
+
+# ==================== LIVE UPDATES (SSE) ====================
+from django.http import Http404
+from .live import ADMIN_CHANNEL, StudentSnapshot, queue_depths, sse_response, student_channel
+
+
+@login_required_json
+async def live_notifications(request):
+    """Event stream: unread counter and new notifications of the logged-in student"""
+    user = await request.auser()
+    registration_id = await UserRegistration.objects.filter(user_id=user.id).values_list('id', flat=True).afirst()
+    if registration_id is None:
+        raise Http404
+    return await sse_response(request, student_channel(registration_id), 'notifications',
+                              StudentSnapshot(registration_id))
+
+
+@never_cache
+@login_required(login_url='main_app:admin_login')
+@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
+async def live_admin_queues(request):
+    """Event stream: pending payments / documents / applications"""
+    return await sse_response(request, ADMIN_CHANNEL, 'queues', queue_depths)
+
+
+# ==================== ASYNC JSON LOOKUPS ====================
+from .lookups import college_typeahead, unread_count_for_user as async_unread_count
+
+
+async def ajax_college_search(request):
+    """Typeahead: colleges matching ?q= (at least 2 characters)"""
+    return JsonResponse({'results': await college_typeahead(request.GET.get('q'))})
+
+
+@login_required_json
+async def ajax_notification_badge(request):
+    """Unread notification counter for the header badge"""
+    user = await request.auser()
+    response = JsonResponse({'unread': await async_unread_count(user.id)})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@never_cache
+@login_required(login_url='main_app:admin_login')
+@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
+async def ajax_admin_queue_counts(request):
+    """Pending payments / documents / applications (shared with the SSE stream)"""
+    return JsonResponse(await queue_depths())
+
+
+# ==================== REQUEST PROFILING ====================
+from datetime import datetime, timezone as dt_timezone
+from .profiling import SORT_KEYS, get_store, profiling_enabled, sample_rate, top_views
+
+
+@never_cache
+@login_required(login_url='main_app:admin_login')
+@user_passes_test(is_admin_or_staff, login_url='main_app:user_login')
+def admin_request_profiling(request):
+    """Slowest views of this process (sampled requests, see profiling.py); ?format=json"""
+    sort = request.GET.get('sort') if request.GET.get('sort') in SORT_KEYS else 'p95'
+    try:
+        limit = max(1, int(request.GET['limit']))
+    except (KeyError, ValueError):
+        limit = None
+    summary = get_store().summary(0 if request.GET.get('refresh') else None)
+    views = top_views(summary, sort, limit)
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            **{key: value for key, value in summary.items() if key != 'views'},
+            'enabled': profiling_enabled(),
+            'sample_rate': sample_rate(),
+            'sort': sort,
+            'views': views,
+        })
+    return render(request, 'admin/request_profiling.html', {
+        'summary': summary,
+        'since': datetime.fromtimestamp(summary['since'], tz=dt_timezone.utc) if summary['since'] else None,
+        'views': views,
+        'sort': sort,
+        'sort_keys': SORT_KEYS,
+        'enabled': profiling_enabled(),
+        'sample_rate_percent': sample_rate() * 100,
+    })